@@ -7,12 +7,18 @@
 __author__ = "Cognitive Tribunal Team"
 
 from .modules.archive_scanner import ArchiveScanner
+from .modules.async_archive_scanner import AsyncArchiveScanner
+from .modules.archive_estimator import ArchiveEstimator
+from .modules.archive_watcher import ArchiveWatcher
 from .modules.ai_context_aggregator import AIContextAggregator
 from .modules.personal_repo_analyzer import PersonalRepoAnalyzer
 from .modules.org_repo_analyzer import OrgRepoAnalyzer
 
 __all__ = [
     "ArchiveScanner",
+    "AsyncArchiveScanner",
+    "ArchiveEstimator",
+    "ArchiveWatcher",
     "AIContextAggregator", 
     "PersonalRepoAnalyzer",
     "OrgRepoAnalyzer",
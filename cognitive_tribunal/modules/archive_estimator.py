@@ -0,0 +1,302 @@
+"""
+Archive Estimator Module
+Estimates archive size, category mix and duplicate rate from a random
+sample of directories, in a fraction of the time of a full scan.
+"""
+
+import math
+import os
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .archive_scanner import ArchiveScanner
+from ..utils.file_utils import Deduplicator, FileClassifier, FileHasher
+from ..utils.placeholders import detect_placeholder
+
+
+# Two-sided 95% normal quantile
+_Z_95 = 1.959963984540054
+
+
+class _DirectorySummary:
+    """Per-directory totals, computed once however many probes pass through."""
+
+    __slots__ = ('files', 'subdirs', 'file_count', 'total_size', 'by_category', 'size_by_category')
+
+    def __init__(self, files, subdirs):
+        self.files = files
+        self.subdirs = subdirs
+        self.file_count = len(files)
+        self.total_size = 0
+        self.by_category: Dict[str, int] = {}
+        self.size_by_category: Dict[str, int] = {}
+        for file_path, stat_result in files:
+            category = FileClassifier.classify(file_path)
+            self.total_size += stat_result.st_size
+            self.by_category[category] = self.by_category.get(category, 0) + 1
+            self.size_by_category[category] = self.size_by_category.get(category, 0) + stat_result.st_size
+
+
+class ArchiveEstimator:
+    """
+    Estimates scan statistics by random probes down the directory tree.
+
+    Uses Knuth's estimator for tree size: a probe starts at the root and
+    repeatedly descends into one random subdirectory until it reaches a
+    leaf. A directory reached through ancestors with b1, b2, ... subdirectories
+    stands in for b1 * b2 * ... directories like it, so its files are counted
+    with that weight. Each probe is an unbiased estimate of the tree totals.
+    The mean over probes is reported with a normal 95% confidence interval
+    from their spread.
+
+    The duplicate rate is estimated from the files the probes saw. Same-size
+    files are compared by partial hash. In each group of matching files one
+    copy is kept (from the directory most likely to be sampled), and every
+    other copy stands in for 1/p removable copies, where p is the
+    probability that the probes reach both its directory and the kept
+    one. This is exact for pairs; larger groups are counted consistently
+    but can run high with few probes. Matching pairs are also reported,
+    each scaled by the inverse of the joint probability of sampling both
+    of its directories. Matches on size and partial hash are
+    likely duplicates, not confirmed ones. Cloud placeholders are never
+    read, as in a full scan, unless the scanner hydrates them.
+    """
+
+    def __init__(self, scanner: Optional[ArchiveScanner] = None, probes: int = 200,
+                 time_budget: Optional[float] = None, seed: Optional[int] = None,
+                 max_hash_files: int = 2000):
+        """
+        Initialize the estimator.
+
+        Args:
+            scanner: ArchiveScanner providing exclude rules and the hash
+                algorithm (a default one if None)
+            probes: Number of random root-to-leaf probes
+            time_budget: Stop probing after this many seconds (at least one
+                probe always runs)
+            seed: Random seed for reproducible estimates
+            max_hash_files: Maximum sampled files read for partial hashes
+        """
+        if probes < 1:
+            raise ValueError('probes must be at least 1')
+        self.scanner = scanner or ArchiveScanner()
+        self.probes = probes
+        self.time_budget = time_budget
+        self.max_hash_files = max_hash_files
+        self._random = random.Random(seed)
+
+    @staticmethod
+    def _interval(samples: List[float], floor: float = 0.0) -> Dict:
+        """Mean of per-probe estimates with a 95% confidence interval."""
+        n = len(samples)
+        mean = sum(samples) / n
+        if n > 1:
+            variance = sum((x - mean) ** 2 for x in samples) / (n - 1)
+            margin = _Z_95 * math.sqrt(variance / n)
+        else:
+            margin = float('inf')
+        return {
+            'estimate': round(mean),
+            'low': round(max(floor, mean - margin)) if margin != float('inf') else round(floor),
+            'high': round(mean + margin) if margin != float('inf') else None,
+        }
+
+    def estimate(self, root_path: str, max_depth: Optional[int] = None) -> Dict:
+        """
+        Estimate file count, total size, category mix and duplicate rate.
+
+        Args:
+            root_path: Root directory to estimate
+            max_depth: Maximum depth to consider (None for unlimited)
+
+        Returns:
+            Estimate dictionary; each figure has 'estimate', 'low' and
+            'high' (95% confidence) values ('high' is None after one probe)
+
+        Raises:
+            ValueError: If root_path does not exist or is not a directory
+        """
+        scanner = self.scanner
+        root = Path(root_path).resolve()
+        if not root.exists():
+            raise ValueError(f"Path does not exist: {root_path}")
+        if not root.is_dir():
+            raise ValueError(f"Path is not a directory: {root_path}")
+        scanner._scan_root = str(root)
+        print(f"Estimating directory: {root}")
+
+        started = time.monotonic()
+        summaries: Dict[str, _DirectorySummary] = {}
+        # Weight of each visited directory: how many directories it stands in for
+        weights: Dict[str, int] = {}
+        errors: List[str] = []
+        samples: List[Dict[str, float]] = []
+
+        for _ in range(self.probes):
+            if samples and self.time_budget is not None and time.monotonic() - started >= self.time_budget:
+                break
+            totals: Dict[str, float] = {'files': 0, 'size': 0, 'directories': 0}
+            dir_path, depth, weight = str(root), 0, 1
+            while True:
+                summary = summaries.get(dir_path)
+                if summary is None:
+                    files, subdirs, dir_errors = scanner._list_directory(dir_path, depth, max_depth, True)
+                    errors.extend(dir_errors)
+                    summary = summaries[dir_path] = _DirectorySummary(files, subdirs)
+                    weights[dir_path] = weight
+                totals['directories'] += weight
+                totals['files'] += weight * summary.file_count
+                totals['size'] += weight * summary.total_size
+                for category, count in summary.by_category.items():
+                    totals['count:' + category] = totals.get('count:' + category, 0) + weight * count
+                for category, size in summary.size_by_category.items():
+                    totals['size:' + category] = totals.get('size:' + category, 0) + weight * size
+                if not summary.subdirs:
+                    break
+                weight *= len(summary.subdirs)
+                dir_path, depth = self._random.choice(summary.subdirs)
+            samples.append(totals)
+
+        n = len(samples)
+        seen_files = sum(s.file_count for s in summaries.values())
+        seen_size = sum(s.total_size for s in summaries.values())
+        categories = sorted({key.split(':', 1)[1] for s in samples for key in s if ':' in key})
+
+        def figure(key: str, floor: float = 0.0) -> Dict:
+            return self._interval([s.get(key, 0) for s in samples], floor)
+
+        total_size = figure('size', seen_size)
+        duplicates = self._estimate_duplicates(summaries, weights, n, total_size['estimate'])
+
+        return {
+            'root': str(root),
+            'probes': n,
+            'directories_listed': len(summaries),
+            'files_seen': seen_files,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'confidence': 0.95,
+            'estimates': {
+                'directories': figure('directories', len(summaries)),
+                'total_files': figure('files', seen_files),
+                'total_size': total_size,
+                'by_category': {c: figure('count:' + c) for c in categories},
+                'size_by_category': {c: figure('size:' + c) for c in categories},
+                'duplicates': duplicates,
+            },
+            'errors': errors,
+            'estimate_timestamp': datetime.now().isoformat(),
+        }
+
+    def _estimate_duplicates(self, summaries: Dict[str, '_DirectorySummary'], weights: Dict[str, int],
+                             probes: int, total_size: float) -> Dict:
+        """Scale likely duplicate copies and pairs among sampled files by their inverse inclusion probability."""
+        # Probability that at least one of the probes reached each directory
+        inclusion = {d: 1 - (1 - 1 / w) ** probes for d, w in weights.items()}
+
+        def joint_inclusion(dir_a: str, dir_b: str) -> float:
+            # A probe reaches a directory with probability 1 / weight, and
+            # both of two directories only if one is an ancestor of the other
+            if dir_a == dir_b:
+                return inclusion[dir_a]
+            if len(dir_a) > len(dir_b):
+                dir_a, dir_b = dir_b, dir_a
+            both = 1 / weights[dir_b] if dir_b.startswith(dir_a.rstrip(os.sep) + os.sep) else 0.0
+            neither = 1 - 1 / weights[dir_a] - 1 / weights[dir_b] + both
+            return inclusion[dir_a] + inclusion[dir_b] - (1 - neither ** probes)
+
+        by_size: Dict[int, List[Tuple[str, Path, Tuple[int, int]]]] = {}
+        placeholders_skipped = 0
+        for dir_path, summary in summaries.items():
+            for file_path, stat_result in summary.files:
+                if stat_result.st_size > 0:
+                    # Hashing a placeholder would download it, and an iCloud
+                    # stub holds no content at all
+                    placeholder = detect_placeholder(file_path, stat_result)
+                    if placeholder is not None and not (self.scanner.hydrate_placeholders
+                                                        and placeholder['reason'] != 'icloud-stub'):
+                        placeholders_skipped += 1
+                        continue
+                    by_size.setdefault(stat_result.st_size, []).append(
+                        (dir_path, file_path, (stat_result.st_dev, stat_result.st_ino)))
+
+        candidates = [(size, files) for size, files in by_size.items() if len(files) > 1]
+        # Hash the cheapest groups first when the read budget cannot cover all
+        candidates.sort(key=lambda item: item[0] * len(item[1]))
+        hashed_files = 0
+        copies_found = 0
+        copy_estimate = 0.0
+        copy_variance = 0.0
+        byte_estimate = 0.0
+        byte_variance = 0.0
+        pairs_found = 0
+        pair_estimate = 0.0
+        pair_variance = 0.0
+        algorithm = self.scanner.hash_algorithm
+        for size, files in candidates:
+            if hashed_files + len(files) > self.max_hash_files:
+                break
+            hashed_files += len(files)
+            groups: Dict[str, Dict[str, int]] = {}
+            seen_inodes = set()
+            for dir_path, file_path, inode in files:
+                # Hardlinks share blocks and are not duplicates
+                if inode[1] and inode in seen_inodes:
+                    continue
+                seen_inodes.add(inode)
+                digest = FileHasher.compute_partial_hash(
+                    file_path, algorithm, Deduplicator.PARTIAL_BLOCK_SIZE, self.scanner.read_limiter)
+                if digest.startswith('ERROR'):
+                    continue
+                counts = groups.setdefault(digest, {})
+                counts[dir_path] = counts.get(dir_path, 0) + 1
+
+            for counts in groups.values():
+                # Keep one copy from the directory most likely to be
+                # sampled; the rest are removable
+                kept = max(counts, key=lambda d: inclusion[d])
+                for dir_path, count in counts.items():
+                    copies = count - 1 if dir_path == kept else count
+                    if not copies:
+                        continue
+                    # A copy is only found together with the kept one
+                    probability = joint_inclusion(dir_path, kept)
+                    copies_found += copies
+                    copy_estimate += copies / probability
+                    byte_estimate += copies * size / probability
+                    copy_variance += copies * (1 - probability) / probability ** 2
+                    byte_variance += copies * size ** 2 * (1 - probability) / probability ** 2
+                
+                dirs = list(counts.items())
+                for i, (dir_a, count_a) in enumerate(dirs):
+                    for dir_b, count_b in dirs[i:]:
+                        if dir_a == dir_b:
+                            pairs = count_a * (count_a - 1) // 2
+                        else:
+                            pairs = count_a * count_b
+                        probability = joint_inclusion(dir_a, dir_b)
+                        if not pairs:
+                            continue
+                        pairs_found += pairs
+                        pair_estimate += pairs / probability
+                        pair_variance += pairs * (1 - probability) / probability ** 2
+
+        def interval(estimate: float, variance: float) -> Dict:
+            margin = _Z_95 * math.sqrt(variance)
+            return {'estimate': round(estimate), 'low': round(max(0.0, estimate - margin)),
+                    'high': round(estimate + margin)}
+
+        duplicate_bytes = interval(byte_estimate, byte_variance)
+        return {
+            'algorithm': f"{algorithm}/partial-{Deduplicator.PARTIAL_BLOCK_SIZE}",
+            'sampled_files_hashed': hashed_files,
+            'placeholders_skipped': placeholders_skipped,
+            'duplicate_copies_found': copies_found,
+            'duplicate_copies': interval(copy_estimate, copy_variance),
+            'duplicate_pairs_found': pairs_found,
+            'duplicate_pairs': interval(pair_estimate, pair_variance),
+            'duplicate_bytes': duplicate_bytes,
+            'duplicate_ratio': round(duplicate_bytes['estimate'] / total_size, 4) if total_size else 0.0,
+        }
@@ -3,14 +3,29 @@
 Scans iCloud/Dropbox/drives with file classification and deduplication.
 """
 
+import math
 import os
-from pathlib import Path
-from typing import Dict, List, Set, Optional
+import queue
+import threading
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, Set, Optional, Tuple, Union
 from datetime import datetime
 
 from ..utils.file_utils import (
-    FileClassifier, FileHasher, Deduplicator, extract_file_metadata
+    FileClassifier, FileHasher, HashEngine, Deduplicator, ThroughputLimiter, extract_file_metadata
 )
+from ..utils.directory_tree import DirectoryTree
+from ..utils.archive_members import (
+    MEMBER_SEPARATOR, ArchiveMember, ArchiveMemberReader, MemberStat, archive_kind
+)
+from ..utils.chunking import CHUNK_AVG_SIZE, Chunker, ChunkIndex
+from ..utils.content_sniffer import SNIFF_CACHE_ALGORITHM, sniff_bytes, sniff_file
+from ..utils.exclude_matcher import ExcludeMatcher
+from ..utils.external_dedup import ExternalDeduplicator
+from ..utils.hash_cache import HashCache
+from ..utils.placeholders import detect_placeholder
+from ..utils.record_store import FileRecordIndex, FileRecordStore
+from ..utils.scan_checkpoint import ScanCheckpoint
 
 
 class ArchiveScanner:
@@ -19,13 +34,89 @@ class ArchiveScanner:
     Supports local file systems, network drives, and common cloud storage mounts.
     """
     
-    def __init__(self, exclude_patterns: Optional[List[str]] = None):
+    def __init__(self, exclude_patterns: Optional[List[str]] = None,
+                 hash_cache: Optional[HashCache] = None,
+                 hash_engine: Optional[HashEngine] = None,
+                 hash_algorithm: str = 'sha256',
+                 confirm_algorithm: Optional[str] = None,
+                 exclude_file: Optional[str] = None,
+                 checkpoint_dir: Optional[str] = None,
+                 checkpoint_interval: float = 300.0,
+                 dedup_memory_budget: Optional[int] = None,
+                 dedup_work_dir: Optional[str] = None,
+                 read_limiter: Optional[ThroughputLimiter] = None,
+                 hydrate_placeholders: bool = False,
+                 tree_depth: int = 2,
+                 tree_top_n: int = 20,
+                 sniff_content: bool = True,
+                 archive_members: bool = False,
+                 archive_max_depth: int = 2,
+                 archive_max_bytes: int = 4 * 1024 * 1024 * 1024,
+                 chunk_analysis: bool = False,
+                 chunk_avg_size: int = CHUNK_AVG_SIZE,
+                 chunk_min_file_size: int = 1024 * 1024,
+                 chunk_memory_budget: int = 64 * 1024 * 1024):
         """
         Initialize the archive scanner.
         
         Args:
-            exclude_patterns: List of patterns to exclude (e.g., ['*.tmp', '__pycache__'])
+            exclude_patterns: List of glob patterns to exclude (e.g., ['*.tmp', '__pycache__']).
+                Patterns without '/' match entry names at any depth; patterns
+                with '/' match paths relative to the scan root.
+            hash_cache: Optional persistent hash cache shared across scans, so
+                unchanged files are not re-read on rescans
+            hash_engine: Optional thread/process pool used to hash duplicate
+                candidates concurrently
+            hash_algorithm: Hash backend used for deduplication (e.g. 'sha256',
+                or 'xxh3_128' / 'blake2b-128' for speed)
+            confirm_algorithm: Optional cryptographic backend that re-verifies
+                final duplicate groups
+            exclude_file: Optional .gitignore-style rules file, applied after
+                exclude_patterns
+            checkpoint_dir: Optional directory for scan checkpoints; when set,
+                scans save their progress periodically and can be resumed
+            checkpoint_interval: Minimum seconds between checkpoint saves
+            dedup_memory_budget: When set, deduplicate with sorted run files
+                on disk (ExternalDeduplicator), buffering about this many
+                bytes of records in memory
+            dedup_work_dir: Directory for the external dedup run files
+                (system temp dir if None)
+            read_limiter: Optional throughput limiter for hash reads
+            hydrate_placeholders: Hash cloud placeholders (dataless and
+                on-demand files) like local files, which makes the sync
+                client download them. By default they are recorded as
+                remote-only and left out of deduplication.
+            tree_depth: Depth of the per-directory rollup in the results
+            tree_top_n: Number of heaviest subtrees listed in the results
+                (also the most children shown per directory in the rollup)
+            sniff_content: Classify files whose extension is unknown or
+                missing from their first few KiB (magic bytes, text)
+            archive_members: Also record and deduplicate the files inside
+                zip, tar and compressed archives, under virtual paths such
+                as 'backup.zip!/docs/a.pdf'. Members are hashed while the
+                archive is streamed; only nested archives are spooled to a
+                temporary file. Member digests go to the hash cache, so
+                unchanged archives are not hashed again.
+            archive_max_depth: Archive nesting levels to read
+            archive_max_bytes: Decompressed bytes read from one archive at
+                most; members past the limit are skipped
+            chunk_analysis: Also report chunk-level duplication: files are
+                split with content-defined chunking, so near-identical files
+                (edited videos, appended logs, re-saved disk images) count
+                the bytes they share, not just exact copies. The chunker is
+                pure Python and reads about 5 MB/s.
+            chunk_avg_size: Target chunk size (a power of two); chunks are
+                between a quarter and four times this size
+            chunk_min_file_size: Smallest file that is chunked
+            chunk_memory_budget: Approximate bytes the chunk index may use;
+                beyond it chunks are sampled and duplicate bytes estimated
+        
+        Raises:
+            ValueError: If external dedup is combined with checkpoints, whose
+                state it cannot capture
         """
+        if dedup_memory_budget is not None and checkpoint_dir:
+            raise ValueError('External deduplication cannot be combined with scan checkpoints')
         self.exclude_patterns = exclude_patterns or [
             '__pycache__',
             '.git',
@@ -36,30 +127,99 @@ def __init__(self, exclude_patterns: Optional[List[str]] = None):
             '*.tmp',
             '*.swp',
         ]
-        self.deduplicator = Deduplicator()
-        self.scanned_files: List[Dict] = []
-        self.stats = {
+        if exclude_file:
+            self.exclude_matcher = ExcludeMatcher.from_file(exclude_file, self.exclude_patterns)
+        else:
+            self.exclude_matcher = ExcludeMatcher(self.exclude_patterns)
+        self._scan_root: Optional[str] = None
+        # Directories below the root that another location of a combined
+        # scan walks itself
+        self._nested_roots: Set[str] = set()
+        self.hash_cache = hash_cache
+        self.hash_engine = hash_engine
+        self.hash_algorithm = hash_algorithm
+        self.confirm_algorithm = confirm_algorithm
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_interval = checkpoint_interval
+        self.dedup_memory_budget = dedup_memory_budget
+        self.dedup_work_dir = dedup_work_dir
+        self.read_limiter = read_limiter
+        self.hydrate_placeholders = hydrate_placeholders
+        self.tree_depth = tree_depth
+        self.tree_top_n = tree_top_n
+        self.sniff_content = sniff_content
+        self.archive_members = archive_members
+        self.archive_max_depth = archive_max_depth
+        self.archive_max_bytes = archive_max_bytes
+        self.chunk_analysis = chunk_analysis
+        self.chunk_avg_size = chunk_avg_size
+        self.chunker = Chunker(chunk_avg_size // 4, chunk_avg_size, chunk_avg_size * 4) if chunk_analysis else None
+        self.chunk_min_file_size = chunk_min_file_size
+        self.chunk_memory_budget = chunk_memory_budget
+        # Chunk report of the current records, built on first request
+        self._chunk_report: Optional[Dict] = None
+        # Member records built for iter_scan when records are not kept
+        self._member_records: List[Dict] = []
+        self._checkpoint: Optional[ScanCheckpoint] = None
+        self._checkpoint_options: Dict = {}
+        # Files recorded since the last checkpoint save, while checkpointing
+        self._journal: Optional[List[Tuple]] = None
+        # Hash cache opened for the checkpoint when none was configured
+        self._checkpoint_cache: Optional[HashCache] = None
+        self.deduplicator = self._new_deduplicator()
+        self.scanned_files = FileRecordStore()
+        self.index: Optional[FileRecordIndex] = None
+        self.directory_tree: Optional[DirectoryTree] = None
+        # Record id per path, built on the first incremental update along
+        # with the record ids per directory and per archive (for members)
+        # and the subdirectories holding records, so removals cost
+        # O(changes)
+        self._record_ids: Optional[Dict[str, int]] = None
+        self._dir_record_ids: Dict[str, Set[int]] = {}
+        self._member_record_ids: Dict[str, Set[int]] = {}
+        self._subdirs: Dict[str, Set[str]] = {}
+        self.stats = self._new_stats()
+    
+    @staticmethod
+    def _new_stats() -> Dict:
+        """Create empty scan statistics."""
+        return {
             'total_files': 0,
             'total_size': 0,
             'by_category': {},
+            'remote_only_files': 0,
+            'remote_only_size': 0,
+            'archive_member_files': 0,
+            'archive_member_size': 0,
             'errors': [],
         }
     
-    def should_exclude(self, path: Path) -> bool:
-        """Check if a path should be excluded."""
-        path_str = str(path)
-        
-        for pattern in self.exclude_patterns:
-            # Simple pattern matching
-            if pattern.startswith('*'):
-                if path_str.endswith(pattern[1:]):
-                    return True
-            elif pattern in path_str:
-                return True
-        
-        return False
+    def _new_deduplicator(self) -> Deduplicator:
+        """Create a deduplicator configured like this scanner."""
+        if self.dedup_memory_budget is not None:
+            return ExternalDeduplicator(
+                work_dir=self.dedup_work_dir,
+                memory_budget=self.dedup_memory_budget,
+                hash_cache=self.hash_cache,
+                hash_engine=self.hash_engine,
+                algorithm=self.hash_algorithm,
+                confirm_algorithm=self.confirm_algorithm,
+                read_limiter=self.read_limiter,
+            )
+        return Deduplicator(
+            hash_cache=self.hash_cache,
+            hash_engine=self.hash_engine,
+            algorithm=self.hash_algorithm,
+            confirm_algorithm=self.confirm_algorithm,
+            read_limiter=self.read_limiter,
+        )
     
-    def scan_directory(self, root_path: str, recursive: bool = True, max_depth: Optional[int] = None) -> Dict:
+    def should_exclude(self, path: Union[str, Path], is_dir: bool = False) -> bool:
+        """Check if a path, or any of its parent directories below the scan root, should be excluded."""
+        return self.exclude_matcher.match_path(path, root=self._scan_root, is_dir=is_dir)
+    
+    def scan_directory(self, root_path: str, recursive: bool = True, max_depth: Optional[int] = None,
+                       workers: int = 1, resume: bool = False) -> Dict:
         """
         Scan a directory and classify all files.
         
@@ -67,156 +227,1131 @@ def scan_directory(self, root_path: str, recursive: bool = True, max_depth: Opti
             root_path: Root directory to scan
             recursive: Whether to scan subdirectories
             max_depth: Maximum depth to scan (None for unlimited)
+            workers: Number of threads listing directories. Values above 1
+                help on high-latency network and cloud mounts.
+            resume: Continue from this root's checkpoint, if one exists
+                (requires checkpoint_dir)
             
         Returns:
             Scan results dictionary
         """
+        try:
+            for _ in self.iter_scan(root_path, recursive=recursive, max_depth=max_depth,
+                                    workers=workers, keep_records=True, emit_records=False,
+                                    resume=resume):
+                pass
+        except ValueError as e:
+            return {'error': str(e)}
+        
+        return self._finish_scan()
+    
+    def _finish_scan(self) -> Dict:
+        """Index the scanned records, find duplicates and build the results."""
+        self.build_indexes()
+        results = self.get_results()
+        if self.hash_cache is not None:
+            self.hash_cache.commit()
+        if self._checkpoint is not None:
+            self._close_checkpoint()
+        return results
+    
+    def _close_checkpoint(self):
+        """Stop checkpointing and remove the checkpoint of a finished scan."""
+        if self._checkpoint_cache is not None:
+            self._checkpoint_cache.close()
+            self._checkpoint_cache = None
+            self.deduplicator.hash_cache = self.hash_cache
+        self._checkpoint.clear()
+        self._checkpoint = None
+        self._journal = None
+    
+    def iter_scan(self, root_path: str, recursive: bool = True, max_depth: Optional[int] = None,
+                  workers: int = 1, keep_records: bool = False, emit_records: bool = True,
+                  resume: bool = False) -> Iterator[Dict]:
+        """
+        Scan a directory, yielding each file record as soon as it is processed.
+        
+        Statistics and the deduplication index are built as the scan goes;
+        call get_results(include_files=False) once the iterator is exhausted
+        for the summary. With keep_records=False, records are not retained,
+        so memory stays flat however many files are scanned.
+        
+        Args:
+            root_path: Root directory to scan
+            recursive: Whether to scan subdirectories
+            max_depth: Maximum depth to scan (None for unlimited)
+            workers: Number of threads listing directories
+            keep_records: Also keep records in scanned_files
+            emit_records: Build and yield a record dict per file
+            resume: Continue from this root's checkpoint, if one exists;
+                only files not processed before the checkpoint are yielded
+            
+        Yields:
+            File metadata dicts in the extract_file_metadata() shape
+            
+        Raises:
+            ValueError: If root_path does not exist or is not a directory,
+                or if resuming from a checkpoint written with other scan
+                options (rules deciding which files are recorded and how)
+        """
+        root = self._begin_scan(root_path)
+        frontier = [(str(root), 0)]
+        
+        if self._checkpoint_cache is not None:
+            self._checkpoint_cache.close()
+            self._checkpoint_cache = None
+        self._checkpoint = None
+        self._journal = None
+        if self.checkpoint_dir:
+            self._checkpoint = ScanCheckpoint.for_root(self.checkpoint_dir, root, self.checkpoint_interval)
+            self._checkpoint_options = {
+                'root': str(root),
+                'recursive': recursive,
+                'max_depth': max_depth,
+                'hash_algorithm': self.hash_algorithm,
+                'confirm_algorithm': self.confirm_algorithm,
+                'archive_members': self.archive_members,
+                'sniff_content': self.sniff_content,
+                'hydrate_placeholders': self.hydrate_placeholders,
+                # The rules in effect, exclude file contents included
+                'exclude_rules': [rule.pattern for rule in self.exclude_matcher.rules],
+            }
+            state = self._checkpoint.load() if resume else None
+            if state is not None:
+                saved = state.get('options') or {}
+                changed = sorted(key for key in self._checkpoint_options
+                                 if saved.get(key) != self._checkpoint_options[key])
+                if changed:
+                    raise ValueError(f"Checkpoint for {root} was saved with different options "
+                                     f"({', '.join(changed)}); rerun with the same options, "
+                                     f"or without resuming to start over")
+            else:
+                self._checkpoint.clear()
+            if self.hash_cache is None:
+                # Without a hash cache, a crash during the duplicate search
+                # would lose every digest computed so far
+                self._checkpoint_cache = HashCache(str(self._checkpoint.hash_cache_path))
+                self.deduplicator.hash_cache = self._checkpoint_cache
+            self._journal = []
+            if state is not None:
+                frontier = self._restore_checkpoint(state)
+                print(f"Resuming scan: {self.stats['total_files']} files done, "
+                      f"{len(frontier)} directories left")
+        
+        if workers > 1:
+            walker = self._walk_parallel(root, max_depth=max_depth, recursive=recursive, workers=workers,
+                                         frontier=frontier)
+        else:
+            walker = self._walk(root, max_depth=max_depth, recursive=recursive, frontier=frontier)
+        
+        for file_path, stat_result in walker:
+            record_id = len(self.scanned_files)
+            processed = self._process_file(file_path, stat_result, keep_record=keep_records)
+            member_records, self._member_records = self._member_records, []
+            if processed is None or not emit_records:
+                continue
+            if keep_records:
+                # The file's record, then those of any archive members
+                for new_id in range(record_id, len(self.scanned_files)):
+                    yield self.scanned_files.to_dict(new_id)
+            else:
+                category, placeholder, mime_type = processed
+                record = extract_file_metadata(file_path, stat_result)
+                record['category'] = category
+                if mime_type is not None:
+                    record['mime_type'] = mime_type
+                if placeholder is not None:
+                    record['size'] = placeholder['size']
+                    record['remote_only'] = True
+                yield record
+                yield from member_records
+        
+        # The walk is complete; a crash while hashing resumes straight to the
+        # duplicate search, which takes the digests already computed from
+        # the hash cache
+        if self._checkpoint is not None:
+            self._save_checkpoint([])
+    
+    def _save_checkpoint(self, frontier: List[Tuple[str, int]]):
+        """
+        Save the scan state with the directories still to be listed.
+        
+        Only the files recorded since the previous save are written, to the
+        checkpoint's journal; the state file itself stays small.
+        """
+        journal_size = self._checkpoint.append(self._journal)
+        self._journal = []
+        if self.deduplicator.hash_cache is not None:
+            self.deduplicator.hash_cache.commit()
+        self._checkpoint.save({
+            'options': self._checkpoint_options,
+            'frontier': list(frontier),
+            'journal_size': journal_size,
+            'stats': self.stats,
+        })
+    
+    def _restore_checkpoint(self, state: Dict) -> List[Tuple[str, int]]:
+        """
+        Rebuild the scan state saved in a checkpoint.
+        
+        The journal is replayed through the same bookkeeping that recorded
+        each file, so the records, directory tree and dedup index come back
+        without touching the files again.
+        
+        Returns:
+            Directories still to be listed
+        """
+        journal, self._journal = self._journal, None
+        for entry in self._checkpoint.iter_journal(state['journal_size']):
+            if entry[0] == 'file':
+                self._add_file_record(Path(entry[1]), *entry[2:])
+            else:
+                self._add_member_record(*entry[1:])
+        self._journal = journal
+        self._member_records = []
+        self.stats = state['stats']
+        return state['frontier']
+    
+    def _begin_scan(self, root_path: str, deduplicator: Optional[Deduplicator] = None) -> Path:
+        """
+        Validate a scan root and reset per-scan state.
+        
+        Args:
+            root_path: Root directory to scan
+            deduplicator: Deduplicator to feed instead of a fresh one (used
+                when several locations share one dedup index)
+            
+        Returns:
+            The resolved root path
+            
+        Raises:
+            ValueError: If root_path does not exist or is not a directory
+        """
         root = Path(root_path).resolve()
         
         if not root.exists():
-            return {'error': f"Path does not exist: {root_path}"}
+            raise ValueError(f"Path does not exist: {root_path}")
         
         if not root.is_dir():
-            return {'error': f"Path is not a directory: {root_path}"}
+            raise ValueError(f"Path is not a directory: {root_path}")
         
         print(f"Scanning directory: {root}")
-        self.scanned_files = []
-        self.deduplicator = Deduplicator()
-        self.stats = {
-            'total_files': 0,
-            'total_size': 0,
-            'by_category': {},
-            'errors': [],
-        }
+        self._scan_root = str(root)
+        self._nested_roots = set()
+        self.scanned_files = FileRecordStore()
+        self._record_ids = None
+        self.index = None
+        self._chunk_report = None
+        if deduplicator is None:
+            # The previous scan's results are already built
+            self.deduplicator.close()
+            deduplicator = self._new_deduplicator()
+        self.deduplicator = deduplicator
+        self.directory_tree = DirectoryTree(self._scan_root)
+        self.stats = self._new_stats()
+        return root
+    
+    def _list_directory(self, dir_path: str, depth: int, max_depth: Optional[int],
+                        recursive: bool) -> Tuple[List[Tuple[Path, os.stat_result]], List[Tuple[str, int]], List[str]]:
+        """
+        List a single directory with os.scandir.
         
-        self._scan_recursive(root, current_depth=0, max_depth=max_depth, recursive=recursive)
+        Returns:
+            Tuple of (files, subdirectories, errors). Files carry the stat
+            result taken from their DirEntry; subdirectories carry their depth.
+        """
+        files: List[Tuple[Path, os.stat_result]] = []
+        subdirs: List[Tuple[str, int]] = []
+        errors: List[str] = []
         
-        return self.get_results()
+        matcher = self.exclude_matcher
+        rel_prefix = None
+        if matcher.has_path_rules:
+            rel_prefix = os.path.relpath(dir_path, self._scan_root).replace(os.sep, '/')
+            rel_prefix = '' if rel_prefix == '.' else rel_prefix + '/'
+        
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    # Excluded directories are pruned here, before they are listed
+                    is_dir = entry.is_dir()
+                    rel_path = rel_prefix + entry.name if rel_prefix is not None else None
+                    if matcher.excludes(entry.name, is_dir, rel_path):
+                        continue
+                    if is_dir and entry.path in self._nested_roots:
+                        continue
+                    
+                    if is_dir:
+                        if recursive and (max_depth is None or depth + 1 <= max_depth):
+                            subdirs.append((entry.path, depth + 1))
+                    elif entry.is_file():
+                        try:
+                            files.append((Path(entry.path), entry.stat()))
+                        except OSError as e:
+                            errors.append(f"Error processing {entry.path}: {str(e)}")
+        except PermissionError:
+            errors.append(f"Permission denied: {dir_path}")
+        except Exception as e:
+            errors.append(f"Error scanning {dir_path}: {str(e)}")
+        
+        return files, subdirs, errors
+    
+    def _walk(self, root: Path, max_depth: Optional[int], recursive: bool,
+              frontier: Optional[List[Tuple[str, int]]] = None) -> Iterator[Tuple[Path, os.stat_result]]:
+        """
+        Walk a directory tree with os.scandir and an explicit stack.
+        
+        Yields (path, stat_result) for every regular file. The stat result is
+        taken once from the DirEntry and reused for metadata, deduplication and
+        statistics, and the explicit stack keeps deep trees clear of the
+        recursion limit. The stack is the checkpoint frontier: between two
+        directories every yielded file has been processed.
+        """
+        stack: List[Tuple[str, int]] = list(frontier) if frontier is not None else [(str(root), 0)]
+        
+        while stack:
+            if self._checkpoint is not None and self._checkpoint.due():
+                self._save_checkpoint(stack)
+            dir_path, depth = stack.pop()
+            files, subdirs, errors = self._list_directory(dir_path, depth, max_depth, recursive)
+            self.stats['errors'].extend(errors)
+            stack.extend(subdirs)
+            yield from files
     
-    def _scan_recursive(self, path: Path, current_depth: int, max_depth: Optional[int], recursive: bool):
-        """Recursively scan a directory."""
-        if max_depth is not None and current_depth > max_depth:
+    def _walk_parallel(self, root: Path, max_depth: Optional[int], recursive: bool,
+                       workers: int, frontier: Optional[List[Tuple[str, int]]] = None
+                       ) -> Iterator[Tuple[Path, os.stat_result]]:
+        """
+        Walk a directory tree with a pool of threads sharing a directory queue.
+        
+        Worker threads only list and stat directories, which is I/O-bound on
+        network and cloud mounts. Their results are merged back on the calling
+        thread, so statistics and deduplication are never touched concurrently.
+        The calling thread also tracks which directories have not been merged
+        yet; that set is the checkpoint frontier, and the walk ends when it
+        is empty.
+        """
+        if frontier is None:
+            frontier = [(str(root), 0)]
+        if not frontier:
             return
         
-        try:
-            for item in path.iterdir():
-                if self.should_exclude(item):
+        work_queue: queue.Queue = queue.Queue()
+        results_queue: queue.Queue = queue.Queue()
+        stop = threading.Event()
+        
+        def worker():
+            while True:
+                item = work_queue.get()
+                if item is None:
+                    return
+                if stop.is_set():
                     continue
-                
-                if item.is_file():
-                    self._process_file(item)
-                elif item.is_dir() and recursive:
-                    self._scan_recursive(item, current_depth + 1, max_depth, recursive)
-        except PermissionError as e:
-            self.stats['errors'].append(f"Permission denied: {path}")
-        except Exception as e:
-            self.stats['errors'].append(f"Error scanning {path}: {str(e)}")
+                dir_path, depth = item
+                files, subdirs, errors = self._list_directory(dir_path, depth, max_depth, recursive)
+                # A directory's result is queued before its subdirectories
+                # can be listed, so it always reaches the caller first
+                results_queue.put((item, files, subdirs, errors))
+                for subdir in subdirs:
+                    work_queue.put(subdir)
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        outstanding: Set[Tuple[str, int]] = set(frontier)
+        for item in frontier:
+            work_queue.put(item)
+        
+        # Directories listed but not yet merged, counted here rather than by
+        # the workers, so the walk cannot end while a result is in flight
+        remaining = len(frontier)
+        try:
+            while remaining:
+                if self._checkpoint is not None and self._checkpoint.due():
+                    self._save_checkpoint(sorted(outstanding))
+                item, files, subdirs, errors = results_queue.get()
+                remaining += len(subdirs) - 1
+                outstanding.discard(item)
+                outstanding.update(subdirs)
+                self.stats['errors'].extend(errors)
+                yield from files
+        finally:
+            stop.set()
+            for _ in threads:
+                work_queue.put(None)
     
-    def _process_file(self, file_path: Path):
-        """Process a single file."""
+    def _process_file(self, file_path: Path, stat_result: Optional[os.stat_result] = None,
+                      keep_record: bool = True) -> Optional[Tuple[str, Optional[Dict], Optional[str]]]:
+        """
+        Process a single file.
+        
+        Cloud placeholders are counted with the size their sync client
+        reports and, unless hydrate_placeholders is set, never opened.
+        
+        Returns:
+            (category, placeholder info or None, sniffed MIME type or None),
+            or None if the file could not be processed
+        """
         try:
-            metadata = extract_file_metadata(file_path)
+            if stat_result is None:
+                stat_result = file_path.stat()
+            placeholder = detect_placeholder(file_path, stat_result)
+            mime_type = None
+            if placeholder is None:
+                category = FileClassifier.classify(file_path)
+                file_size = stat_result.st_size
+                if category == 'other' and self.sniff_content and file_size:
+                    sniffed = self._sniff(file_path, stat_result)
+                    if sniffed is not None:
+                        category, mime_type = sniffed
+            else:
+                # iCloud stubs are named after the file they stand in for
+                category = FileClassifier.classify(file_path.with_name(placeholder['name']))
             
-            # Update statistics
-            self.stats['total_files'] += 1
-            self.stats['total_size'] += metadata.get('size', 0)
+            self._add_file_record(file_path, stat_result, category, placeholder, mime_type, keep_record)
+            if self.archive_members and placeholder is None and archive_kind(file_path.name) is not None:
+                self._scan_archive(file_path, stat_result, keep_record)
+            return category, placeholder, mime_type
             
-            category = metadata.get('category', 'other')
-            self.stats['by_category'][category] = self.stats['by_category'].get(category, 0) + 1
+        except Exception as e:
+            self.stats['errors'].append(f"Error processing {file_path}: {str(e)}")
+            return None
+    
+    def _add_file_record(self, file_path: Path, stat_result: os.stat_result, category: str,
+                         placeholder: Optional[Dict], mime_type: Optional[str], keep_record: bool):
+        """
+        Count, index and record a classified file.
+        
+        Reads nothing, so checkpoint journals replay it on resume.
+        """
+        file_size = stat_result.st_size if placeholder is None else placeholder['size']
+        if self._journal is not None:
+            self._journal.append(('file', str(file_path), stat_result, category, placeholder,
+                                  mime_type, keep_record))
+        
+        # Update statistics
+        self.stats['total_files'] += 1
+        self.stats['total_size'] += file_size
+        
+        self.stats['by_category'][category] = self.stats['by_category'].get(category, 0) + 1
+        if placeholder is not None:
+            self.stats['remote_only_files'] += 1
+            self.stats['remote_only_size'] += file_size
+        if self.directory_tree is not None:
+            self.directory_tree.add_file(os.path.dirname(str(file_path)), file_size, category)
+        
+        # Add to deduplicator; hashing a placeholder would download it,
+        # and an iCloud stub holds no content at all
+        if placeholder is None or (self.hydrate_placeholders and placeholder['reason'] != 'icloud-stub'):
+            self.deduplicator.add_file(file_path, stat_result=stat_result)
+        
+        # Store file info; dicts are only built when results are requested
+        if keep_record:
+            self.scanned_files.append(file_path, stat_result, category,
+                                      remote_only=placeholder is not None, size=file_size,
+                                      mime_type=mime_type)
+    
+    def _scan_archive(self, archive_path: Path, stat_result: os.stat_result, keep_record: bool):
+        """
+        Record and index the members of an archive in one streaming pass.
+        
+        Members count towards the archive_member_* statistics rather than
+        total_files and total_size, which already include the archive
+        itself, and they are left out of the directory tree.
+        """
+        hash_cache = self.deduplicator.hash_cache
+        reader = ArchiveMemberReader(
+            algorithm=self.hash_algorithm,
+            confirm_algorithm=self.confirm_algorithm,
+            block_size=Deduplicator.PARTIAL_BLOCK_SIZE,
+            max_depth=self.archive_max_depth,
+            max_bytes=self.archive_max_bytes,
+            limiter=self.read_limiter,
+            hash_cache=hash_cache,
+        )
+        cache_key = HashCache.key_for(stat_result) if hash_cache is not None else None
+        try:
+            for member in reader.iter_members(archive_path):
+                name_path = PurePosixPath(member.name)
+                category = FileClassifier.classify(name_path)
+                mime_type = None
+                if category == 'other':
+                    sniffed = self._sniff_member(member, str(archive_path), cache_key)
+                    if sniffed is not None:
+                        category, mime_type = sniffed
+                member_stat = MemberStat(member.size, member.mtime_ns,
+                                         stat_result.st_ctime_ns, stat_result.st_atime_ns)
+                self._add_member_record(member, member_stat, category, mime_type, keep_record)
+        except Exception as e:
+            self.stats['errors'].append(f"Error reading archive {archive_path}: {str(e)}")
+    
+    def _add_member_record(self, member: ArchiveMember, member_stat: MemberStat, category: str,
+                           mime_type: Optional[str], keep_record: bool):
+        """Count, index and record an archive member; like _add_file_record, replayable."""
+        if self._journal is not None:
+            # The head was only needed for sniffing
+            self._journal.append(('member', member._replace(head=b''), member_stat, category,
+                                  mime_type, keep_record))
+        self.stats['archive_member_files'] += 1
+        self.stats['archive_member_size'] += member.size
+        # The virtual path is kept as is; Path() would normalize it
+        self.deduplicator.add_member(member.path, member.size, member.compressed_size,
+                                     member.partial_hash, member.full_hash, member.confirm_hash)
+        
+        if keep_record:
+            self.scanned_files.append(member.path, member_stat, category, archive_member=True,
+                                      mime_type=mime_type)
+        else:
+            name_path = PurePosixPath(member.name)
+            self._member_records.append({
+                'name': name_path.name,
+                'path': member.path,
+                'size': member.size,
+                'created': datetime.fromtimestamp(member_stat.st_ctime_ns / 1e9).isoformat(),
+                'modified': datetime.fromtimestamp(member_stat.st_mtime_ns / 1e9).isoformat(),
+                'accessed': datetime.fromtimestamp(member_stat.st_atime_ns / 1e9).isoformat(),
+                'category': category,
+                'mime_type': mime_type or FileClassifier.get_mime_type(name_path),
+                'extension': name_path.suffix.lower(),
+                'archive_member': True,
+            })
+    
+    def _sniff(self, file_path: Path, stat_result: os.stat_result) -> Optional[Tuple[str, str]]:
+        """
+        Classify a file by content, reading at most its first few KiB.
+        
+        Results are kept in the hash cache, so unchanged files are not
+        opened again on rescans.
+        
+        Returns:
+            (category, MIME type), or None if the content was not recognized
+        """
+        key = HashCache.key_for(stat_result) if self.hash_cache is not None else None
+        if key is not None:
+            # Not a hash, so kept out of the hash cache's hit rate
+            cached = self.hash_cache.get(key, SNIFF_CACHE_ALGORITHM, count=False)
+            if cached is not None:
+                category, _, mime_type = cached.partition('\t')
+                return (category, mime_type) if mime_type else None
+        sniffed = sniff_file(file_path, self.read_limiter)
+        if key is not None:
+            self.hash_cache.put(key, SNIFF_CACHE_ALGORITHM, '\t'.join(sniffed) if sniffed else 'other', file_path)
+        return sniffed
+    
+    def _sniff_member(self, member: ArchiveMember, archive_path: str,
+                      cache_key: Optional[Tuple[int, int, int, int]]) -> Optional[Tuple[str, str]]:
+        """
+        Classify an archive member by its head, like _sniff.
+        
+        Members whose hashes come from the hash cache have no head, so the
+        result is cached next to them under the archive's key, whether or
+        not sniffing is enabled for this scan.
+        
+        Returns:
+            (category, MIME type), or None if the content was not recognized
+            or sniffing is disabled
+        """
+        algorithm = f"{SNIFF_CACHE_ALGORITHM}{member.path[len(archive_path):]}"
+        if member.head or not member.size:
+            sniffed = sniff_bytes(member.head)
+            if cache_key is not None:
+                self.deduplicator.hash_cache.put(cache_key, algorithm,
+                                                 '\t'.join(sniffed) if sniffed else 'other', archive_path)
+        elif cache_key is not None:
+            cached = self.deduplicator.hash_cache.get(cache_key, algorithm, count=False)
+            category, _, mime_type = (cached or '').partition('\t')
+            sniffed = (category, mime_type) if mime_type else None
+        else:
+            sniffed = None
+        return sniffed if self.sniff_content else None
+    
+    def _record_id_map(self) -> Dict[str, int]:
+        """Map each recorded path to its record id, building the removal indexes."""
+        if self._record_ids is None:
+            store = self.scanned_files
+            self._record_ids = {}
+            self._dir_record_ids = {}
+            self._member_record_ids = {}
+            self._subdirs = {}
+            for record_id in range(len(store)):
+                self._record_ids[store.path(record_id)] = record_id
+                self._record_group(record_id).add(record_id)
+        return self._record_ids
+    
+    def _record_group(self, record_id: int) -> Set[int]:
+        """
+        Return the set of record ids a record belongs to: its archive's
+        members for an archive member, otherwise its directory's files.
+        """
+        store = self.scanned_files
+        if store.archive_member[record_id]:
+            archive = store.path(record_id).split(MEMBER_SEPARATOR, 1)[0]
+            return self._member_record_ids.setdefault(archive, set())
+        directory = store.directory(record_id)
+        group = self._dir_record_ids.get(directory)
+        if group is None:
+            group = self._dir_record_ids[directory] = set()
+            # Link the directory into its ancestors, up to the first known one
+            while True:
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                known = parent in self._subdirs
+                self._subdirs.setdefault(parent, set()).add(directory)
+                if known:
+                    break
+                directory = parent
+        return group
+    
+    def remove_file(self, file_path: Union[str, Path]) -> bool:
+        """
+        Drop a scanned file from the records, statistics and dedup index.
+        
+        Used to apply deletions and renames after a scan without walking
+        the archive again.
+        
+        Args:
+            file_path: Path of a file recorded by the last scan
             
-            # Add to deduplicator
-            self.deduplicator.add_file(file_path)
+        Returns:
+            Whether the file was recorded
+        """
+        path_str = str(file_path)
+        record_ids = self._record_id_map()
+        record_id = record_ids.pop(path_str, None)
+        if record_id is None:
+            return False
+        
+        store = self.scanned_files
+        file_size = store.size[record_id]
+        if store.archive_member[record_id]:
+            self.stats['archive_member_files'] -= 1
+            self.stats['archive_member_size'] -= file_size
+            self.deduplicator.remove_file(path_str, file_size)
+            self._remove_record(record_id)
+            return True
+        
+        category = store.category(record_id)
+        self.stats['total_files'] -= 1
+        self.stats['total_size'] -= file_size
+        self.stats['by_category'][category] -= 1
+        if not self.stats['by_category'][category]:
+            del self.stats['by_category'][category]
+        if store.remote_only[record_id]:
+            self.stats['remote_only_files'] -= 1
+            self.stats['remote_only_size'] -= file_size
+        if self.directory_tree is not None:
+            self.directory_tree.remove_file(os.path.dirname(path_str), file_size, category)
+        # Placeholders that were never indexed are simply not found
+        self.deduplicator.remove_file(Path(path_str), file_size)
+        self._remove_record(record_id)
+        
+        member_ids = self._member_record_ids.get(path_str)
+        if member_ids:
+            for member_path in [store.path(member_id) for member_id in member_ids]:
+                self.remove_file(member_path)
+        self._member_record_ids.pop(path_str, None)
+        return True
+    
+    def remove_directory(self, directory: Union[str, Path]) -> int:
+        """
+        Drop every scanned file below a directory, e.g. one deleted after the scan.
+        
+        Only the directory's own subtree is visited.
+        
+        Args:
+            directory: Directory path as recorded by the last scan
             
-            # Store file info
-            self.scanned_files.append(metadata)
+        Returns:
+            Number of files removed, archive members not included
+        """
+        directory = str(directory)
+        self._record_id_map()
+        store = self.scanned_files
+        removed = 0
+        parent_subdirs = self._subdirs.get(os.path.dirname(directory))
+        if parent_subdirs is not None:
+            parent_subdirs.discard(directory)
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            stack.extend(self._subdirs.pop(current, ()))
+            record_ids = self._dir_record_ids.get(current)
+            if record_ids:
+                for file_path in [store.path(record_id) for record_id in record_ids]:
+                    removed += self.remove_file(file_path)
+            self._dir_record_ids.pop(current, None)
+        return removed
+    
+    def _remove_record(self, record_id: int):
+        """Delete a record from the store, keeping the removal indexes in step."""
+        store = self.scanned_files
+        self._record_group(record_id).discard(record_id)
+        moved = store.remove(record_id)
+        if moved is not None:
+            self._record_ids[store.path(record_id)] = record_id
+            group = self._record_group(record_id)
+            group.discard(moved)
+            group.add(record_id)
+        self.index = None
+        self._chunk_report = None
+    
+    def update_file(self, file_path: Union[str, Path], stat_result: Optional[os.stat_result] = None) -> bool:
+        """
+        Record a file created or changed after the last scan.
+        
+        A file whose size and timestamps match its record is left alone;
+        otherwise its old record is replaced, and its content is hashed
+        again (or found in the hash cache) when duplicates are next
+        requested.
+        
+        Args:
+            file_path: Path to the file
+            stat_result: Current stat result, if the caller has one
             
-        except Exception as e:
-            self.stats['errors'].append(f"Error processing {file_path}: {str(e)}")
+        Returns:
+            Whether the file is now recorded
+        """
+        file_path = Path(file_path)
+        if stat_result is None:
+            try:
+                stat_result = file_path.stat()
+            except OSError:
+                self.remove_file(file_path)
+                return False
+        
+        store = self.scanned_files
+        record_id = self._record_id_map().get(str(file_path))
+        if (record_id is not None and not store.remote_only[record_id]
+                and store.size[record_id] == stat_result.st_size
+                and store.mtime_ns[record_id] == stat_result.st_mtime_ns
+                and store.ctime_ns[record_id] == stat_result.st_ctime_ns):
+            return True
+        
+        self.remove_file(file_path)
+        record_id = len(store)
+        if self._process_file(file_path, stat_result) is None:
+            return False
+        # The file's record, then those of any archive members
+        record_ids = self._record_id_map()
+        for new_id in range(record_id, len(store)):
+            record_ids[store.path(new_id)] = new_id
+            self._record_group(new_id).add(new_id)
+        self.index = None
+        self._chunk_report = None
+        return True
     
-    def scan_multiple_locations(self, locations: List[str]) -> Dict:
+    def scan_multiple_locations(self, locations: List[str], workers: int = 1,
+                                cross_location: bool = False, resume: bool = False) -> Dict:
         """
         Scan multiple archive locations.
         
         Args:
             locations: List of directory paths to scan
+            workers: Number of directory-listing threads per location
+            cross_location: Scan all locations concurrently into one shared
+                deduplication index, so copies spread across locations are
+                found (see scan_locations_combined)
+            resume: Continue each location from its checkpoint, if one
+                exists (requires checkpoint_dir; not used with cross_location)
             
         Returns:
             Combined scan results
         """
-        all_results = {
+        if cross_location:
+            return self.scan_locations_combined(locations, workers=workers)
+        
+        all_results = self.new_combined_results()
+        
+        for location in locations:
+            print(f"\nScanning location: {location}")
+            results = self.scan_directory(location, workers=workers, resume=resume)
+            self.add_location_results(all_results, location, results)
+        
+        return all_results
+    
+    def _spawn_location_scanner(self) -> 'ArchiveScanner':
+        """Create a scanner sharing this scanner's rules, cache and hash settings."""
+        scanner = ArchiveScanner(
+            exclude_patterns=self.exclude_patterns,
+            hash_cache=self.hash_cache,
+            hash_engine=self.hash_engine,
+            hash_algorithm=self.hash_algorithm,
+            confirm_algorithm=self.confirm_algorithm,
+            dedup_memory_budget=self.dedup_memory_budget,
+            dedup_work_dir=self.dedup_work_dir,
+            read_limiter=self.read_limiter,
+            hydrate_placeholders=self.hydrate_placeholders,
+            tree_depth=self.tree_depth,
+            tree_top_n=self.tree_top_n,
+            sniff_content=self.sniff_content,
+            archive_members=self.archive_members,
+            archive_max_depth=self.archive_max_depth,
+            archive_max_bytes=self.archive_max_bytes,
+            chunk_analysis=self.chunk_analysis,
+            chunk_avg_size=self.chunk_avg_size,
+            chunk_min_file_size=self.chunk_min_file_size,
+            chunk_memory_budget=self.chunk_memory_budget,
+        )
+        scanner.exclude_matcher = self.exclude_matcher
+        return scanner
+    
+    def scan_locations_combined(self, locations: List[str], workers: int = 1) -> Dict:
+        """
+        Scan several locations concurrently into one shared dedup index.
+        
+        Each location is walked by its own thread (or pool of `workers`
+        threads), since separate mounts are independent devices and their
+        listing latency overlaps. Walkers only list and stat; every file is
+        classified, recorded and indexed on the calling thread, so the shared
+        Deduplicator is never touched concurrently.
+        
+        Per-location results keep their own statistics and records, and
+        report the duplicate copies held in that location. Roots are
+        resolved first: a location that is the same directory as an earlier
+        one is reported as an error, and a location inside another one is
+        left out of the outer location's walk, so every file is indexed
+        once, under the innermost location holding it. When duplicates
+        are resolved, the copy in the earliest location (in the given order)
+        is kept, and every other location is credited with the bytes freed by
+        removing its copies.
+        
+        Args:
+            locations: List of directory paths to scan
+            workers: Number of directory-listing threads per location
+            
+        Returns:
+            Combined scan results, plus a 'deduplication' section covering
+            all locations with 'cross_location_duplicates' and
+            'savings_by_location'
+        """
+        all_results = self.new_combined_results()
+        self.deduplicator.close()
+        self.deduplicator = self._new_deduplicator()
+        # Each location reports its own directory tree
+        self.directory_tree = None
+        
+        scanners: Dict[str, 'ArchiveScanner'] = {}
+        locations_by_root: Dict[str, str] = {}
+        for location in locations:
+            scanner = self._spawn_location_scanner()
+            try:
+                root = scanner._begin_scan(location, deduplicator=self.deduplicator)
+            except ValueError as e:
+                all_results['locations'][location] = {'error': str(e)}
+                continue
+            if scanner._scan_root in locations_by_root:
+                all_results['locations'][location] = {
+                    'error': f"Same directory as location {locations_by_root[scanner._scan_root]}: {root}"}
+                continue
+            scanners[location] = scanner
+            locations_by_root[scanner._scan_root] = location
+        
+        # Overlapping roots would index the files they share twice, each
+        # copy a duplicate of itself
+        walkers = {}
+        for location, scanner in scanners.items():
+            prefix = scanner._scan_root.rstrip(os.sep) + os.sep
+            scanner._nested_roots = {root for root in locations_by_root if root.startswith(prefix)}
+            root = Path(scanner._scan_root)
+            if workers > 1:
+                walkers[location] = scanner._walk_parallel(root, max_depth=None, recursive=True, workers=workers)
+            else:
+                walkers[location] = scanner._walk(root, max_depth=None, recursive=True)
+        
+        # Bounded so a fast mount cannot run far ahead of processing
+        batches: queue.Queue = queue.Queue(maxsize=64)
+        stop = threading.Event()
+        batch_size = 512
+        
+        def producer(location: str, walker):
+            batch = []
+            try:
+                for item in walker:
+                    if stop.is_set():
+                        break
+                    batch.append(item)
+                    if len(batch) >= batch_size:
+                        batches.put((location, batch))
+                        batch = []
+                if batch:
+                    batches.put((location, batch))
+            finally:
+                walker.close()
+                batches.put((location, None))
+        
+        threads = [threading.Thread(target=producer, args=(location, walker), daemon=True)
+                   for location, walker in walkers.items()]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            remaining = len(threads)
+            while remaining:
+                location, batch = batches.get()
+                if batch is None:
+                    remaining -= 1
+                    continue
+                scanner = scanners[location]
+                for file_path, stat_result in batch:
+                    scanner._process_file(file_path, stat_result)
+        finally:
+            stop.set()
+            # Drain so producers blocked on a full queue can exit
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        
+        details = self.deduplicator.get_duplicate_details()
+        roots = sorted(((scanner._scan_root, location) for location, scanner in scanners.items()),
+                       key=lambda item: len(item[0]), reverse=True)
+        
+        def location_of(path: Path) -> Optional[str]:
+            path_str = str(path)
+            for root, location in roots:
+                if path_str == root or path_str.startswith(root.rstrip(os.sep) + os.sep):
+                    return location
+            return None
+        
+        order = {location: i for i, location in enumerate(locations)}
+        cross_location = {}
+        savings_by_location = {location: 0 for location in scanners}
+        copies_by_location = {location: 0 for location in scanners}
+        removed_by_location: Dict[str, List[Tuple[str, int]]] = {location: [] for location in scanners}
+        for digest, group in details.items():
+            by_location: Dict[str, List[str]] = {}
+            for path in group['paths']:
+                by_location.setdefault(location_of(path), []).append(str(path))
+            file_size = group['allocated']
+            keeper = min(by_location, key=lambda location: order.get(location, len(order)))
+            for location, paths in by_location.items():
+                removed = paths[1:] if location == keeper else paths
+                if location in savings_by_location:
+                    savings_by_location[location] += file_size * len(removed)
+                    copies_by_location[location] += len(removed)
+                    removed_by_location[location].extend((path, file_size) for path in removed)
+            if len(by_location) > 1:
+                cross_location[digest] = by_location
+        
+        for location, scanner in scanners.items():
+            print(f"\nScanned location: {location}")
+            scanner.build_indexes()
+            scanner.directory_tree.set_duplicates(removed_by_location[location])
+            results = scanner.get_results(include_files=True, include_duplicates=False)
+            results['deduplication']['removable_copies'] = copies_by_location[location]
+            results['deduplication']['potential_space_savings'] = savings_by_location[location]
+            self.add_location_results(all_results, location, results)
+        
+        combined = self.get_results(include_files=False)['deduplication']
+        combined['cross_location_duplicates'] = cross_location
+        combined['savings_by_location'] = savings_by_location
+        all_results['deduplication'] = combined
+        if self.hash_cache is not None:
+            self.hash_cache.commit()
+        return all_results
+    
+    @staticmethod
+    def new_combined_results() -> Dict:
+        """Create an empty multi-location results structure."""
+        return {
             'locations': {},
             'combined_stats': {
                 'total_files': 0,
                 'total_size': 0,
                 'by_category': {},
+                'remote_only_files': 0,
+                'remote_only_size': 0,
+                'archive_member_files': 0,
+                'archive_member_size': 0,
                 'errors': [],
             }
         }
-        
-        for location in locations:
-            print(f"\nScanning location: {location}")
-            results = self.scan_directory(location)
-            all_results['locations'][location] = results
-            
-            # Aggregate statistics
-            if 'stats' in results:
-                stats = results['stats']
-                all_results['combined_stats']['total_files'] += stats.get('total_files', 0)
-                all_results['combined_stats']['total_size'] += stats.get('total_size', 0)
-                
-                for category, count in stats.get('by_category', {}).items():
-                    all_results['combined_stats']['by_category'][category] = \
-                        all_results['combined_stats']['by_category'].get(category, 0) + count
-                
-                all_results['combined_stats']['errors'].extend(stats.get('errors', []))
-        
-        return all_results
     
-    def get_results(self) -> Dict:
-        """Get comprehensive scan results."""
-        duplicates = self.deduplicator.find_duplicates()
-        dedup_stats = self.deduplicator.get_stats()
+    @staticmethod
+    def add_location_results(all_results: Dict, location: str, results: Dict):
+        """Record one location's results and fold its statistics into combined_stats."""
+        all_results['locations'][location] = results
         
-        # Calculate potential space savings
-        space_wasted = 0
-        for duplicate_group in duplicates.values():
-            if duplicate_group:
-                # All duplicates except one can be removed
-                file_size = Path(duplicate_group[0]).stat().st_size if Path(duplicate_group[0]).exists() else 0
-                space_wasted += file_size * (len(duplicate_group) - 1)
+        # Aggregate statistics
+        if 'stats' in results:
+            stats = results['stats']
+            all_results['combined_stats']['total_files'] += stats.get('total_files', 0)
+            all_results['combined_stats']['total_size'] += stats.get('total_size', 0)
+            all_results['combined_stats']['remote_only_files'] += stats.get('remote_only_files', 0)
+            all_results['combined_stats']['remote_only_size'] += stats.get('remote_only_size', 0)
+            all_results['combined_stats']['archive_member_files'] += stats.get('archive_member_files', 0)
+            all_results['combined_stats']['archive_member_size'] += stats.get('archive_member_size', 0)
+            
+            for category, count in stats.get('by_category', {}).items():
+                all_results['combined_stats']['by_category'][category] = \
+                    all_results['combined_stats']['by_category'].get(category, 0) + count
+            
+            all_results['combined_stats']['errors'].extend(stats.get('errors', []))
+    
+    def get_results(self, include_files: bool = True, include_duplicates: bool = True) -> Dict:
+        """
+        Get comprehensive scan results.
         
-        return {
-            'stats': self.stats,
-            'files': self.scanned_files,
-            'deduplication': {
-                'stats': dedup_stats,
-                'duplicates': {k: [str(p) for p in v] for k, v in duplicates.items()},
+        Args:
+            include_files: Include the per-file records; streaming callers
+                that already wrote them pass False for a small summary
+            include_duplicates: Include duplicate groups and space savings;
+                combined multi-location scans report these once for all
+                locations instead
+            
+        Returns:
+            Results with 'stats', 'files', 'deduplication' and, after a
+            scan, 'directory_tree': recursive size, file count, bytes per
+            category and duplicate bytes per directory, as a rollup down to
+            tree_depth plus the tree_top_n heaviest subtrees. With
+            chunk_analysis, also 'chunk_dedup' (see analyze_chunks)
+        """
+        results: Dict = {'stats': self.stats}
+        if include_files:
+            results['files'] = list(self.scanned_files)
+        deduplication = {
+            'algorithm': self.deduplicator.algorithm,
+            'confirm_algorithm': self.deduplicator.confirm_algorithm,
+        }
+        if include_duplicates:
+            # Groups carry the sizes recorded during the walk, so the report
+            # is a consistent snapshot and no file is stat'ed again.
+            # find_duplicates() is memoized, so get_stats() reuses these groups
+            details = self.deduplicator.get_duplicate_details()
+            
+            # All duplicates except one can be removed
+            space_wasted = 0
+            for group in details.values():
+                space_wasted += group['allocated'] * (len(group['paths']) - 1)
+            if self.directory_tree is not None:
+                # Archive members live in their archive, not in a directory
+                self.directory_tree.set_duplicates(
+                    (path, group['allocated']) for group in details.values() for path in group['paths'][1:]
+                    if MEMBER_SEPARATOR not in str(path))
+            
+            deduplication.update({
+                'stats': self.deduplicator.get_stats(),
+                'duplicates': {k: [str(p) for p in group['paths']] for k, group in details.items()},
+                'duplicate_sizes': {k: {'size': group['size'], 'allocated': group['allocated']}
+                                    for k, group in details.items()},
+                'hardlinks': {k: [str(p) for p in v] for k, v in self.deduplicator.get_hardlinks().items()},
                 'potential_space_savings': space_wasted,
-            },
+            })
+        if self.directory_tree is not None:
+            results['directory_tree'] = self.directory_tree.to_dict(self.tree_depth, self.tree_top_n)
+        if self.chunk_analysis:
+            results['chunk_dedup'] = self.analyze_chunks()
+        results.update({
+            'deduplication': deduplication,
             'scan_timestamp': datetime.now().isoformat(),
-        }
+        })
+        return results
+    
+    def analyze_chunks(self) -> Dict:
+        """
+        Estimate how many bytes a chunk-deduplicating backup would store once.
+        
+        Every recorded file of at least chunk_min_file_size is read and split
+        with content-defined chunking into a memory-bounded chunk index.
+        Placeholders, archive members and extra hardlinks to one inode are
+        skipped. The report is kept until files are added or removed.
+        
+        Returns:
+            ChunkIndex.get_report() for the chunked files (shared bytes per
+            file and per file pair, archive-wide duplicate bytes and dedup
+            ratio), plus the chunking settings
+        """
+        if self._chunk_report is not None:
+            return self._chunk_report
+        chunker = self.chunker or Chunker(self.chunk_avg_size // 4, self.chunk_avg_size, self.chunk_avg_size * 4)
+        index = ChunkIndex.from_memory_budget(self.chunk_memory_budget)
+        # Only the first path of each inode is read
+        linked = {str(path) for paths in self.deduplicator.get_hardlinks().values() for path in paths[1:]}
+        store = self.scanned_files
+        for record_id in range(len(store)):
+            if (store.size[record_id] < self.chunk_min_file_size or store.remote_only[record_id]
+                    or store.archive_member[record_id]):
+                continue
+            path = store.path(record_id)
+            if path in linked:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    index.add_file(path, chunker.iter_chunks(f, self.read_limiter))
+            except (IOError, OSError) as e:
+                self.stats['errors'].append(f"Error chunking {path}: {str(e)}")
+        
+        report = index.get_report(self.tree_top_n)
+        report.update({
+            'min_file_size': self.chunk_min_file_size,
+            'chunk_sizes': {'min': chunker.min_size, 'avg': chunker.avg_size, 'max': chunker.max_size},
+        })
+        self._chunk_report = report
+        return report
+    
+    def build_indexes(self) -> FileRecordIndex:
+        """Build the category, size and mtime indexes used by the query methods."""
+        self.index = FileRecordIndex(self.scanned_files)
+        return self.index
+    
+    def _get_index(self) -> FileRecordIndex:
+        """Return current indexes, rebuilding them if records were added since."""
+        if self.index is None or self.index.store is not self.scanned_files or not self.index.is_current():
+            self.build_indexes()
+        return self.index
+    
+    def query_files(self, category: Optional[str] = None,
+                    min_size: Optional[int] = None, max_size: Optional[int] = None,
+                    modified_after: Optional[datetime] = None, modified_before: Optional[datetime] = None,
+                    order_by: str = 'size', descending: bool = False,
+                    limit: Optional[int] = None) -> List[Dict]:
+        """
+        Query scanned files by category, size range and modification time.
+        
+        Args:
+            category: Only files in this category
+            min_size: Minimum size in bytes (inclusive)
+            max_size: Maximum size in bytes (inclusive)
+            modified_after: Only files modified at or after this time
+            modified_before: Only files modified before this time
+            order_by: 'size' or 'mtime'
+            descending: Largest/newest first
+            limit: Return at most this many files
+            
+        Returns:
+            Matching file metadata dicts
+        """
+        to_ns = lambda moment: int(moment.timestamp() * 1e9) if moment is not None else None
+        record_ids = self._get_index().query(
+            category=category,
+            min_size=min_size,
+            max_size=max_size,
+            modified_after_ns=to_ns(modified_after),
+            modified_before_ns=to_ns(modified_before),
+            order_by=order_by,
+            descending=descending,
+            limit=limit,
+        )
+        return [self.scanned_files.to_dict(i) for i in record_ids]
+    
+    def get_largest_files(self, count: int = 10, category: Optional[str] = None) -> List[Dict]:
+        """Get the largest files, optionally within one category."""
+        return self.query_files(category=category, descending=True, limit=count)
     
     def get_files_by_category(self, category: str) -> List[Dict]:
         """Get all files of a specific category."""
-        return [f for f in self.scanned_files if f.get('category') == category]
+        records = self.scanned_files
+        return [records.to_dict(i) for i in self._get_index().by_category.get(category, [])]
     
     def get_large_files(self, min_size_mb: float = 10.0) -> List[Dict]:
-        """Get files larger than specified size."""
+        """Get files larger than specified size, largest first."""
         min_size_bytes = min_size_mb * 1024 * 1024
-        return [f for f in self.scanned_files if f.get('size', 0) > min_size_bytes]
+        return self.query_files(min_size=math.floor(min_size_bytes) + 1, descending=True)
     
     def get_old_files(self, days_old: int = 365) -> List[Dict]:
-        """Get files not modified in specified days."""
+        """Get files not modified in specified days, oldest first."""
         from datetime import timedelta
         cutoff = datetime.now() - timedelta(days=days_old)
-        
-        old_files = []
-        for file_info in self.scanned_files:
-            try:
-                modified = datetime.fromisoformat(file_info.get('modified', ''))
-                if modified < cutoff:
-                    old_files.append(file_info)
-            except:
-                continue
-        
-        return old_files
+        return self.query_files(modified_before=cutoff, order_by='mtime')
@@ -0,0 +1,349 @@
+"""
+Archive Watcher Module
+Keeps an archive inventory current by applying inotify events to the scan
+results incrementally, instead of rescanning on a schedule.
+"""
+
+import json
+import os
+import stat as stat_module
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .archive_scanner import ArchiveScanner
+from ..utils.inotify import (
+    Inotify, InotifyEvent, IN_ATTRIB, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_DONT_FOLLOW,
+    IN_IGNORED, IN_ISDIR, IN_MODIFY, IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR, IN_Q_OVERFLOW,
+)
+
+
+class ArchiveWatcher:
+    """
+    Long-running watch mode for ArchiveScanner (Linux only).
+
+    Every directory of each location is watched with inotify before the
+    initial scan, so nothing changed during the scan is missed. Afterwards
+    events are applied incrementally to the scanner's file records, category
+    statistics, directory tree and dedup index:
+
+    - files created, written, renamed in or changed are re-recorded once
+      they have been quiet for `settle` seconds (a file being copied is
+      recorded once, not on every write);
+    - files deleted or renamed away are removed;
+    - directories created or moved in are watched and listed, and
+      directories deleted or moved away drop all their records.
+
+    Only changed files are hashed again, and only when duplicates are next
+    requested. If the kernel event queue overflows, events were lost and
+    every location is rescanned. Snapshots in the archives.json shape are
+    written periodically while there are changes.
+    """
+
+    WATCH_MASK = (IN_CREATE | IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE
+                  | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+    def __init__(self, scanner: Optional[ArchiveScanner] = None,
+                 snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 60.0,
+                 settle: float = 1.0,
+                 workers: int = 1):
+        """
+        Initialize the watcher.
+
+        Args:
+            scanner: Configured ArchiveScanner (a default one if None); with
+                several locations each gets a scanner spawned from it
+            snapshot_path: File to write snapshots to (no snapshots if None)
+            snapshot_interval: Minimum seconds between snapshots
+            settle: Seconds a changed file must stay quiet before it is
+                recorded again
+            workers: Directory-listing threads for full scans
+
+        Raises:
+            ValueError: If the scanner uses chunk analysis, which would
+                re-chunk every large file for each snapshot
+        """
+        self.scanner = scanner or ArchiveScanner()
+        if self.scanner.chunk_analysis:
+            raise ValueError('Watch mode cannot be combined with chunk analysis')
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.settle = settle
+        self.workers = workers
+        self.scanners: Dict[str, ArchiveScanner] = {}
+        self._inotify: Optional[Inotify] = None
+        # wd -> (location, directory), directory -> wd, and directory ->
+        # watched subdirectories, so a removed subtree is found directly
+        self._watches: Dict[int, Tuple[str, str]] = {}
+        self._watch_ids: Dict[str, int] = {}
+        self._watch_children: Dict[str, Set[str]] = {}
+        # Changed path -> (location, time of its latest event)
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._changes_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self.stats = {
+            'events': 0,
+            'files_updated': 0,
+            'files_removed': 0,
+            'rescans': 0,
+            'snapshots': 0,
+        }
+
+    def start(self, locations: List[str]) -> Dict:
+        """
+        Watch the locations and run the initial scan.
+
+        Args:
+            locations: Directory paths to keep inventoried
+
+        Returns:
+            Initial results, in the shape of results()
+
+        Raises:
+            OSError: If inotify is unavailable
+            ValueError: If a location is not a directory
+        """
+        self._inotify = Inotify()
+        for location in locations:
+            root = Path(location).resolve()
+            if not root.is_dir():
+                raise ValueError(f"Path is not a directory: {location}")
+            scanner = self.scanner if len(locations) == 1 else self.scanner._spawn_location_scanner()
+            self.scanners[location] = scanner
+            self._full_scan(location)
+        print(f"Watching {len(self._watch_ids)} directories")
+        return self.results()
+
+    def _full_scan(self, location: str):
+        """(Re)watch every directory of a location, then scan it."""
+        scanner = self.scanners[location]
+        for directory in [d for d, wd in self._watch_ids.items() if self._watches[wd][0] == location]:
+            self._unwatch(directory)
+        root = str(Path(location).resolve())
+        scanner._scan_root = root
+        self._watch_tree(location, root)
+        scanner.scan_directory(location, workers=self.workers)
+
+    def _watch_tree(self, location: str, top: str) -> List[str]:
+        """Watch a directory and its subdirectories. Returns the directories watched."""
+        scanner = self.scanners[location]
+        watched = []
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            try:
+                wd = self._inotify.add_watch(directory, self.WATCH_MASK)
+            except OSError as e:
+                scanner.stats['errors'].append(f"Error watching {directory}: {str(e)}")
+                continue
+            self._watches[wd] = (location, directory)
+            self._watch_ids[directory] = wd
+            self._watch_children.setdefault(os.path.dirname(directory), set()).add(directory)
+            watched.append(directory)
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir() and not scanner.should_exclude(entry.path, is_dir=True):
+                            stack.append(entry.path)
+            except OSError:
+                pass  # Reported when the directory is listed
+        return watched
+
+    def _unwatch(self, directory: str):
+        wd = self._watch_ids.pop(directory, None)
+        siblings = self._watch_children.get(os.path.dirname(directory))
+        if siblings is not None:
+            siblings.discard(directory)
+        if wd is not None:
+            self._watches.pop(wd, None)
+            self._inotify.rm_watch(wd)
+    
+    def _watched_subtree(self, path: str) -> List[str]:
+        """A watched directory and every watched directory below it."""
+        subtree = []
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            subtree.append(directory)
+            stack.extend(self._watch_children.pop(directory, ()))
+        return subtree
+
+    def _add_directory(self, location: str, path: str):
+        """Watch and record a directory created or moved into a location."""
+        scanner = self.scanners[location]
+        for directory in self._watch_tree(location, path):
+            files, _, errors = scanner._list_directory(directory, 0, None, False)
+            scanner.stats['errors'].extend(errors)
+            for file_path, stat_result in files:
+                if scanner.update_file(file_path, stat_result):
+                    self.stats['files_updated'] += 1
+                    self._changes_since_snapshot += 1
+
+    def _remove_directory(self, location: str, path: str):
+        """Forget a directory deleted from or moved out of a location."""
+        scanner = self.scanners[location]
+        prefix = path.rstrip(os.sep) + os.sep
+        for directory in self._watched_subtree(path):
+            self._unwatch(directory)
+        # Archive members go with their archive
+        removed = scanner.remove_directory(path)
+        self.stats['files_removed'] += removed
+        self._changes_since_snapshot += removed
+        for file_path in [p for p in self._pending if p.startswith(prefix)]:
+            del self._pending[file_path]
+
+    def _handle_events(self, events: List[InotifyEvent]) -> bool:
+        """Queue changed files and apply directory changes. Returns whether events were lost."""
+        now = time.monotonic()
+        overflow = False
+        for event in events:
+            self.stats['events'] += 1
+            if event.mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            watch = self._watches.get(event.wd)
+            if watch is None:
+                continue
+            location, directory = watch
+            if event.mask & IN_IGNORED:
+                # The directory itself is gone
+                del self._watches[event.wd]
+                if self._watch_ids.get(directory) == event.wd:
+                    del self._watch_ids[directory]
+                continue
+            if not event.name:
+                continue
+            path = os.path.join(directory, event.name)
+            scanner = self.scanners[location]
+            if event.mask & IN_ISDIR:
+                if event.mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._remove_directory(location, path)
+                elif event.mask & (IN_CREATE | IN_MOVED_TO) and not scanner.should_exclude(path, is_dir=True):
+                    self._add_directory(location, path)
+                continue
+            if not scanner.should_exclude(path):
+                self._pending[path] = (location, now)
+        return overflow
+
+    def _apply_pending(self, force: bool = False) -> int:
+        """Record changed files that have been quiet for `settle` seconds. Returns how many."""
+        now = time.monotonic()
+        due = [path for path, (_, changed) in self._pending.items() if force or now - changed >= self.settle]
+        applied = 0
+        for path in due:
+            location, _ = self._pending.pop(path)
+            scanner = self.scanners[location]
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                stat_result = None
+            if stat_result is not None and stat_module.S_ISDIR(stat_result.st_mode):
+                # A symlink to a directory, followed like the scan does
+                if path not in self._watch_ids:
+                    self._add_directory(location, path)
+                continue
+            if stat_result is not None and stat_module.S_ISREG(stat_result.st_mode):
+                if scanner.update_file(path, stat_result):
+                    self.stats['files_updated'] += 1
+                    applied += 1
+            elif scanner.remove_file(path):
+                self.stats['files_removed'] += 1
+                applied += 1
+        self._changes_since_snapshot += applied
+        return applied
+
+    def rescan(self):
+        """Rescan every location from scratch, e.g. after lost events."""
+        self.stats['rescans'] += 1
+        self._pending.clear()
+        for location in self.scanners:
+            self._full_scan(location)
+        self._changes_since_snapshot += 1
+
+    def poll(self, timeout: float = 0.0) -> int:
+        """
+        Process queued events once.
+
+        Args:
+            timeout: Seconds to wait for the first event
+
+        Returns:
+            Number of files re-recorded or removed
+        """
+        if self._handle_events(self._inotify.read_events(timeout)):
+            self.rescan()
+        return self._apply_pending()
+
+    def results(self) -> Dict:
+        """
+        Current results, shaped like the scan results written to archives.json.
+
+        Returns:
+            One location's scan results, or combined results for several
+        """
+        if len(self.scanners) == 1:
+            return next(iter(self.scanners.values())).get_results()
+        all_results = ArchiveScanner.new_combined_results()
+        for location, scanner in self.scanners.items():
+            ArchiveScanner.add_location_results(all_results, location, scanner.get_results())
+        return all_results
+
+    def snapshot(self) -> Dict:
+        """
+        Write the current results to snapshot_path atomically.
+
+        Returns:
+            The results written
+        """
+        results = self.results()
+        if self.snapshot_path is not None:
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(results, f, indent=2)
+            os.replace(temp_path, self.snapshot_path)
+        if self.scanner.hash_cache is not None:
+            self.scanner.hash_cache.commit()
+        self.stats['snapshots'] += 1
+        self._changes_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        return results
+
+    def run(self, stop: Optional[threading.Event] = None, duration: Optional[float] = None) -> Dict:
+        """
+        Apply events until stopped, writing snapshots while things change.
+
+        Stops when `stop` is set, after `duration` seconds, or on Ctrl-C,
+        then applies the remaining changes and writes a final snapshot.
+
+        Returns:
+            Final results
+        """
+        deadline = time.monotonic() + duration if duration is not None else None
+        try:
+            while not (stop is not None and stop.is_set()):
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                # Wake up for settled files, snapshots and the stop check
+                wait = self.settle if self._pending else 1.0
+                if deadline is not None:
+                    wait = min(wait, max(0.0, deadline - now))
+                self.poll(timeout=wait)
+                if (self._changes_since_snapshot
+                        and time.monotonic() - self._last_snapshot >= self.snapshot_interval):
+                    self.snapshot()
+        except KeyboardInterrupt:
+            pass
+        self._apply_pending(force=True)
+        return self.snapshot()
+
+    def close(self):
+        """Stop watching."""
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches.clear()
+        self._watch_ids.clear()
+        self._watch_children.clear()
@@ -0,0 +1,174 @@
+"""
+Async Archive Scanner Module
+Runs archive scans from an asyncio event loop, offloading filesystem work to
+executors under per-mount concurrency and read-throughput limits.
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from .archive_scanner import ArchiveScanner
+from ..utils.file_utils import ThroughputLimiter
+
+
+class AsyncArchiveScanner:
+    """
+    Asyncio front end for ArchiveScanner.
+
+    Directory listing (scandir and stat), file processing (which may read
+    the start of unrecognized files) and hashing run in an executor, so
+    the event loop stays responsive and the scanner can be embedded in an
+    async service. Limits apply per mount, identified by the root's st_dev:
+
+    - at most mount_concurrency executor jobs run against a mount at once
+      (listing directories; processing a batch of files and hashing each
+      hold one slot), and a scanner's HashEngine reads at most
+      mount_concurrency files at once while it holds its hashing slot, and
+    - reads from a mount share one ThroughputLimiter, capping them at
+      bytes_per_second.
+
+    Locations on different mounts proceed independently, so several
+    cloud-sync mounts can be scanned at once without oversubscribing any
+    single backend. Each scanner processes one batch at a time, which
+    keeps its state single-threaded.
+    """
+
+    # Files processed per executor job, so a huge directory does not hold a
+    # mount slot for long
+    BATCH_SIZE = 1000
+
+    def __init__(self, scanner: Optional[ArchiveScanner] = None,
+                 mount_concurrency: int = 4,
+                 bytes_per_second: Optional[float] = None,
+                 executor: Optional[Executor] = None):
+        """
+        Initialize the async scanner.
+
+        Args:
+            scanner: Configured ArchiveScanner providing exclude rules, hash
+                settings and the hash cache (a default one if None)
+            mount_concurrency: Maximum concurrent executor jobs per mount
+            bytes_per_second: Optional hash read limit per mount
+            executor: Executor for blocking work (the loop's default
+                executor if None)
+        """
+        if mount_concurrency < 1:
+            raise ValueError('mount_concurrency must be at least 1')
+        self.scanner = scanner or ArchiveScanner()
+        self.mount_concurrency = mount_concurrency
+        self.bytes_per_second = bytes_per_second
+        self.executor = executor
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._mounts: Dict[int, Tuple[asyncio.Semaphore, Optional[ThroughputLimiter]]] = {}
+
+    def _mount_limits(self, device: int) -> Tuple[asyncio.Semaphore, Optional[ThroughputLimiter]]:
+        """Return the semaphore and read limiter shared by scans of one mount."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Semaphores belong to the loop they were first used on
+            self._loop = loop
+            self._mounts = {}
+        limits = self._mounts.get(device)
+        if limits is None:
+            limiter = ThroughputLimiter(self.bytes_per_second) if self.bytes_per_second else None
+            limits = (asyncio.Semaphore(self.mount_concurrency), limiter)
+            self._mounts[device] = limits
+        return limits
+
+    async def scan_directory(self, root_path: str, recursive: bool = True,
+                             max_depth: Optional[int] = None) -> Dict:
+        """
+        Scan a directory and classify all files.
+
+        Args:
+            root_path: Root directory to scan
+            recursive: Whether to scan subdirectories
+            max_depth: Maximum depth to scan (None for unlimited)
+
+        Returns:
+            Scan results dictionary, as returned by ArchiveScanner.scan_directory
+        """
+        return await self._scan(self.scanner, root_path, recursive, max_depth)
+
+    async def scan_locations(self, locations: List[str]) -> Dict:
+        """
+        Scan several locations concurrently.
+
+        Each location gets its own scanner (sharing this scanner's rules,
+        cache and hash settings), so results are per location as with
+        ArchiveScanner.scan_multiple_locations.
+
+        Args:
+            locations: List of directory paths to scan
+
+        Returns:
+            Combined scan results
+        """
+        scanners = [self.scanner._spawn_location_scanner() for _ in locations]
+        location_results = await asyncio.gather(*(
+            self._scan(scanner, location, True, None)
+            for scanner, location in zip(scanners, locations)
+        ))
+
+        all_results = ArchiveScanner.new_combined_results()
+        for location, results in zip(locations, location_results):
+            ArchiveScanner.add_location_results(all_results, location, results)
+        return all_results
+
+    async def _scan(self, scanner: ArchiveScanner, root_path: str, recursive: bool,
+                    max_depth: Optional[int]) -> Dict:
+        loop = asyncio.get_running_loop()
+
+        def run(func, *args):
+            return loop.run_in_executor(self.executor, func, *args)
+
+        try:
+            root = await run(scanner._begin_scan, root_path)
+        except ValueError as e:
+            return {'error': str(e)}
+        device = (await run(os.stat, root)).st_dev
+        semaphore, limiter = self._mount_limits(device)
+        scanner.read_limiter = limiter
+        scanner.deduplicator.read_limiter = limiter
+        engine = scanner.deduplicator.hash_engine
+        if engine is not None and engine.max_in_flight > self.mount_concurrency:
+            # Hashing runs as one job, which the engine fans out to its workers
+            scanner.deduplicator.hash_engine = engine.limited(self.mount_concurrency)
+        # Serializes access to the scanner's records, statistics and index
+        processing = asyncio.Lock()
+
+        def process_files(files):
+            for file_path, stat_result in files:
+                scanner._process_file(file_path, stat_result)
+
+        directories: asyncio.Queue = asyncio.Queue()
+        directories.put_nowait((str(root), 0))
+
+        async def lister():
+            while True:
+                dir_path, depth = await directories.get()
+                try:
+                    async with semaphore:
+                        files, subdirs, errors = await run(
+                            scanner._list_directory, dir_path, depth, max_depth, recursive)
+                    scanner.stats['errors'].extend(errors)
+                    for subdir in subdirs:
+                        directories.put_nowait(subdir)
+                    for start in range(0, len(files), self.BATCH_SIZE):
+                        async with processing, semaphore:
+                            await run(process_files, files[start:start + self.BATCH_SIZE])
+                finally:
+                    directories.task_done()
+
+        listers = [asyncio.ensure_future(lister()) for _ in range(self.mount_concurrency)]
+        try:
+            await directories.join()
+        finally:
+            for task in listers:
+                task.cancel()
+            await asyncio.gather(*listers, return_exceptions=True)
+
+        async with semaphore:
+            return await run(scanner._finish_scan)
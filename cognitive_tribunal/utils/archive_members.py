@@ -0,0 +1,315 @@
+"""
+Archive member scanning for the Cognitive Tribunal project.
+Streams the members of zip, tar and compressed files and hashes them without
+extracting anything to disk.
+"""
+
+import bz2
+import gzip
+import lzma
+import tarfile
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Callable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from .file_utils import FileHasher, ThroughputLimiter
+from .hash_cache import HashCache
+
+# Separates an archive's path from a member's path inside it, as in
+# 'backup.zip!/docs/a.pdf'
+MEMBER_SEPARATOR = '!/'
+
+_TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tbz', '.tar.xz', '.txz')
+_COMPRESSORS = {'.gz': gzip.GzipFile, '.bz2': bz2.BZ2File, '.xz': lzma.LZMAFile}
+
+# Bytes of each member's head kept for content sniffing
+HEAD_BYTES = 4096
+
+
+def archive_kind(name: str) -> Optional[str]:
+    """
+    Return how a file name would be read as an archive.
+
+    Returns:
+        'zip', 'tar', a single-file compression suffix ('.gz', '.bz2',
+        '.xz'), or None for anything else. Office documents and other
+        zip-based formats are not treated as archives.
+    """
+    lower = name.lower()
+    if lower.endswith(_TAR_SUFFIXES):
+        return 'tar'
+    if lower.endswith('.zip'):
+        return 'zip'
+    for suffix in _COMPRESSORS:
+        if lower.endswith(suffix) and len(lower) > len(suffix):
+            return suffix
+    return None
+
+
+class MemberStat(NamedTuple):
+    """Stat-like record for a member, for code that expects an os.stat_result."""
+    st_size: int
+    st_mtime_ns: int
+    st_ctime_ns: int
+    st_atime_ns: int
+    st_nlink: int = 1
+    st_ino: int = 0
+    st_dev: int = 0
+
+
+class ArchiveMember(NamedTuple):
+    """
+    A regular file inside an archive, hashed while it was streamed.
+
+    head is empty when the hashes were taken from a hash cache.
+    """
+    path: str
+    name: str
+    depth: int
+    size: int
+    compressed_size: int
+    mtime_ns: int
+    partial_hash: str
+    full_hash: str
+    confirm_hash: Optional[str]
+    head: bytes
+
+
+class ArchiveLimitExceeded(ValueError):
+    """Raised when an archive decompresses to more bytes than allowed."""
+
+
+class _ChargedFile:
+    """File object that charges the length of every read, e.g. to a throughput limiter."""
+
+    def __init__(self, raw: BinaryIO, charge: Callable[[int], None]):
+        self._raw = raw
+        self._charge = charge
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._raw.read(size)
+        self._charge(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class ArchiveMemberReader:
+    """
+    Iterates the regular-file members of an archive, hashing each as a stream.
+
+    Every member is read exactly once, in archive order. The full hash, the
+    optional confirmation hash and the first/last-block partial hash
+    (identical to FileHasher.compute_partial_hash on the extracted file) are
+    computed in the same pass, so a deduplicator can memoize them and never
+    open the member again. Archives nested inside archives are read up to
+    max_depth levels deep: a nested archive is copied to a temporary spool
+    while it is hashed and read back from there, so its outer archive is
+    never decompressed twice. Reading stops with ArchiveLimitExceeded once
+    max_bytes decompressed bytes have been read from one top-level archive,
+    re-reads of spooled nested archives included, which also bounds zip
+    bombs. Reads of the archive file itself are charged to an optional
+    throughput limiter.
+
+    With a hash cache, member digests are stored under the top-level
+    archive's cache key and the member's path inside it; while the archive
+    is unchanged, cached members are listed but not read. Members that are
+    nested archives are always read, since their members must be listed.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    # Nested archives are spooled in memory up to this size, then on disk
+    SPOOL_MEMORY = 16 * 1024 * 1024
+
+    def __init__(self, algorithm: str = 'sha256', confirm_algorithm: Optional[str] = None,
+                 block_size: int = 65536, max_depth: int = 2,
+                 max_bytes: int = 4 * 1024 * 1024 * 1024,
+                 limiter: Optional[ThroughputLimiter] = None,
+                 hash_cache: Optional[HashCache] = None):
+        """
+        Initialize the reader.
+
+        Args:
+            algorithm: Hash backend for the partial and full hashes
+            confirm_algorithm: Optional second backend hashed in the same pass
+            block_size: Block size of the partial hash
+            max_depth: Archive nesting levels to read (1 reads only the
+                members of the archive itself)
+            max_bytes: Decompressed bytes that may be read from one
+                top-level archive, nested members included
+            limiter: Optional throughput limiter charged for the bytes read
+                from disk
+            hash_cache: Optional persistent cache for member digests
+        """
+        FileHasher.new_hasher(algorithm)
+        self.algorithm = algorithm
+        self.confirm_algorithm = confirm_algorithm
+        self.block_size = block_size
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.limiter = limiter
+        self.hash_cache = hash_cache
+        self._archive = ''
+        self._cache_key: Optional[Tuple[int, int, int, int]] = None
+        self._bytes_read = 0
+
+    def iter_members(self, archive_path: Union[str, Path]) -> Iterator[ArchiveMember]:
+        """
+        Stream the members of an archive.
+
+        Args:
+            archive_path: Path to a zip, tar (optionally compressed), .gz,
+                .bz2 or .xz file
+
+        Yields:
+            ArchiveMember for every regular file, nested members after the
+            member that contains them
+
+        Raises:
+            ArchiveLimitExceeded: If the decompressed byte limit is reached
+            ValueError: If the file is not a supported archive
+            Exception: Whatever the archive modules raise on corrupt input
+                (zipfile.BadZipFile, tarfile.TarError, OSError, EOFError)
+        """
+        archive_path = str(archive_path)
+        kind = archive_kind(archive_path)
+        if kind is None:
+            raise ValueError(f"Not a supported archive: {archive_path}")
+        self._archive = archive_path
+        self._bytes_read = 0
+        stat_result = Path(archive_path).stat()
+        self._cache_key = HashCache.key_for(stat_result) if self.hash_cache is not None else None
+        with open(archive_path, 'rb') as f:
+            stream = _ChargedFile(f, self.limiter.consume) if self.limiter is not None else f
+            yield from self._read(stream, kind, archive_path, PurePosixPath(archive_path).name,
+                                  stat_result.st_mtime_ns, 1)
+
+    def _read(self, stream: BinaryIO, kind: str, prefix: str, name: str, mtime_ns: int,
+              depth: int) -> Iterator[ArchiveMember]:
+        """Yield the members of the archive in stream; prefix is its (virtual) path."""
+        if kind == 'zip':
+            with zipfile.ZipFile(stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or info.flag_bits & 0x1:
+                        continue  # Encrypted members cannot be read
+                    try:
+                        member_mtime = int(datetime(*info.date_time).timestamp() * 1e9)
+                    except ValueError:
+                        member_mtime = mtime_ns
+                    yield from self._member(lambda: archive.open(info), prefix, info.filename,
+                                            info.compress_size, member_mtime, depth)
+        elif kind == 'tar':
+            with tarfile.open(fileobj=stream, mode='r:*') as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    yield from self._member(lambda: archive.extractfile(info), prefix, info.name,
+                                            info.size, info.mtime * 1_000_000_000, depth)
+        else:
+            # A single compressed file: the member is the name without the suffix
+            member_name = name[:-len(kind)]
+            compressor = _COMPRESSORS[kind]
+
+            def open_decompressed():
+                stream.seek(0)
+                return compressor(fileobj=stream)
+
+            yield from self._member(open_decompressed, prefix, member_name, None, mtime_ns, depth)
+
+    def _member(self, open_member, prefix: str, name: str, compressed_size: Optional[int],
+                mtime_ns: int, depth: int) -> Iterator[ArchiveMember]:
+        """Hash one member, then read it as a nested archive if it is one."""
+        name = name.lstrip('/')
+        if name.startswith('./'):
+            name = name[2:]
+        path = f"{prefix}{MEMBER_SEPARATOR}{name}"
+        nested_kind = archive_kind(name) if depth < self.max_depth else None
+        cache_algorithm = None
+        if self._cache_key is not None and nested_kind is None:
+            cache_algorithm = (f"member-{self.algorithm}-{self.confirm_algorithm or ''}-{self.block_size}"
+                               f"{path[len(self._archive):]}")
+        cached = self.hash_cache.get(self._cache_key, cache_algorithm) if cache_algorithm else None
+        spool = tempfile.SpooledTemporaryFile(self.SPOOL_MEMORY) if nested_kind is not None else None
+        try:
+            if cached is not None:
+                size_text, partial_hash, full_hash, confirm_hash = cached.split('\t')
+                size, head, confirm_hash = int(size_text), b'', confirm_hash or None
+            else:
+                with open_member() as stream:
+                    size, head, partial_hash, full_hash, confirm_hash = self._hash_stream(stream, spool)
+                if cache_algorithm is not None:
+                    self.hash_cache.put(self._cache_key, cache_algorithm,
+                                        '\t'.join((str(size), partial_hash, full_hash, confirm_hash or '')),
+                                        self._archive)
+            yield ArchiveMember(
+                path=path,
+                name=name,
+                depth=depth,
+                size=size,
+                compressed_size=compressed_size if compressed_size is not None else size,
+                mtime_ns=mtime_ns,
+                partial_hash=partial_hash,
+                full_hash=full_hash,
+                confirm_hash=confirm_hash,
+                head=head,
+            )
+            if spool is not None:
+                spool.seek(0)
+                yield from self._read(_ChargedFile(spool, self._charge), nested_kind, path,
+                                      PurePosixPath(name).name, mtime_ns, depth + 1)
+        finally:
+            if spool is not None:
+                spool.close()
+
+    def _charge(self, size: int):
+        """Count decompressed bytes towards max_bytes."""
+        self._bytes_read += size
+        if self._bytes_read > self.max_bytes:
+            raise ArchiveLimitExceeded(
+                f"Stopped reading {self._archive}: more than {self.max_bytes} bytes decompressed")
+
+    def _hash_stream(self, stream: BinaryIO,
+                     copy: Optional[BinaryIO] = None) -> Tuple[int, bytes, str, str, Optional[str]]:
+        """
+        Hash a member stream, writing it to copy if given.
+
+        Returns:
+            (size, head, partial hash, full hash, confirm hash)
+        """
+        block = self.block_size
+        full = FileHasher.new_hasher(self.algorithm)
+        confirm = FileHasher.new_hasher(self.confirm_algorithm) if self.confirm_algorithm else None
+        head = bytearray()
+        # The last block of the data after the head
+        tail = bytearray()
+        size = 0
+        while True:
+            chunk = stream.read(self.CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            self._charge(len(chunk))
+            if copy is not None:
+                copy.write(chunk)
+            full.update(chunk)
+            if confirm is not None:
+                confirm.update(chunk)
+            rest = chunk
+            if len(head) < block:
+                take = block - len(head)
+                head += chunk[:take]
+                rest = chunk[take:]
+            if rest:
+                tail += rest
+                if len(tail) > block:
+                    del tail[:-block]
+
+        partial = FileHasher.new_hasher(self.algorithm)
+        partial.update(head)
+        if len(head) == block:
+            partial.update(tail)
+        return (size, bytes(head[:HEAD_BYTES]), partial.hexdigest(), full.hexdigest(),
+                confirm.hexdigest() if confirm is not None else None)
@@ -0,0 +1,281 @@
+"""
+Content-defined chunking for the Cognitive Tribunal project.
+Splits files into variable-size chunks at boundaries chosen by their content
+(FastCDC), and estimates how many bytes a chunk-deduplicating backup target
+would store only once.
+"""
+
+import hashlib
+import heapq
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .file_utils import ThroughputLimiter
+
+CHUNK_MIN_SIZE = 16 * 1024
+CHUNK_AVG_SIZE = 64 * 1024
+CHUNK_MAX_SIZE = 256 * 1024
+
+_MASK64 = (1 << 64) - 1
+
+# Gear table: one pseudo-random 64-bit value per byte value, derived from
+# SHA-256 so chunk boundaries are the same on every platform and version
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'little') for i in range(256)]
+
+
+def _boundary_limit(bits: int) -> int:
+    """
+    Hash values below this limit have their top `bits` bits zero.
+
+    The top bits of a gear hash are the best mixed; comparing against the
+    limit is cheaper than masking.
+    """
+    return 1 << (64 - bits)
+
+
+class Chunker:
+    """
+    FastCDC content-defined chunker.
+
+    A rolling gear hash is computed over each chunk after its first
+    min_size bytes; a boundary falls where the hash's top bits are all
+    zero. A stricter condition before avg_size and a looser one after it
+    (normalized chunking) keep most chunks close to avg_size. Inserting or
+    deleting bytes only moves the boundaries near the edit, so the rest of
+    an edited file still yields the same chunks.
+    """
+
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, min_size: int = CHUNK_MIN_SIZE, avg_size: int = CHUNK_AVG_SIZE,
+                 max_size: int = CHUNK_MAX_SIZE):
+        """
+        Initialize the chunker.
+
+        Args:
+            min_size: Smallest chunk, except the last one of a file
+            avg_size: Target chunk size; must be a power of two
+            max_size: Largest chunk
+
+        Raises:
+            ValueError: If the sizes are not ordered or avg_size is not a
+                power of two of at least 64
+        """
+        if avg_size < 64 or avg_size & (avg_size - 1):
+            raise ValueError(f"Average chunk size must be a power of two of at least 64: {avg_size}")
+        if not 0 < min_size <= avg_size <= max_size:
+            raise ValueError('Chunk sizes must satisfy 0 < min_size <= avg_size <= max_size')
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        bits = avg_size.bit_length() - 1
+        self._limit_small = _boundary_limit(bits + 2)
+        self._limit_large = _boundary_limit(bits - 2)
+
+    def cut_point(self, data: memoryview) -> int:
+        """
+        Length of the chunk at the start of data.
+
+        Args:
+            data: Buffered bytes; at least max_size of them unless the
+                stream ends within them
+
+        Returns:
+            Chunk length (all of data if it is the end of the stream and
+            shorter than a chunk)
+        """
+        length = len(data)
+        if length <= self.min_size:
+            return length
+        end = min(length, self.max_size)
+        normal = min(self.avg_size, end)
+        gear = _GEAR.__getitem__
+        fp = 0
+        limit = self._limit_small
+        for i, value in enumerate(map(gear, data[self.min_size:normal]), self.min_size + 1):
+            fp = ((fp << 1) + value) & _MASK64
+            if fp < limit:
+                return i
+        limit = self._limit_large
+        for i, value in enumerate(map(gear, data[normal:end]), normal + 1):
+            fp = ((fp << 1) + value) & _MASK64
+            if fp < limit:
+                return i
+        return end
+
+    def iter_chunks(self, stream: BinaryIO, limiter: Optional[ThroughputLimiter] = None) -> Iterator[bytes]:
+        """
+        Split a stream into chunks.
+
+        Args:
+            stream: Binary stream, read to the end
+            limiter: Optional throughput limiter charged for the reads
+
+        Yields:
+            Chunk contents, in stream order
+        """
+        buffer = b''
+        position = 0
+        eof = False
+        while True:
+            if not eof and len(buffer) - position < self.max_size:
+                data = stream.read(self.READ_SIZE)
+                if limiter is not None:
+                    limiter.consume(len(data))
+                eof = not data
+                buffer = buffer[position:] + data
+                position = 0
+                continue
+            if position >= len(buffer):
+                return
+            view = memoryview(buffer)[position:]
+            cut = self.cut_point(view)
+            yield bytes(view[:cut])
+            position += cut
+
+
+class ChunkIndex:
+    """
+    Memory-bounded index of chunk fingerprints.
+
+    Chunks are sampled by fingerprint: only those whose fingerprint has its
+    low `sample_shift` bits zero are indexed, so a chunk is either sampled
+    in every file or in none. When the index outgrows max_entries the
+    sampling rate is halved and entries that no longer qualify are
+    dropped. Duplicate byte counts from the sample are scaled by the
+    inverse sampling rate; with no sampling (small archives) they are exact.
+    Total bytes and chunk counts are always exact.
+    """
+
+    # Rough in-memory cost of one entry (digest, list, dict slot), used to
+    # turn a memory budget into an entry limit
+    ENTRY_BYTES = 200
+
+    def __init__(self, max_entries: int = 1000000):
+        """
+        Initialize the index.
+
+        Args:
+            max_entries: Most chunk fingerprints kept at once
+        """
+        self.max_entries = max_entries
+        self.sample_shift = 0
+        # Fingerprint -> [chunk size, occurrences, first file id,
+        # {other file id: occurrences} or None]
+        self._chunks: Dict[bytes, list] = {}
+        self.paths: List[str] = []
+        self.file_sizes: List[int] = []
+        self.total_bytes = 0
+        self.total_chunks = 0
+
+    @classmethod
+    def from_memory_budget(cls, budget: int) -> 'ChunkIndex':
+        """Create an index whose entries take about `budget` bytes."""
+        return cls(max_entries=max(1, budget // cls.ENTRY_BYTES))
+
+    def add_file(self, path: str, chunks: Iterator[bytes]) -> int:
+        """
+        Index the chunks of one file.
+
+        Args:
+            path: Path reported for the file
+            chunks: The file's chunks, e.g. from Chunker.iter_chunks
+
+        Returns:
+            File id
+        """
+        file_id = len(self.paths)
+        self.paths.append(path)
+        file_size = 0
+        try:
+            for chunk in chunks:
+                size = len(chunk)
+                file_size += size
+                self.total_chunks += 1
+                fingerprint = hashlib.blake2b(chunk, digest_size=16).digest()
+                if int.from_bytes(fingerprint[:8], 'little') & ((1 << self.sample_shift) - 1):
+                    continue
+                entry = self._chunks.get(fingerprint)
+                if entry is None:
+                    self._chunks[fingerprint] = [size, 1, file_id, None]
+                    if len(self._chunks) > self.max_entries:
+                        self._reduce_sample()
+                    continue
+                entry[1] += 1
+                if entry[2] != file_id:
+                    others = entry[3]
+                    if others is None:
+                        others = entry[3] = {}
+                    others[file_id] = others.get(file_id, 0) + 1
+        finally:
+            # Chunks indexed before a read error still count
+            self.file_sizes.append(file_size)
+            self.total_bytes += file_size
+        return file_id
+
+    def _reduce_sample(self):
+        """Halve the sampling rate until the index fits max_entries again."""
+        while len(self._chunks) > self.max_entries:
+            self.sample_shift += 1
+            mask = (1 << self.sample_shift) - 1
+            self._chunks = {fingerprint: entry for fingerprint, entry in self._chunks.items()
+                            if not int.from_bytes(fingerprint[:8], 'little') & mask}
+
+    def get_report(self, top_n: int = 20) -> Dict:
+        """
+        Summarize chunk-level duplication.
+
+        Args:
+            top_n: Files and file pairs listed, most duplicated first
+
+        Returns:
+            Dict with exact 'total_bytes', 'chunks' and 'files', the
+            (estimated, when sampled) 'duplicate_bytes', 'unique_bytes' and
+            'dedup_ratio', the 'sampling_rate' and 'index_entries', the
+            top_n 'top_files' by duplicate bytes (bytes of the file already
+            stored by an earlier chunk) and the top_n 'top_pairs' of files
+            by shared bytes
+        """
+        scale = 1 << self.sample_shift
+        duplicate_bytes = 0
+        file_duplicates: Dict[int, int] = {}
+        pair_shared: Dict[Tuple[int, int], int] = {}
+        for size, occurrences, first, others in self._chunks.values():
+            if occurrences < 2:
+                continue
+            duplicate_bytes += size * (occurrences - 1)
+            # The first file stores the chunk once; every other occurrence
+            # is redundant
+            first_repeats = occurrences - 1 - (sum(others.values()) if others else 0)
+            if first_repeats:
+                file_duplicates[first] = file_duplicates.get(first, 0) + size * first_repeats
+            if others:
+                holders = [first] + sorted(others)
+                for file_id, count in others.items():
+                    file_duplicates[file_id] = file_duplicates.get(file_id, 0) + size * count
+                for i, a in enumerate(holders):
+                    for b in holders[i + 1:]:
+                        pair_shared[(a, b)] = pair_shared.get((a, b), 0) + size
+
+        duplicate_bytes = min(duplicate_bytes * scale, self.total_bytes)
+        unique_bytes = self.total_bytes - duplicate_bytes
+        top_files = heapq.nlargest(top_n, file_duplicates.items(), key=lambda item: (item[1], -item[0]))
+        top_pairs = heapq.nlargest(top_n, pair_shared.items(), key=lambda item: (item[1], -item[0][0], -item[0][1]))
+        return {
+            'files': len(self.paths),
+            'chunks': self.total_chunks,
+            'total_bytes': self.total_bytes,
+            'duplicate_bytes': duplicate_bytes,
+            'unique_bytes': unique_bytes,
+            'dedup_ratio': self.total_bytes / unique_bytes if unique_bytes else 1.0,
+            'sampling_rate': 1 / scale,
+            'index_entries': len(self._chunks),
+            'top_files': [
+                {'path': self.paths[file_id], 'size': self.file_sizes[file_id],
+                 'duplicate_bytes': min(shared * scale, self.file_sizes[file_id])}
+                for file_id, shared in top_files
+            ],
+            'top_pairs': [
+                {'paths': [self.paths[a], self.paths[b]], 'shared_bytes': shared * scale}
+                for (a, b), shared in top_pairs
+            ],
+        }
@@ -0,0 +1,152 @@
+"""
+Content sniffing for the Cognitive Tribunal project.
+Classifies files from their leading bytes when the extension says nothing.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .file_utils import ThroughputLimiter
+
+# Bytes read from the start of a file; enough for every signature below,
+# including the tar header at offset 257 and OOXML member names
+SNIFF_BYTES = 4096
+
+# Algorithm name under which sniff results ('category<TAB>MIME type', or
+# 'other' when nothing matched) are kept in the hash cache
+SNIFF_CACHE_ALGORITHM = 'sniff-v2'
+
+# (parts, category, MIME type); every (offset, magic) part must match.
+# Within a first byte, longer signatures are tried first.
+SIGNATURES: List[Tuple[Tuple[Tuple[int, bytes], ...], str, str]] = [
+    (((0, b'\x89PNG\r\n\x1a\n'),), 'image', 'image/png'),
+    (((0, b'\xff\xd8\xff'),), 'image', 'image/jpeg'),
+    (((0, b'GIF87a'),), 'image', 'image/gif'),
+    (((0, b'GIF89a'),), 'image', 'image/gif'),
+    (((0, b'RIFF'), (8, b'WEBP')), 'image', 'image/webp'),
+    (((0, b'RIFF'), (8, b'WAVE')), 'audio', 'audio/wav'),
+    (((0, b'RIFF'), (8, b'AVI ')), 'video', 'video/x-msvideo'),
+    (((4, b'ftypheic'),), 'image', 'image/heic'),
+    (((4, b'ftypheix'),), 'image', 'image/heic'),
+    (((4, b'ftypmif1'),), 'image', 'image/heif'),
+    (((4, b'ftypM4A '),), 'audio', 'audio/mp4'),
+    (((4, b'ftypqt  '),), 'video', 'video/quicktime'),
+    (((4, b'ftyp'),), 'video', 'video/mp4'),
+    (((0, b'\x1aE\xdf\xa3'),), 'video', 'video/x-matroska'),
+    (((0, b'FLV\x01'),), 'video', 'video/x-flv'),
+    (((0, b'ID3'),), 'audio', 'audio/mpeg'),
+    (((0, b'fLaC'),), 'audio', 'audio/flac'),
+    (((0, b'OggS'),), 'audio', 'audio/ogg'),
+    (((0, b'%PDF-'),), 'document', 'application/pdf'),
+    (((0, b'{\\rtf'),), 'document', 'application/rtf'),
+    (((0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'),), 'document', 'application/x-ole-storage'),
+    (((0, b'PK\x03\x04'),), 'archive', 'application/zip'),
+    (((0, b'\x1f\x8b'),), 'archive', 'application/gzip'),
+    (((0, b'BZh'),), 'archive', 'application/x-bzip2'),
+    (((0, b'\xfd7zXZ\x00'),), 'archive', 'application/x-xz'),
+    (((0, b"7z\xbc\xaf'\x1c"),), 'archive', 'application/x-7z-compressed'),
+    (((0, b'Rar!\x1a\x07'),), 'archive', 'application/vnd.rar'),
+    (((257, b'ustar'),), 'archive', 'application/x-tar'),
+    (((0, b'SQLite format 3\x00'),), 'database', 'application/vnd.sqlite3'),
+    (((0, b'<?xml'),), 'data', 'application/xml'),
+    (((0, b'#!'),), 'code', 'text/x-script'),
+]
+
+# ZIP containers named by their first members: OpenDocument and EPUB store
+# an uncompressed 'mimetype' member first, OOXML parts live under a
+# per-application directory
+_ZIP_MARKERS: List[Tuple[bytes, str, str]] = [
+    (b'mimetypeapplication/vnd.oasis.opendocument.text', 'document', 'application/vnd.oasis.opendocument.text'),
+    (b'mimetypeapplication/vnd.oasis.opendocument.spreadsheet', 'spreadsheet',
+     'application/vnd.oasis.opendocument.spreadsheet'),
+    (b'mimetypeapplication/vnd.oasis.opendocument.presentation', 'presentation',
+     'application/vnd.oasis.opendocument.presentation'),
+    (b'mimetypeapplication/epub+zip', 'document', 'application/epub+zip'),
+    (b'word/', 'document', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    (b'xl/', 'spreadsheet', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    (b'ppt/', 'presentation', 'application/vnd.openxmlformats-officedocument.presentationml.presentation'),
+]
+
+
+def _compile(signatures) -> Tuple[Dict[int, list], list]:
+    """Index offset-0 signatures by first byte; the rest are tried in order."""
+    by_first_byte: Dict[int, list] = {}
+    other = []
+    for signature in signatures:
+        parts = signature[0]
+        if parts[0][0] == 0:
+            by_first_byte.setdefault(parts[0][1][0], []).append(signature)
+        else:
+            other.append(signature)
+    for candidates in by_first_byte.values():
+        candidates.sort(key=lambda s: sum(len(magic) for _, magic in s[0]), reverse=True)
+    return by_first_byte, other
+
+
+_BY_FIRST_BYTE, _OFFSET_SIGNATURES = _compile(SIGNATURES)
+
+
+def _matches(head: bytes, parts) -> bool:
+    return all(head.startswith(magic, offset) for offset, magic in parts)
+
+
+def _is_text(head: bytes) -> bool:
+    """Whether head looks like UTF-8 text (a multi-byte character may be cut off at the end)."""
+    if b'\x00' in head:
+        return False
+    for trim in range(4):
+        try:
+            head[:len(head) - trim].decode('utf-8')
+            return True
+        except UnicodeDecodeError:
+            continue
+    return False
+
+
+def sniff_bytes(head: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Classify content from its leading bytes.
+
+    Args:
+        head: The first bytes of a file (SNIFF_BYTES is enough)
+
+    Returns:
+        (category, MIME type), or None if nothing matched
+    """
+    if not head:
+        return None
+    for parts, category, mime_type in _BY_FIRST_BYTE.get(head[0], ()):
+        if _matches(head, parts):
+            if mime_type == 'application/zip':
+                for marker, zip_category, zip_mime_type in _ZIP_MARKERS:
+                    if marker in head:
+                        return zip_category, zip_mime_type
+            return category, mime_type
+    for parts, category, mime_type in _OFFSET_SIGNATURES:
+        if _matches(head, parts):
+            return category, mime_type
+    if _is_text(head):
+        return 'document', 'text/plain'
+    return None
+
+
+def sniff_file(file_path: Path, limiter: Optional[ThroughputLimiter] = None) -> Optional[Tuple[str, str]]:
+    """
+    Classify a file from at most its first SNIFF_BYTES bytes.
+
+    Args:
+        file_path: Path to the file
+        limiter: Optional throughput limiter charged for the read
+
+    Returns:
+        (category, MIME type), or None if nothing matched or the file
+        could not be read
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+    except (IOError, OSError):
+        return None
+    if limiter is not None:
+        limiter.consume(len(head))
+    return sniff_bytes(head)
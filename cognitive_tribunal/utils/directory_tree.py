@@ -0,0 +1,157 @@
+"""
+Directory aggregates for the Cognitive Tribunal project.
+Builds du-style recursive totals per directory during an archive scan.
+"""
+
+import heapq
+import os
+from typing import Dict, Iterable, List, Tuple
+
+
+class DirectoryTree:
+    """
+    Per-directory totals collected during the walk and rolled up on demand.
+
+    The walk only adds each file to its own directory's counters, so the
+    cost is one dict lookup per file and memory grows with the number of
+    directories, not files. rollup() then adds every directory into its
+    parent, deepest first, to get recursive size, file count, bytes per
+    category and duplicate bytes for every subtree in one pass.
+    """
+
+    def __init__(self, root: str):
+        """
+        Start an empty tree.
+
+        Args:
+            root: Scan root; every recorded directory must be below it
+        """
+        self.root = root
+        # directory -> [file count, size, {category: bytes}]
+        self._own: Dict[str, list] = {}
+        self._duplicate_bytes: Dict[str, int] = {}
+
+    def add_file(self, directory: str, size: int, category: str):
+        """Count a file in its directory."""
+        node = self._own.get(directory)
+        if node is None:
+            node = self._own[directory] = [0, 0, {}]
+        node[0] += 1
+        node[1] += size
+        node[2][category] = node[2].get(category, 0) + size
+
+    def remove_file(self, directory: str, size: int, category: str):
+        """Uncount a file that add_file() counted in its directory."""
+        node = self._own.get(directory)
+        if node is None:
+            return
+        node[0] -= 1
+        if node[0] <= 0:
+            del self._own[directory]
+            return
+        node[1] -= size
+        node[2][category] = node[2].get(category, 0) - size
+        if node[2][category] <= 0:
+            del node[2][category]
+
+    def set_duplicates(self, copies: Iterable[Tuple[str, int]]):
+        """
+        Replace the duplicate accounting.
+
+        Args:
+            copies: (file path, bytes freed by deleting it) for every
+                removable duplicate copy
+        """
+        self._duplicate_bytes = {}
+        for file_path, size in copies:
+            directory = os.path.dirname(str(file_path))
+            self._duplicate_bytes[directory] = self._duplicate_bytes.get(directory, 0) + size
+
+    def rollup(self) -> Dict[str, Dict]:
+        """
+        Compute recursive totals for every directory.
+
+        Returns:
+            Dictionary mapping directory path to {'size', 'files',
+            'duplicate_bytes', 'by_category'} for its whole subtree
+        """
+        totals: Dict[str, Dict] = {}
+
+        def node(directory: str) -> Dict:
+            entry = totals.get(directory)
+            if entry is None:
+                entry = totals[directory] = {'size': 0, 'files': 0, 'duplicate_bytes': 0, 'by_category': {}}
+            return entry
+
+        node(self.root)
+        for directory, (files, size, by_category) in self._own.items():
+            entry = node(directory)
+            entry['files'] += files
+            entry['size'] += size
+            for category, category_size in by_category.items():
+                entry['by_category'][category] = entry['by_category'].get(category, 0) + category_size
+        for directory, size in self._duplicate_bytes.items():
+            node(directory)['duplicate_bytes'] += size
+
+        # Create every missing ancestor up to the root first, then add each
+        # directory into its parent, deepest first, so every directory is
+        # complete before it is added into its own parent
+        root_prefix = self.root.rstrip(os.sep) + os.sep
+        for directory in list(totals):
+            while directory.startswith(root_prefix):
+                directory = os.path.dirname(directory)
+                if directory in totals:
+                    break
+                node(directory)
+
+        for directory in sorted(totals, key=lambda d: d.count(os.sep), reverse=True):
+            if directory == self.root:
+                continue
+            if not directory.startswith(root_prefix):
+                continue
+            entry, parent_entry = totals[directory], totals[os.path.dirname(directory)]
+            parent_entry['files'] += entry['files']
+            parent_entry['size'] += entry['size']
+            parent_entry['duplicate_bytes'] += entry['duplicate_bytes']
+            for category, category_size in entry['by_category'].items():
+                parent_entry['by_category'][category] = \
+                    parent_entry['by_category'].get(category, 0) + category_size
+        return totals
+
+    def to_dict(self, max_depth: int = 2, top_n: int = 20) -> Dict:
+        """
+        Summarize the tree for the results.
+
+        Args:
+            max_depth: Depth of the nested rollup below the root
+            top_n: Number of heaviest subtrees to list, and the maximum
+                children shown per directory in the rollup
+
+        Returns:
+            {'rollup': nested totals down to max_depth, largest children
+            first, 'top_subtrees': the top_n largest directories below the
+            root, shallowest first among equal sizes}
+        """
+        totals = self.rollup()
+        children: Dict[str, List[str]] = {}
+        for directory in totals:
+            if directory != self.root:
+                children.setdefault(os.path.dirname(directory), []).append(directory)
+
+        def build(directory: str, depth: int) -> Dict:
+            entry = dict(totals[directory], path=directory)
+            if depth < max_depth:
+                subdirs = children.get(directory, [])
+                largest = heapq.nlargest(top_n, subdirs, key=lambda d: totals[d]['size'])
+                entry['children'] = [build(subdir, depth + 1) for subdir in largest]
+                if len(subdirs) > len(largest):
+                    entry['omitted_children'] = len(subdirs) - len(largest)
+            return entry
+
+        # A directory holding all of its parent's bytes ranks after the parent
+        heaviest = heapq.nlargest(top_n, (d for d in totals if d != self.root),
+                                  key=lambda d: (totals[d]['size'], -d.count(os.sep)))
+        return {
+            'rollup': build(self.root, 0),
+            'top_subtrees': [dict(totals[d], path=d) for d in heaviest],
+        }
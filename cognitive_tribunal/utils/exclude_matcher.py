@@ -0,0 +1,233 @@
+"""
+Exclude rule matching for the Cognitive Tribunal project.
+Compiles glob and .gitignore-style rules once so the archive walker can
+test each directory entry cheaply and prune excluded directories early.
+"""
+
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Pattern, Tuple, Union
+
+
+_GLOB_CHARS = set('*?[')
+
+
+def _translate_glob(pattern: str, path_mode: bool) -> str:
+    """
+    Translate a glob into a regular expression body.
+
+    In path mode '*' and '?' stop at '/' and '**' crosses directories;
+    otherwise the pattern is matched against a single name.
+    """
+    i, n = 0, len(pattern)
+    parts = []
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if path_mode and pattern.startswith('**', i):
+                if pattern.startswith('**/', i):
+                    parts.append('(?:.*/)?')
+                    i += 3
+                else:
+                    parts.append('.*')
+                    i += 2
+                continue
+            parts.append('[^/]*' if path_mode else '.*')
+        elif c == '?':
+            parts.append('[^/]' if path_mode else '.')
+        elif c == '[':
+            end = pattern.find(']', i + 2 if pattern.startswith('[!', i) else i + 1)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                parts.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return ''.join(parts)
+
+
+class _Rule:
+    """A single compiled exclude rule."""
+
+    __slots__ = ('pattern', 'negated', 'dir_only', 'path_rule', 'regex')
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A slash anywhere but the end anchors the rule to the scan root
+        self.path_rule = '/' in pattern
+        pattern = pattern.lstrip('/')
+        self.regex = re.compile(_translate_glob(pattern, self.path_rule) + r'\Z', re.DOTALL)
+
+    def matches(self, name: str, is_dir: bool, rel_path: Optional[str]) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.path_rule:
+            return rel_path is not None and self.regex.match(rel_path) is not None
+        return self.regex.match(name) is not None
+
+
+class ExcludeMatcher:
+    """
+    Matches paths against exclude rules with .gitignore-style semantics.
+
+    - A rule without '/' is a glob matched against the entry name at any
+      depth ('node_modules', '*.tmp', '.DS_Store').
+    - A rule containing '/' is matched against the path relative to the
+      scan root ('build/cache', '/tmp/**', 'docs/**/*.pdf').
+    - A trailing '/' restricts the rule to directories.
+    - A leading '!' re-includes entries matched by an earlier rule.
+
+    Rules are compiled once: plain names go into a set, '*.ext' rules into
+    a suffix tuple and everything else into a single combined regex, so a
+    typical rule set costs a handful of operations per entry.
+    """
+
+    def __init__(self, patterns: Optional[Iterable[str]] = None):
+        """
+        Compile exclude rules.
+
+        Args:
+            patterns: Glob or .gitignore-style rules; blank lines and
+                lines starting with '#' are ignored
+        """
+        self.rules: List[_Rule] = []
+        for pattern in patterns or []:
+            pattern = pattern.strip()
+            if pattern and not pattern.startswith('#'):
+                self.rules.append(_Rule(pattern))
+
+        self.has_path_rules = any(rule.path_rule for rule in self.rules)
+        self._ordered = any(rule.negated for rule in self.rules)
+        if not self._ordered:
+            self._compile_fast_path()
+
+    @classmethod
+    def from_file(cls, rules_file: Union[str, Path],
+                  extra_patterns: Optional[Iterable[str]] = None) -> 'ExcludeMatcher':
+        """
+        Build a matcher from a .gitignore-style rules file.
+
+        Args:
+            rules_file: Path to the rules file
+            extra_patterns: Rules applied before those read from the file
+
+        Returns:
+            Compiled matcher
+        """
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            file_patterns = f.read().splitlines()
+        return cls(list(extra_patterns or []) + file_patterns)
+
+    def _compile_fast_path(self):
+        """Split rules into set, suffix and combined-regex lookups."""
+        self._names = set()
+        self._dir_names = set()
+        suffixes = []
+        name_regexes = []
+        dir_name_regexes = []
+        path_regexes = []
+        dir_path_regexes = []
+
+        for rule in self.rules:
+            body = rule.pattern.rstrip('/')
+            if rule.path_rule:
+                target = dir_path_regexes if rule.dir_only else path_regexes
+                target.append(rule.regex.pattern)
+            elif not (_GLOB_CHARS & set(body)):
+                (self._dir_names if rule.dir_only else self._names).add(body)
+            elif (not rule.dir_only and body.startswith('*')
+                  and not (_GLOB_CHARS & set(body[1:]))):
+                suffixes.append(body[1:])
+            else:
+                target = dir_name_regexes if rule.dir_only else name_regexes
+                target.append(rule.regex.pattern)
+
+        self._suffixes: Tuple[str, ...] = tuple(suffixes)
+        self._name_regex = self._combine(name_regexes)
+        self._dir_name_regex = self._combine(dir_name_regexes)
+        self._path_regex = self._combine(path_regexes)
+        self._dir_path_regex = self._combine(dir_path_regexes)
+
+    @staticmethod
+    def _combine(regexes: List[str]) -> Optional[Pattern]:
+        if not regexes:
+            return None
+        return re.compile('|'.join(f'(?:{r})' for r in regexes), re.DOTALL)
+
+    def excludes(self, name: str, is_dir: bool = False, rel_path: Optional[str] = None) -> bool:
+        """
+        Check a single directory entry.
+
+        Args:
+            name: Entry name (basename)
+            is_dir: Whether the entry is a directory
+            rel_path: '/'-separated path relative to the scan root; only
+                needed when has_path_rules is True
+
+        Returns:
+            True if the entry is excluded
+        """
+        if self._ordered:
+            for rule in reversed(self.rules):
+                if rule.matches(name, is_dir, rel_path):
+                    return not rule.negated
+            return False
+
+        if name in self._names:
+            return True
+        if self._suffixes and name.endswith(self._suffixes):
+            return True
+        if self._name_regex is not None and self._name_regex.match(name):
+            return True
+        if rel_path is not None:
+            if self._path_regex is not None and self._path_regex.match(rel_path):
+                return True
+        if is_dir:
+            if name in self._dir_names:
+                return True
+            if self._dir_name_regex is not None and self._dir_name_regex.match(name):
+                return True
+            if rel_path is not None and self._dir_path_regex is not None \
+                    and self._dir_path_regex.match(rel_path):
+                return True
+        return False
+
+    def match_path(self, path: Union[str, Path], root: Optional[Union[str, Path]] = None,
+                   is_dir: bool = False) -> bool:
+        """
+        Check a full path, including each of its parent directories.
+
+        Args:
+            path: Path to check
+            root: Scan root that path rules are relative to (the path's
+                own components are used when omitted or unrelated)
+            is_dir: Whether the final component is a directory
+
+        Returns:
+            True if the path or any parent directory below root is excluded
+        """
+        path = Path(path)
+        parts = path.parts
+        if root is not None:
+            try:
+                parts = path.relative_to(root).parts
+            except ValueError:
+                pass
+        parts = [part for part in parts if part not in ('/', '\\') and not part.endswith(('/', '\\'))]
+
+        for index, name in enumerate(parts):
+            last = index == len(parts) - 1
+            rel_path = '/'.join(parts[:index + 1])
+            if self.excludes(name, is_dir=is_dir if last else True, rel_path=rel_path):
+                return True
+        return False
@@ -0,0 +1,563 @@
+"""
+External-memory deduplication for the Cognitive Tribunal project.
+Finds duplicate files with sorted run files on disk instead of in-memory
+dicts, so memory stays bounded however many files are indexed.
+"""
+
+import heapq
+import os
+import shutil
+import struct
+import tempfile
+from itertools import chain, groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from .file_utils import Deduplicator, FileHasher, HashEngine, ThroughputLimiter
+from .hash_cache import HashCache
+
+
+# Paths file entry header: device, inode, size, mtime_ns, allocated bytes,
+# path length, flags
+_ENTRY_HEADER = struct.Struct('<QQqqqIB')
+# Entry flag: an archive member, whose partial, full and (when configured)
+# confirm digests follow the path
+_MEMBER = 1
+# Size run record: size, device, inode, path id
+_SIZE_RECORD = struct.Struct('<qQQQ')
+
+
+class _RunWriter:
+    """Buffers records and spills them to sorted run files."""
+
+    def __init__(self, work_dir: str, prefix: str, record: struct.Struct, buffer_limit: int):
+        self.work_dir = work_dir
+        self.prefix = prefix
+        self.record = record
+        self.buffer_limit = buffer_limit
+        self.buffer: List[Tuple] = []
+        self.runs: List[str] = []
+        self._count = 0
+
+    def next_path(self) -> str:
+        """Return a fresh run file path."""
+        self._count += 1
+        return os.path.join(self.work_dir, f"{self.prefix}-{self._count:06d}.run")
+
+    def add(self, item: Tuple):
+        self.buffer.append(item)
+        if len(self.buffer) >= self.buffer_limit:
+            self.spill()
+
+    def spill(self):
+        """Sort the buffer and write it out as one run."""
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        path = self.next_path()
+        pack = self.record.pack
+        with open(path, 'wb') as f:
+            f.write(b''.join(pack(*item) for item in self.buffer))
+        self.runs.append(path)
+        self.buffer = []
+
+    def remove(self):
+        """Delete all run files."""
+        for path in self.runs:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.runs = []
+        self.buffer = []
+
+
+class ExternalDeduplicator(Deduplicator):
+    """
+    Duplicate finder whose index lives in sorted run files.
+
+    The in-memory Deduplicator keeps a Path per file in dicts, so its memory
+    grows linearly with the archive. This variant appends each path once to
+    a paths file and refers to it by its byte offset (the path id). The
+    index is a series of sorted run files:
+
+    - add_file() buffers (size, device, inode, path id) tuples and spills
+      them as a sorted run whenever the buffer reaches the memory budget.
+    - find_duplicates() k-way merges the size runs with heapq.merge, so
+      equal sizes arrive together. Links to one inode sit next to each other
+      inside a size, which is how hardlinks are detected. Files in buckets
+      with more than one inode are hashed in batches, and (size, partial
+      hash, path id) tuples are spilled to a second set of runs.
+    - Those runs are merged the same way to find partial-hash collisions,
+      whose full hashes go to a third set of runs. Merging them yields the
+      duplicate groups.
+    - add_member() stores the member's precomputed digests after its path,
+      and the hash stages read them from there instead of opening a file.
+    - remove_file() cannot rewrite the append-only runs; it records the
+      path as removed, and the size merge skips the path's entries written
+      before the removal. Memory grows with the number of removals only.
+
+    Only the current batch, one buffer per stage and one read buffer per
+    merged run are held in memory. The stage rules, byte accounting, hash
+    cache names and result shape match Deduplicator, so the two are
+    interchangeable. Hashes are not memoized in memory; use a HashCache to
+    avoid rereading files across calls.
+    """
+
+    DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+    # Approximate in-memory cost of one buffered tuple
+    RECORD_OVERHEAD = 160
+    # Runs merged at once; more runs are first merged in several passes
+    MAX_MERGE_FAN_IN = 64
+    # Records read from a run per read call
+    READ_RECORDS = 4096
+    # Files hashed per batch (the batch goes through the hash engine)
+    HASH_BATCH = 1024
+
+    def __init__(self, work_dir: Optional[str] = None,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 hash_cache: Optional[HashCache] = None,
+                 hash_engine: Optional[HashEngine] = None,
+                 algorithm: str = 'sha256',
+                 confirm_algorithm: Optional[str] = None,
+                 read_limiter: Optional[ThroughputLimiter] = None):
+        """
+        Initialize the external deduplicator.
+
+        Args:
+            work_dir: Directory for the paths and run files (a private
+                subdirectory is created in it; system temp dir if None)
+            memory_budget: Approximate bytes of buffered records to hold
+                before spilling a run
+            hash_cache: Optional persistent hash cache
+            hash_engine: Optional pool used to hash candidate batches
+            algorithm: Hash backend for the partial and full hash stages
+            confirm_algorithm: Optional cryptographic backend used to confirm
+                final duplicate groups
+            read_limiter: Optional throughput limiter for hash reads
+
+        Raises:
+            ValueError: If either algorithm is unknown
+        """
+        super().__init__(hash_cache=hash_cache, hash_engine=hash_engine,
+                         algorithm=algorithm, confirm_algorithm=confirm_algorithm,
+                         read_limiter=read_limiter)
+        if work_dir is not None:
+            os.makedirs(work_dir, exist_ok=True)
+        self.work_dir = tempfile.mkdtemp(prefix='dedup-', dir=work_dir)
+        self.memory_budget = memory_budget
+        self.buffer_limit = max(1024, memory_budget // self.RECORD_OVERHEAD)
+
+        self._paths_path = os.path.join(self.work_dir, 'paths.bin')
+        self._paths_writer = open(self._paths_path, 'wb')
+        self._paths_reader = None
+        self._paths_size = 0
+        self._size_runs = _RunWriter(self.work_dir, 'size', _SIZE_RECORD, self.buffer_limit)
+        self._digest_sizes = {
+            name: FileHasher.new_hasher(name).digest_size
+            for name in (algorithm, confirm_algorithm) if name is not None
+        }
+
+        # Removed path -> paths file size at its removal, so entries written
+        # earlier are skipped; the sizes tell which entries to check
+        self._removed: Dict[str, int] = {}
+        self._removed_sizes: Set[int] = set()
+        self._hardlinks: Dict[str, List[Path]] = {}
+        self._details: Dict[str, Dict] = {}
+        self._total_files = 0
+        self._unique_sizes = 0
+
+    def add_file(self, file_path: Path, compute_full_hash: bool = False,
+                 stat_result: Optional[os.stat_result] = None):
+        """
+        Add a file to the deduplication index.
+
+        Args:
+            file_path: Path to the file
+            compute_full_hash: Ignored; hashing always happens in
+                find_duplicates()
+            stat_result: Stat result already obtained by the caller, if any
+        """
+        try:
+            if stat_result is None:
+                stat_result = file_path.stat()
+        except (IOError, OSError):
+            return
+
+        device, inode, size, mtime_ns = HashCache.key_for(stat_result)
+        path_id = self._write_entry(file_path, (device, inode, size, mtime_ns), self.allocated_size(stat_result))
+
+        # Only genuine extra links share an inode; without stable inode
+        # numbers every file stands alone
+        if not (stat_result.st_nlink > 1 and inode):
+            inode = 0
+        self._size_runs.add((size, device, inode, path_id))
+        self._duplicates = None
+
+    def add_member(self, member_path: str, size: int, allocated: int, partial_hash: str,
+                   full_hash: str, confirm_hash: Optional[str] = None):
+        """
+        Add an archive member that was hashed while its archive was streamed.
+
+        The hashes are stored with the member's paths file entry, so the
+        hash stages compare it with loose files (and other members) without
+        opening its virtual path.
+
+        Args:
+            member_path: Virtual path, e.g. 'backup.zip!/docs/a.pdf', reported
+                exactly as given
+            size: Uncompressed size
+            allocated: Bytes the member occupies in its archive
+            partial_hash: First/last-block hash, as compute_partial_hash
+                computes it for the extracted file
+            full_hash: Full content hash with this deduplicator's algorithm
+            confirm_hash: Content hash with confirm_algorithm, required when
+                one is configured
+        """
+        if self.confirm_algorithm is not None and confirm_hash is None:
+            raise ValueError('confirm_hash is required when a confirm_algorithm is configured')
+        digests = bytes.fromhex(partial_hash) + bytes.fromhex(full_hash)
+        if self.confirm_algorithm is not None:
+            digests += bytes.fromhex(confirm_hash)
+        path_id = self._write_entry(member_path, (0, 0, size, 0), allocated, _MEMBER, digests)
+        self._size_runs.add((size, 0, 0, path_id))
+        self._duplicates = None
+
+    def _write_entry(self, file_path: Path, key: Tuple[int, int, int, int], allocated: int,
+                     flags: int = 0, digests: bytes = b'') -> int:
+        """Append an entry to the paths file and return its path id."""
+        encoded = os.fsencode(str(file_path))
+        path_id = self._paths_size
+        self._paths_writer.write(_ENTRY_HEADER.pack(*key, allocated, len(encoded), flags))
+        self._paths_writer.write(encoded)
+        self._paths_writer.write(digests)
+        self._paths_size += _ENTRY_HEADER.size + len(encoded) + len(digests)
+        return path_id
+
+    def remove_file(self, file_path: Path, size: int) -> bool:
+        """
+        Remove a file from the deduplication index.
+
+        The path is recorded as removed; its entries added so far are
+        skipped when the size runs are merged, and adding the path again
+        afterwards indexes it anew.
+
+        Args:
+            file_path: Path as passed to add_file()
+            size: Size the file had when it was added
+
+        Returns:
+            True; whether the file was indexed is only known once the runs
+            are merged
+        """
+        self._removed[str(file_path)] = self._paths_size
+        self._removed_sizes.add(size)
+        self._duplicates = None
+        return True
+
+    def _live_size_records(self) -> Iterator[Tuple]:
+        """Merge the size runs, skipping the entries of removed files."""
+        records = self._merge(self._size_runs)
+        if not self._removed:
+            return records
+
+        def live():
+            for record in records:
+                size, _, _, path_id = record
+                if size in self._removed_sizes:
+                    removed_at = self._removed.get(str(self._read_entry(path_id)[0]))
+                    if removed_at is not None and path_id < removed_at:
+                        continue
+                yield record
+        return live()
+
+    def _read_entry(self, path_id: int) -> Tuple[Union[str, Path], Tuple[int, int, int, int], int]:
+        """
+        Return the path, cache key and allocated bytes stored under a path id.
+
+        Archive members' virtual paths are returned as the strings added.
+        """
+        self._paths_reader.seek(path_id)
+        device, inode, size, mtime_ns, allocated, length, flags = _ENTRY_HEADER.unpack(
+            self._paths_reader.read(_ENTRY_HEADER.size))
+        path = os.fsdecode(self._paths_reader.read(length))
+        return (path if flags & _MEMBER else Path(path)), (device, inode, size, mtime_ns), allocated
+
+    def _member_hash(self, path_id: int, partial: bool, algorithm: str) -> Optional[str]:
+        """Return an archive member's stored hash, or None for a loose file."""
+        self._paths_reader.seek(path_id)
+        header = _ENTRY_HEADER.unpack(self._paths_reader.read(_ENTRY_HEADER.size))
+        if not header[-1] & _MEMBER:
+            return None
+        digest_size = self._digest_sizes[self.algorithm]
+        if algorithm != self.algorithm:
+            offset, digest_size = 2 * digest_size, self._digest_sizes[algorithm]
+        else:
+            offset = 0 if partial else digest_size
+        self._paths_reader.seek(path_id + _ENTRY_HEADER.size + header[5] + offset)
+        return self._paths_reader.read(digest_size).hex()
+
+    def _read_run(self, path: str, record: struct.Struct) -> Iterator[Tuple]:
+        chunk_size = record.size * self.READ_RECORDS
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield from record.iter_unpack(chunk)
+
+    def _merge(self, runs: _RunWriter) -> Iterator[Tuple]:
+        """Merge a writer's runs into one sorted stream."""
+        runs.spill()
+        while len(runs.runs) > self.MAX_MERGE_FAN_IN:
+            # Merge the oldest runs into one, keeping open files bounded
+            batch, rest = runs.runs[:self.MAX_MERGE_FAN_IN], runs.runs[self.MAX_MERGE_FAN_IN:]
+            merged_path = runs.next_path()
+            pack = runs.record.pack
+            with open(merged_path, 'wb') as f:
+                for item in heapq.merge(*(self._read_run(p, runs.record) for p in batch)):
+                    f.write(pack(*item))
+            for path in batch:
+                os.unlink(path)
+            runs.runs = rest + [merged_path]
+        return heapq.merge(*(self._read_run(p, runs.record) for p in runs.runs))
+
+    def _hash_record(self, digest_name: str) -> struct.Struct:
+        return struct.Struct(f'<q{self._digest_sizes[digest_name]}sQ')
+
+    def _hash_batch(self, batch: List[Tuple[int, int]], partial: bool,
+                    algorithm: Optional[str] = None) -> Iterator[Tuple[int, int, bytes]]:
+        """
+        Hash a batch of (size, path id) candidates.
+
+        Yields:
+            (size, digest bytes, path id) for files that could be read
+        """
+        algorithm = algorithm or self.algorithm
+        cache_algorithm = self._cache_algorithm(partial, algorithm)
+        digests: Dict[int, str] = {}
+        missing: Dict[Path, Tuple[int, Tuple]] = {}
+        for size, path_id in batch:
+            member_hash = self._member_hash(path_id, partial, algorithm)
+            if member_hash is not None:
+                digests[path_id] = member_hash
+                continue
+            file_path, key, _ = self._read_entry(path_id)
+            cached = self.hash_cache.get(key, cache_algorithm) if self.hash_cache is not None else None
+            if cached is not None:
+                digests[path_id] = cached
+            else:
+                missing[file_path] = (path_id, key)
+
+        if self.hash_engine is not None:
+            hashed = self.hash_engine.hash_files(
+                list(missing), algorithm, partial=partial, block_size=self.PARTIAL_BLOCK_SIZE,
+                limiter=self.read_limiter)
+        elif partial:
+            hashed = ((f, FileHasher.compute_partial_hash(f, algorithm, self.PARTIAL_BLOCK_SIZE, self.read_limiter))
+                      for f in missing)
+        else:
+            hashed = ((f, FileHasher.compute_hash(f, algorithm, limiter=self.read_limiter)) for f in missing)
+        for file_path, file_hash in hashed:
+            path_id, key = missing[file_path]
+            if self.hash_cache is not None:
+                self.hash_cache.put(key, cache_algorithm, file_hash, file_path)
+            digests[path_id] = file_hash
+
+        for size, path_id in batch:
+            file_hash = digests.get(path_id, 'ERROR')
+            if not file_hash.startswith('ERROR'):
+                yield size, bytes.fromhex(file_hash), path_id
+
+    def _hash_into(self, candidates: Iterator[Tuple[int, int]], writer: _RunWriter,
+                   partial: bool, algorithm: Optional[str] = None):
+        """Hash candidates in batches and spill the results into writer."""
+        batch: List[Tuple[int, int]] = []
+        for candidate in candidates:
+            batch.append(candidate)
+            if len(batch) >= self.HASH_BATCH:
+                for item in self._hash_batch(batch, partial, algorithm):
+                    writer.add(item)
+                batch = []
+        for item in self._hash_batch(batch, partial, algorithm):
+            writer.add(item)
+
+    def _size_stage(self, stats: Dict) -> Iterator[Tuple[int, int]]:
+        """
+        Stage 1: merge the size runs.
+
+        Yields (size, path id) for every file whose size is shared with
+        another inode, recording hardlinks and size statistics on the way.
+        """
+        self._hardlinks = {}
+        self._total_files = 0
+        self._unique_sizes = 0
+        for size, records in groupby(self._live_size_records(), key=itemgetter(0)):
+            self._unique_sizes += 1
+            primaries = []
+            # Links to one inode are adjacent; files without a shared inode
+            # get a key of their own
+            for (device, inode, _), links in groupby(
+                    records, key=lambda r: (r[1], r[2], 0) if r[2] else (r[1], 0, r[3])):
+                links = list(links)
+                if len(links) > 1:
+                    self._hardlinks[f"{device}:{inode}"] = [self._read_entry(r[3])[0] for r in links]
+                self._total_files += 1
+                if len(primaries) < 2:
+                    primaries.append(links[0][3])
+                    if len(primaries) < 2:
+                        continue
+                    yield size, primaries[0]
+                yield size, links[0][3]
+            if len(primaries) < 2:
+                stats['bytes_skipped_by_size'] += size
+
+    def find_duplicates(self) -> Dict[str, List[Path]]:
+        """
+        Find all duplicate files by merging the on-disk runs.
+
+        The result is cached until another file is added.
+
+        Returns:
+            Dictionary mapping hash to list of duplicate file paths. Keys are
+            confirm_algorithm digests when a confirmation pass is configured.
+        """
+        if self._duplicates is not None:
+            return self._duplicates
+
+        self._paths_writer.flush()
+        if self._paths_reader is None:
+            self._paths_reader = open(self._paths_path, 'rb')
+
+        block = self.PARTIAL_BLOCK_SIZE
+        stats = self._empty_pipeline_stats()
+        partial_runs = _RunWriter(self.work_dir, 'partial', self._hash_record(self.algorithm), self.buffer_limit)
+        full_runs = _RunWriter(self.work_dir, 'full', self._hash_record(self.algorithm), self.buffer_limit)
+        small: List[Tuple[int, int]] = []
+
+        try:
+            # Stage 2: large files are compared by partial hash first; small
+            # files are read whole by it anyway and go straight to stage 3
+            def large_candidates():
+                for size, path_id in self._size_stage(stats):
+                    if size <= 2 * block:
+                        small.append((size, path_id))
+                        if len(small) >= self.HASH_BATCH:
+                            self._hash_into(iter(small), full_runs, partial=False)
+                            stats['bytes_read_full'] += sum(s for s, _ in small)
+                            small.clear()
+                    else:
+                        stats['bytes_read_partial'] += 2 * block
+                        yield size, path_id
+
+            self._hash_into(large_candidates(), partial_runs, partial=True)
+            self._hash_into(iter(small), full_runs, partial=False)
+            stats['bytes_read_full'] += sum(s for s, _ in small)
+
+            def partial_collisions():
+                for (size, _), members in groupby(self._merge(partial_runs), key=itemgetter(0, 1)):
+                    first = next(members)
+                    second = next(members, None)
+                    if second is None:
+                        stats['bytes_skipped_by_partial_hash'] += size - 2 * block
+                        continue
+                    for _, _, path_id in chain((first, second), members):
+                        stats['bytes_read_full'] += size
+                        yield size, path_id
+
+            # Stage 3: full hashes for files that still collide
+            self._hash_into(partial_collisions(), full_runs, partial=False)
+            partial_runs.remove()
+
+            duplicates: Dict[str, List[Path]] = {}
+            details: Dict[str, Dict] = {}
+
+            def add_group(digest: bytes, size: int, entries: List[Tuple]):
+                # Savings use the first copy's blocks as recorded by add_file()
+                paths = [entry[0] for entry in entries]
+                duplicates[digest.hex()] = paths
+                details[digest.hex()] = {'size': size, 'allocated': entries[0][2], 'paths': paths}
+
+            for (size, digest), members in groupby(self._merge(full_runs), key=itemgetter(0, 1)):
+                members = list(members)
+                if len(members) < 2:
+                    continue
+                if self.confirm_algorithm is None:
+                    add_group(digest, size, [self._read_entry(path_id) for _, _, path_id in members])
+                    continue
+                # Stage 4: confirm final groups with the cryptographic backend
+                stats['bytes_read_confirm'] += size * len(members)
+                confirmed: Dict[bytes, List[Tuple]] = {}
+                batch = [(size, path_id) for _, _, path_id in members]
+                for _, confirm_digest, path_id in self._hash_batch(
+                        batch, partial=False, algorithm=self.confirm_algorithm):
+                    confirmed.setdefault(confirm_digest, []).append(self._read_entry(path_id))
+                for confirm_digest, entries in confirmed.items():
+                    if len(entries) > 1:
+                        add_group(confirm_digest, size, entries)
+        finally:
+            partial_runs.remove()
+            full_runs.remove()
+
+        self.pipeline_stats = stats
+        self._details = details
+        self._duplicates = duplicates
+        return duplicates
+
+    def get_duplicate_details(self) -> Dict[str, Dict]:
+        """
+        Get duplicate groups with the sizes recorded when files were added.
+
+        Returns:
+            Dictionary mapping hash to {'size': bytes per copy, 'allocated':
+            allocated bytes of the first copy, 'paths': duplicate paths}
+        """
+        self.find_duplicates()
+        return self._details
+
+    def get_hardlinks(self) -> Dict[str, List[Path]]:
+        """
+        Get paths that are hardlinks to the same inode.
+
+        Returns:
+            Dictionary mapping "device:inode" to the linked paths; the first
+            path is the one that took part in the duplicate search
+        """
+        self.find_duplicates()
+        return self._hardlinks
+
+    def get_stats(self) -> Dict:
+        """Get deduplication statistics."""
+        duplicates = self.find_duplicates()
+        hardlinks = self._hardlinks
+        stats = {
+            'algorithm': self.algorithm,
+            'confirm_algorithm': self.confirm_algorithm,
+            'total_files': self._total_files,
+            'unique_sizes': self._unique_sizes,
+            'duplicate_groups': len(duplicates),
+            'duplicate_files': sum(len(files) - 1 for files in duplicates.values()),
+            'hardlink_groups': len(hardlinks),
+            'hardlinked_files': sum(len(paths) - 1 for paths in hardlinks.values()),
+            'pipeline': dict(self.pipeline_stats),
+            'external': {
+                'memory_budget': self.memory_budget,
+                'size_runs': len(self._size_runs.runs),
+                'paths_bytes': self._paths_size,
+            },
+        }
+        if self.hash_cache is not None:
+            stats['hash_cache'] = {'hits': self.hash_cache.hits, 'misses': self.hash_cache.misses}
+        return stats
+
+    def __getstate__(self) -> Dict:
+        raise TypeError('ExternalDeduplicator keeps its index in open run files and cannot be pickled')
+
+    def close(self):
+        """Close the paths file and remove the work directory."""
+        for handle in (self._paths_writer, self._paths_reader):
+            if handle is not None:
+                handle.close()
+        self._paths_reader = None
+        shutil.rmtree(self.work_dir, ignore_errors=True)
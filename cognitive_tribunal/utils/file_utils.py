@@ -6,13 +6,68 @@
 import os
 import hashlib
 import mimetypes
+import concurrent.futures
+import threading
+import time
+from array import array
 from pathlib import Path
-from typing import Dict, List, Set, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Optional, Tuple
 from datetime import datetime
 
+from .hash_cache import HashCache
+
+try:
+    import xxhash
+except ImportError:
+    # Graceful degradation if xxhash not installed
+    xxhash = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+# Hash backends by name: (factory returning a hashlib-style object, cryptographic)
+HASH_BACKENDS: Dict[str, Tuple[Callable[[], Any], bool]] = {
+    'sha256': (hashlib.sha256, True),
+    'sha1': (hashlib.sha1, True),
+    'md5': (hashlib.md5, True),
+    'blake2b': (hashlib.blake2b, True),
+    'blake2b-128': (lambda: hashlib.blake2b(digest_size=16), False),
+}
+if xxhash is not None:
+    HASH_BACKENDS['xxh3_128'] = (xxhash.xxh3_128, False)
+    HASH_BACKENDS['xxh64'] = (xxhash.xxh64, False)
+
+
+def register_hash_backend(name: str, factory: Callable[[], Any], cryptographic: bool = False):
+    """
+    Register a hash backend for deduplication.
+    
+    Args:
+        name: Algorithm name used in results and the hash cache
+        factory: Callable returning an object with update() and hexdigest()
+        cryptographic: Whether the backend is collision resistant
+    """
+    HASH_BACKENDS[name] = (factory, cryptographic)
+
+
+def fast_hash_algorithm() -> str:
+    """Fastest registered 128-bit non-cryptographic backend (xxh3_128 when xxhash is installed)."""
+    return 'xxh3_128' if 'xxh3_128' in HASH_BACKENDS else 'blake2b-128'
+
 
 class FileClassifier:
-    """Classifies files by type and purpose."""
+    """
+    Classifies files by type and purpose.
+    
+    Classification is one dict lookup: FILE_CATEGORIES is inverted into a
+    suffix-to-category map when the class is defined, and kept in sync by
+    register_category(). MIME types are memoized per suffix, so the
+    mimetypes database is loaded on the first lookup and consulted once
+    per distinct suffix.
+    """
     
     FILE_CATEGORIES = {
         'code': ['.py', '.js', '.java', '.cpp', '.c', '.h', '.cs', '.go', '.rs', '.rb', '.php'],
@@ -29,46 +84,234 @@ class FileClassifier:
         'config': ['.conf', '.config', '.env', '.properties'],
     }
     
+    # Lowercased suffix -> category, derived from FILE_CATEGORIES
+    _suffix_categories: Dict[str, str] = {}
+    # Suffix (two for compressed files, e.g. '.tar.gz') -> MIME type
+    _mime_types: Dict[str, Optional[str]] = {}
+    
+    @classmethod
+    def _build_suffix_map(cls):
+        """Invert FILE_CATEGORIES; an extension listed twice keeps its first category."""
+        suffix_categories: Dict[str, str] = {}
+        for category, extensions in cls.FILE_CATEGORIES.items():
+            for ext in extensions:
+                suffix_categories.setdefault(ext.lower(), category)
+        cls._suffix_categories = suffix_categories
+    
     @classmethod
     def classify(cls, file_path: Path) -> str:
         """Classify a file based on its extension."""
-        ext = file_path.suffix.lower()
+        return cls._suffix_categories.get(file_path.suffix.lower(), 'other')
+    
+    @classmethod
+    def register_category(cls, category: str, extensions: Iterable[str]):
+        """
+        Add a category, or extensions to an existing one.
         
-        for category, extensions in cls.FILE_CATEGORIES.items():
-            if ext in extensions:
-                return category
+        An extension already mapped to another category moves to this one.
         
-        return 'other'
+        Args:
+            category: Category name
+            extensions: Extensions, with or without the leading dot
+        """
+        category_extensions = cls.FILE_CATEGORIES.setdefault(category, [])
+        for ext in extensions:
+            ext = ext.lower()
+            if not ext.startswith('.'):
+                ext = '.' + ext
+            for other, other_extensions in cls.FILE_CATEGORIES.items():
+                if other != category and ext in other_extensions:
+                    other_extensions.remove(ext)
+            if ext not in category_extensions:
+                category_extensions.append(ext)
+            cls._suffix_categories[ext] = category
+    
+    @classmethod
+    def load_categories(cls, config_path: str) -> Dict[str, List[str]]:
+        """
+        Register categories from a YAML file.
+        
+        Reads the 'archives.categories' section of a config.yaml, or a
+        top-level mapping of category name to extension list.
+        
+        Args:
+            config_path: Path to the YAML file
+            
+        Returns:
+            The categories registered
+            
+        Raises:
+            ImportError: If PyYAML is not installed
+            ValueError: If the file holds no category mapping
+        """
+        if yaml is None:
+            raise ImportError('Loading categories requires PyYAML')
+        with open(config_path) as f:
+            config = yaml.safe_load(f) or {}
+        categories = config
+        if isinstance(config, dict) and isinstance(config.get('archives'), dict) \
+                and 'categories' in config['archives']:
+            categories = config['archives']['categories']
+        if not isinstance(categories, dict) or not all(
+                isinstance(extensions, list) for extensions in categories.values()):
+            raise ValueError(f"No category mapping in {config_path}")
+        for category, extensions in categories.items():
+            cls.register_category(str(category), [str(ext) for ext in extensions])
+        return categories
     
     @classmethod
     def get_mime_type(cls, file_path: Path) -> Optional[str]:
         """Get MIME type for a file."""
-        mime_type, _ = mimetypes.guess_type(str(file_path))
+        name = file_path.name
+        dot = name.rfind('.')
+        suffix = name[dot:] if dot > 0 else ''
+        if suffix in mimetypes.encodings_map or suffix.lower() in mimetypes.encodings_map:
+            # 'x.tar.gz' is a gzip-encoded tar: the type comes from '.tar'
+            inner = name.rfind('.', 0, dot)
+            if inner > 0:
+                suffix = name[inner:]
+        try:
+            return cls._mime_types[suffix]
+        except KeyError:
+            pass
+        mime_type, _ = mimetypes.guess_type('x' + suffix)
+        cls._mime_types[suffix] = mime_type
         return mime_type
 
 
+FileClassifier._build_suffix_map()
+
+
+class ThroughputLimiter:
+    """
+    Thread-safe token bucket that caps read throughput in bytes per second.
+    
+    Readers call consume() after each read; a reader that overdraws the
+    bucket sleeps until the debt is repaid, so concurrent readers sharing a
+    limiter are jointly held to the configured rate.
+    """
+    
+    def __init__(self, bytes_per_second: float, burst: Optional[float] = None):
+        """
+        Initialize the limiter.
+        
+        Args:
+            bytes_per_second: Sustained throughput limit
+            burst: Bytes that may be read without waiting after an idle
+                period (defaults to one second's worth)
+        """
+        if bytes_per_second <= 0:
+            raise ValueError('bytes_per_second must be positive')
+        self.rate = float(bytes_per_second)
+        self.burst = float(burst if burst is not None else bytes_per_second)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def consume(self, nbytes: int):
+        """Account for nbytes read, sleeping if the limit has been exceeded."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
 class FileHasher:
     """Handles file hashing for deduplication."""
     
+    DEFAULT_BUFFER_SIZE = 1024 * 1024
+    
+    @staticmethod
+    def new_hasher(algorithm: str):
+        """
+        Create a hash object for a registered backend or any hashlib algorithm.
+        
+        Raises:
+            ValueError: If the algorithm is unknown
+        """
+        if algorithm in HASH_BACKENDS:
+            return HASH_BACKENDS[algorithm][0]()
+        return hashlib.new(algorithm)
+    
     @staticmethod
-    def compute_hash(file_path: Path, algorithm: str = 'sha256') -> str:
+    def compute_hash(file_path: Path, algorithm: str = 'sha256',
+                     buffer_size: Optional[int] = None,
+                     limiter: Optional[ThroughputLimiter] = None) -> str:
         """
         Compute hash of a file.
         
         Args:
             file_path: Path to the file
-            algorithm: Hash algorithm to use (sha256, md5, etc.)
+            algorithm: Hash algorithm to use (sha256, xxh3_128, blake2b-128, etc.)
+            buffer_size: Read buffer size in bytes. When omitted,
+                hashlib.file_digest is used where available (Python 3.11+).
+            limiter: Optional throughput limiter charged for every read
             
         Returns:
             Hexadecimal hash string
         """
-        hash_func = hashlib.new(algorithm)
-        
         try:
             with open(file_path, 'rb') as f:
+                if buffer_size is None and limiter is None and hasattr(hashlib, 'file_digest'):
+                    return hashlib.file_digest(f, lambda: FileHasher.new_hasher(algorithm)).hexdigest()
+                
                 # Read in chunks to handle large files
-                for chunk in iter(lambda: f.read(8192), b''):
-                    hash_func.update(chunk)
+                hash_func = FileHasher.new_hasher(algorithm)
+                buffer = bytearray(buffer_size or FileHasher.DEFAULT_BUFFER_SIZE)
+                view = memoryview(buffer)
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    hash_func.update(view[:read])
+                    if limiter is not None:
+                        limiter.consume(read)
+            return hash_func.hexdigest()
+        except (IOError, OSError) as e:
+            return f"ERROR: {str(e)}"
+    
+    @staticmethod
+    def compute_partial_hash(file_path: Path, algorithm: str = 'sha256',
+                             block_size: int = 65536,
+                             limiter: Optional[ThroughputLimiter] = None) -> str:
+        """
+        Compute hash of the first and last block of a file.
+        
+        Files no larger than two blocks are hashed in full, so for them the
+        partial hash is as discriminating as the full hash.
+        
+        Args:
+            file_path: Path to the file
+            algorithm: Hash algorithm to use (sha256, xxh3_128, blake2b-128, etc.)
+            block_size: Number of bytes read from each end of the file
+            limiter: Optional throughput limiter charged for every read
+            
+        Returns:
+            Hexadecimal hash string
+        """
+        hash_func = FileHasher.new_hasher(algorithm)
+        
+        try:
+            with open(file_path, 'rb') as f:
+                head = f.read(block_size)
+                hash_func.update(head)
+                if len(head) == block_size:
+                    f.seek(0, os.SEEK_END)
+                    file_size = f.tell()
+                    if file_size > 2 * block_size:
+                        f.seek(file_size - block_size)
+                    else:
+                        f.seek(block_size)
+                    tail = f.read(block_size)
+                    hash_func.update(tail)
+                    if limiter is not None:
+                        limiter.consume(len(tail))
+                if limiter is not None:
+                    limiter.consume(len(head))
             return hash_func.hexdigest()
         except (IOError, OSError) as e:
             return f"ERROR: {str(e)}"
@@ -87,64 +330,580 @@ def compute_quick_hash(file_path: Path) -> str:
             return f"ERROR: {str(e)}"
 
 
+def _hash_job(file_path: Path, algorithm: str, partial: bool, block_size: int,
+              buffer_size: Optional[int], limiter: Optional[ThroughputLimiter] = None) -> str:
+    """Hash one file; module-level so process pools can pickle it."""
+    if partial:
+        return FileHasher.compute_partial_hash(file_path, algorithm, block_size, limiter)
+    return FileHasher.compute_hash(file_path, algorithm, buffer_size, limiter)
+
+
+class HashEngine:
+    """
+    Hashes files concurrently on a thread or process pool.
+    
+    At most max_in_flight jobs are submitted at any time, so feeding the
+    engine millions of paths does not queue millions of futures.
+    Threads suit I/O-bound storage (hashlib releases the GIL on large
+    buffers); processes suit CPU-bound hashing on fast SSDs.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, use_processes: bool = False,
+                 max_in_flight: Optional[int] = None, buffer_size: Optional[int] = None):
+        """
+        Initialize the hash engine.
+        
+        Args:
+            workers: Pool size (defaults to the CPU count)
+            use_processes: Use a process pool instead of a thread pool
+            max_in_flight: Maximum number of submitted, unfinished jobs
+                (defaults to four per worker)
+            buffer_size: Read buffer size in bytes for full hashes (None lets
+                hashlib.file_digest choose where available)
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.max_in_flight = max_in_flight or self.workers * 4
+        self.buffer_size = buffer_size
+        self._executor = None
+    
+    def _get_executor(self):
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        return self._executor
+    
+    def limited(self, max_in_flight: int) -> 'HashEngine':
+        """
+        Return an engine sharing this engine's pool with fewer jobs in flight.
+        
+        Closing this engine also shuts down the returned one's pool.
+        """
+        engine = HashEngine(self.workers, self.use_processes, max_in_flight, self.buffer_size)
+        engine._executor = self._get_executor()
+        return engine
+    
+    def hash_files(self, files: Iterable[Path], algorithm: str = 'sha256', partial: bool = False,
+                   block_size: int = 65536,
+                   limiter: Optional[ThroughputLimiter] = None) -> Iterator[Tuple[Path, str]]:
+        """
+        Hash files concurrently.
+        
+        Args:
+            files: Paths to hash
+            algorithm: Hash algorithm to use
+            partial: Hash only the first and last block of each file
+            block_size: Block size for partial hashes
+            limiter: Optional throughput limiter shared by all workers
+                (thread pools only)
+            
+        Yields:
+            (path, hex digest) tuples in completion order
+        
+        Raises:
+            ValueError: If a limiter is used with a process pool
+        """
+        if limiter is not None and self.use_processes:
+            raise ValueError('Throughput limits require a thread pool')
+        executor = self._get_executor()
+        in_flight: Dict[concurrent.futures.Future, Path] = {}
+        
+        def drain(return_when):
+            done, _ = concurrent.futures.wait(in_flight, return_when=return_when)
+            for future in done:
+                file_path = in_flight.pop(future)
+                try:
+                    yield file_path, future.result()
+                except Exception as e:
+                    yield file_path, f"ERROR: {str(e)}"
+        
+        for file_path in files:
+            if len(in_flight) >= self.max_in_flight:
+                yield from drain(concurrent.futures.FIRST_COMPLETED)
+            future = executor.submit(_hash_job, file_path, algorithm, partial, block_size,
+                                     self.buffer_size, limiter)
+            in_flight[future] = file_path
+        
+        while in_flight:
+            yield from drain(concurrent.futures.ALL_COMPLETED)
+    
+    def close(self):
+        """Shut down the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 class Deduplicator:
-    """Identifies duplicate files."""
+    """
+    Identifies duplicate files.
+    
+    Candidates are narrowed in three stages: files are grouped by size, files
+    sharing a size are compared by a hash of their first and last block, and
+    only files that still collide are hashed in full.
     
-    def __init__(self):
+    Hashes and per-size duplicate groups are memoized and only size buckets
+    that received new files are re-examined, so each file's content is read
+    at most once no matter how often results are requested.
+    
+    Hardlinks are detected from (st_dev, st_ino): only the first path of an
+    inode enters the duplicate search, and further links are reported
+    separately because deleting them frees no space.
+    
+    The hash backend is pluggable. With a fast non-cryptographic algorithm,
+    an optional confirmation pass rehashes only the final duplicate groups
+    with a cryptographic algorithm.
+    """
+    
+    PARTIAL_BLOCK_SIZE = 65536
+    
+    def __init__(self, hash_cache: Optional['HashCache'] = None,
+                 hash_engine: Optional[HashEngine] = None,
+                 algorithm: str = 'sha256',
+                 confirm_algorithm: Optional[str] = None,
+                 read_limiter: Optional[ThroughputLimiter] = None):
+        """
+        Initialize the deduplicator.
+        
+        Args:
+            hash_cache: Optional persistent hash cache consulted before
+                reading file contents
+            hash_engine: Optional pool used to hash candidates concurrently
+                (hashes are computed inline on the calling thread otherwise)
+            algorithm: Hash backend for the partial and full hash stages
+            confirm_algorithm: Optional cryptographic backend used to confirm
+                final duplicate groups
+            read_limiter: Optional throughput limiter for hash reads
+        
+        Raises:
+            ValueError: If either algorithm is unknown
+        """
+        for name in (algorithm, confirm_algorithm):
+            if name is not None:
+                FileHasher.new_hasher(name)
+
         self.hash_to_files: Dict[str, List[Path]] = {}
         self.size_to_files: Dict[int, List[Path]] = {}
+        # Allocated bytes per file, aligned with size_to_files
+        self.size_to_allocated: Dict[int, array] = {}
+        self.hash_cache = hash_cache
+        self.hash_engine = hash_engine
+        self.algorithm = algorithm
+        self.confirm_algorithm = confirm_algorithm
+        self.read_limiter = read_limiter
+        # (device, inode, size, mtime_ns) per file, recorded for cache lookups
+        self.file_keys: Dict[Path, Tuple[int, int, int, int]] = {}
+        # Paths per (device, inode), tracked only for files with st_nlink > 1
+        self.inode_to_paths: Dict[Tuple[int, int], List[Path]] = {}
+        self._link_inodes: Dict[Path, Tuple[int, int]] = {}
+        self.pipeline_stats = self._empty_pipeline_stats()
+        # Memoized duplicate index, maintained incrementally
+        self._hash_memos: Dict[str, Dict[Path, str]] = {}
+        self._groups_by_size: Dict[int, Dict[str, List[Path]]] = {}
+        self._allocated_by_size: Dict[int, Dict[str, int]] = {}
+        self._stats_by_size: Dict[int, Dict] = {}
+        self._dirty_sizes: Set[int] = set()
+        self._duplicates: Optional[Dict[str, List[Path]]] = None
+    
+    def __getstate__(self) -> Dict:
+        """
+        Pickle state without the hash cache and engine.
+        
+        Both hold connections or worker pools; reattach them (and any read
+        limiter) after loading a scan checkpoint.
+        """
+        state = self.__dict__.copy()
+        state['hash_cache'] = None
+        state['hash_engine'] = None
+        state['read_limiter'] = None
+        return state
+    
+    @staticmethod
+    def allocated_size(stat_result: os.stat_result) -> int:
+        """
+        Bytes a file occupies on disk, which is what deleting a copy frees.
+        
+        Uses allocated blocks where the platform reports them (sparse and
+        small files), and the apparent size elsewhere.
+        """
+        blocks = getattr(stat_result, 'st_blocks', None)
+        return blocks * 512 if blocks is not None else stat_result.st_size
+    
+    @staticmethod
+    def _empty_pipeline_stats() -> Dict:
+        """Byte accounting for each stage of the duplicate search."""
+        return {
+            'bytes_skipped_by_size': 0,
+            'bytes_read_partial': 0,
+            'bytes_skipped_by_partial_hash': 0,
+            'bytes_read_full': 0,
+            'bytes_read_confirm': 0,
+        }
+    
+    def _cache_algorithm(self, partial: bool, algorithm: Optional[str] = None) -> str:
+        """Algorithm name under which hashes are memoized and cached."""
+        algorithm = algorithm or self.algorithm
+        if partial:
+            return f"{algorithm}/partial-{self.PARTIAL_BLOCK_SIZE}"
+        return algorithm
+    
+    def _lookup_hash(self, file_path: Path, partial: bool,
+                     algorithm: Optional[str] = None) -> Optional[str]:
+        """Return a memoized or cached hash without reading the file."""
+        cache_algorithm = self._cache_algorithm(partial, algorithm)
+        memo = self._hash_memos.setdefault(cache_algorithm, {})
+        if file_path in memo:
+            return memo[file_path]
+        
+        key = self.file_keys.get(file_path)
+        if self.hash_cache is not None and key is not None:
+            cached = self.hash_cache.get(key, cache_algorithm)
+            if cached is not None:
+                memo[file_path] = cached
+                return cached
+        return None
+    
+    def _store_hash(self, file_path: Path, partial: bool, file_hash: str,
+                    algorithm: Optional[str] = None):
+        """Memoize a freshly computed hash and write it to the hash cache."""
+        cache_algorithm = self._cache_algorithm(partial, algorithm)
+        key = self.file_keys.get(file_path)
+        if self.hash_cache is not None and key is not None:
+            self.hash_cache.put(key, cache_algorithm, file_hash, file_path)
+        self._hash_memos.setdefault(cache_algorithm, {})[file_path] = file_hash
+    
+    def _compute_hash(self, file_path: Path, partial: bool = False,
+                      algorithm: Optional[str] = None) -> str:
+        """
+        Hash a file at most once per scan and algorithm.
+        
+        Results are memoized in memory and, when configured, looked up in and
+        written to the persistent hash cache.
+        """
+        file_hash = self._lookup_hash(file_path, partial, algorithm)
+        if file_hash is not None:
+            return file_hash
+        
+        if partial:
+            file_hash = FileHasher.compute_partial_hash(
+                file_path, algorithm or self.algorithm, self.PARTIAL_BLOCK_SIZE, self.read_limiter)
+        else:
+            file_hash = FileHasher.compute_hash(file_path, algorithm or self.algorithm,
+                                                limiter=self.read_limiter)
+        
+        self._store_hash(file_path, partial, file_hash, algorithm)
+        return file_hash
+    
+    def _prefetch_hashes(self, files: Iterable[Path], partial: bool,
+                         algorithm: Optional[str] = None):
+        """Hash files that are not memoized or cached yet through the hash engine."""
+        if self.hash_engine is None:
+            return
+        
+        missing = (f for f in files if self._lookup_hash(f, partial, algorithm) is None)
+        for file_path, file_hash in self.hash_engine.hash_files(
+                missing, algorithm or self.algorithm, partial=partial, block_size=self.PARTIAL_BLOCK_SIZE,
+                limiter=self.read_limiter):
+            self._store_hash(file_path, partial, file_hash, algorithm)
     
-    def add_file(self, file_path: Path, compute_full_hash: bool = False):
+    def add_file(self, file_path: Path, compute_full_hash: bool = False,
+                 stat_result: Optional[os.stat_result] = None):
         """
         Add a file to the deduplication index.
         
         Args:
             file_path: Path to the file
             compute_full_hash: Whether to compute full content hash immediately
+            stat_result: Stat result already obtained by the caller, if any
         """
         try:
             # Group by size first (fast and effective)
-            file_size = file_path.stat().st_size
-            if file_size not in self.size_to_files:
-                self.size_to_files[file_size] = []
-            self.size_to_files[file_size].append(file_path)
+            if stat_result is None:
+                stat_result = file_path.stat()
             
-            # Compute full hash if requested or if size collision detected
-            if compute_full_hash or len(self.size_to_files[file_size]) > 1:
-                full_hash = FileHasher.compute_hash(file_path)
+            # Additional links to an inode already indexed share its content
+            # and its blocks, so they are neither hashed nor counted as duplicates
+            if stat_result.st_nlink > 1 and stat_result.st_ino:
+                inode = (stat_result.st_dev, stat_result.st_ino)
+                self._link_inodes[file_path] = inode
+                if inode in self.inode_to_paths:
+                    self.inode_to_paths[inode].append(file_path)
+                    return
+                self.inode_to_paths[inode] = [file_path]
+            
+            if self.hash_cache is not None:
+                self.file_keys[file_path] = HashCache.key_for(stat_result)
+            self._index_size(file_path, stat_result.st_size, self.allocated_size(stat_result))
+            
+            # Compute full hash only if requested; size collisions are
+            # resolved lazily by find_duplicates()
+            if compute_full_hash:
+                full_hash = self._compute_hash(file_path)
                 if full_hash not in self.hash_to_files:
                     self.hash_to_files[full_hash] = []
                 self.hash_to_files[full_hash].append(file_path)
         except (IOError, OSError):
             pass  # Skip files we can't read
     
+    def _index_size(self, file_path: Path, size: int, allocated: int):
+        """Stage 1: put a file in its size bucket, marking the bucket for re-examination."""
+        if size not in self.size_to_files:
+            self.size_to_files[size] = []
+            self.size_to_allocated[size] = array('q')
+        self.size_to_files[size].append(file_path)
+        self.size_to_allocated[size].append(allocated)
+        if len(self.size_to_files[size]) > 1:
+            self._dirty_sizes.add(size)
+            self._duplicates = None
+    
+    def add_member(self, member_path: str, size: int, allocated: int, partial_hash: str,
+                   full_hash: str, confirm_hash: Optional[str] = None):
+        """
+        Add an archive member that was hashed while its archive was streamed.
+        
+        The member's hashes are memoized up front, so the duplicate search
+        compares it with loose files (and other members) without ever
+        opening its virtual path.
+        
+        Args:
+            member_path: Virtual path, e.g. 'backup.zip!/docs/a.pdf', reported
+                exactly as given
+            size: Uncompressed size
+            allocated: Bytes the member occupies in its archive
+            partial_hash: First/last-block hash, as compute_partial_hash
+                computes it for the extracted file
+            full_hash: Full content hash with this deduplicator's algorithm
+            confirm_hash: Content hash with confirm_algorithm, required when
+                one is configured
+        """
+        if self.confirm_algorithm is not None and confirm_hash is None:
+            raise ValueError('confirm_hash is required when a confirm_algorithm is configured')
+        self._hash_memos.setdefault(self._cache_algorithm(True), {})[member_path] = partial_hash
+        self._hash_memos.setdefault(self._cache_algorithm(False), {})[member_path] = full_hash
+        if confirm_hash is not None:
+            self._hash_memos.setdefault(
+                self._cache_algorithm(False, self.confirm_algorithm), {})[member_path] = confirm_hash
+        self._index_size(member_path, size, allocated)
+    
+    def remove_file(self, file_path: Path, size: int) -> bool:
+        """
+        Remove a file from the deduplication index.
+        
+        Used when a file is deleted or changed after it was added (re-add
+        a changed file afterwards). Its memoized hashes are dropped, and its
+        size bucket is regrouped on the next find_duplicates() from the
+        hashes memoized for the remaining files, so nothing else is read
+        again. When the removed path was the indexed link of a hardlinked
+        inode, the next link takes its place.
+        
+        Args:
+            file_path: Path as passed to add_file()
+            size: Size the file had when it was added
+            
+        Returns:
+            Whether the file was indexed
+        """
+        successor = None
+        inode = self._link_inodes.pop(file_path, None)
+        if inode is not None and inode in self.inode_to_paths:
+            links = self.inode_to_paths[inode]
+            was_indexed = links[0] == file_path
+            links.remove(file_path)
+            if not links:
+                del self.inode_to_paths[inode]
+            if not was_indexed:
+                # Further links never entered the size index
+                return True
+            successor = links[0] if links else None
+        
+        files = self.size_to_files.get(size)
+        if files is None or file_path not in files:
+            return False
+        position = files.index(file_path)
+        file_key = self.file_keys.pop(file_path, None)
+        if successor is not None:
+            # Same inode: same content, blocks and cache key
+            files[position] = successor
+            for memo in self._hash_memos.values():
+                if file_path in memo:
+                    memo[successor] = memo.pop(file_path)
+            if file_key is not None:
+                self.file_keys[successor] = file_key
+        else:
+            del files[position]
+            del self.size_to_allocated[size][position]
+            for memo in self._hash_memos.values():
+                memo.pop(file_path, None)
+            if not files:
+                del self.size_to_files[size]
+                del self.size_to_allocated[size]
+        for full_hash in [h for h, paths in self.hash_to_files.items() if file_path in paths]:
+            self.hash_to_files[full_hash].remove(file_path)
+            if not self.hash_to_files[full_hash]:
+                del self.hash_to_files[full_hash]
+        
+        if len(self.size_to_files.get(size, ())) > 1:
+            self._dirty_sizes.add(size)
+        else:
+            self._dirty_sizes.discard(size)
+            self._groups_by_size.pop(size, None)
+            self._allocated_by_size.pop(size, None)
+            self._stats_by_size.pop(size, None)
+        self._duplicates = None
+        return True
+    
+    @staticmethod
+    def _group_by(files: List[Path], key_func) -> Dict[str, List[Path]]:
+        """Group files by the value of key_func."""
+        groups: Dict[str, List[Path]] = {}
+        for file_path in files:
+            groups.setdefault(key_func(file_path), []).append(file_path)
+        return groups
+    
+    def _partial_stage(self, size: int, files: List[Path]) -> Tuple[List[List[Path]], Dict]:
+        """Stage 2: split a size bucket by partial hash. Returns candidate groups and byte stats."""
+        stats = self._empty_pipeline_stats()
+        block = self.PARTIAL_BLOCK_SIZE
+        
+        # Small files are read whole by the partial hash anyway, so they go
+        # straight to the full hash
+        if size <= 2 * block:
+            return [files], stats
+        
+        candidates = []
+        for partial_group in self._group_by(files, lambda f: self._compute_hash(f, partial=True)).values():
+            if len(partial_group) > 1:
+                candidates.append(partial_group)
+            else:
+                stats['bytes_skipped_by_partial_hash'] += size - 2 * block
+        stats['bytes_read_partial'] += 2 * block * len(files)
+        return candidates, stats
+    
+    def _full_stage(self, size: int, candidates: List[List[Path]], stats: Dict) -> Dict[str, List[Path]]:
+        """Stage 3: full content hash for files that still collide."""
+        groups: Dict[str, List[Path]] = {}
+        for candidate_group in candidates:
+            stats['bytes_read_full'] += size * len(candidate_group)
+            for full_hash, duplicate_files in self._group_by(candidate_group, self._compute_hash).items():
+                if len(duplicate_files) > 1:
+                    groups[full_hash] = duplicate_files
+        return groups
+    
+    def _confirm_stage(self, size: int, groups: Dict[str, List[Path]], stats: Dict):
+        """Optional stage 4: rehash final groups cryptographically; memoizes the bucket's groups."""
+        if self.confirm_algorithm is not None:
+            confirm = lambda f: self._compute_hash(f, algorithm=self.confirm_algorithm)
+            confirmed: Dict[str, List[Path]] = {}
+            for duplicate_files in groups.values():
+                stats['bytes_read_confirm'] += size * len(duplicate_files)
+                for confirm_hash, confirmed_files in self._group_by(duplicate_files, confirm).items():
+                    if len(confirmed_files) > 1:
+                        confirmed[confirm_hash] = confirmed_files
+            groups = confirmed
+        
+        # Savings are accounted from the first copy's blocks as recorded
+        # when it was added, so reports never stat files again
+        allocated = dict(zip(self.size_to_files[size], self.size_to_allocated[size])) if groups else {}
+        self._groups_by_size[size] = groups
+        self._allocated_by_size[size] = {digest: allocated[files[0]] for digest, files in groups.items()}
+        self._stats_by_size[size] = stats
+    
     def find_duplicates(self) -> Dict[str, List[Path]]:
         """
         Find all duplicate files.
         
+        Only size buckets that changed since the previous call are examined;
+        the result is cached until another colliding file is added.
+        
         Returns:
-            Dictionary mapping hash to list of duplicate file paths
+            Dictionary mapping hash to list of duplicate file paths. Keys are
+            confirm_algorithm digests when a confirmation pass is configured.
         """
-        duplicates = {}
+        if self._duplicates is not None:
+            return self._duplicates
+        
+        dirty = sorted(self._dirty_sizes)
+        
+        # With a hash engine, each stage's reads are batched across all
+        # dirty buckets and run concurrently before the buckets are grouped
+        self._prefetch_hashes(
+            (f for size in dirty if size > 2 * self.PARTIAL_BLOCK_SIZE for f in self.size_to_files[size]),
+            partial=True,
+        )
+        staged = {size: self._partial_stage(size, self.size_to_files[size]) for size in dirty}
+        self._prefetch_hashes(
+            (f for candidates, _ in staged.values() for group in candidates for f in group),
+            partial=False,
+        )
+        full_groups = {size: self._full_stage(size, candidates, stats)
+                       for size, (candidates, stats) in staged.items()}
+        if self.confirm_algorithm is not None:
+            self._prefetch_hashes(
+                (f for groups in full_groups.values() for group in groups.values() for f in group),
+                partial=False,
+                algorithm=self.confirm_algorithm,
+            )
+        for size, groups in full_groups.items():
+            self._confirm_stage(size, groups, staged[size][1])
+        self._dirty_sizes = set()
         
-        # Check files grouped by size
+        stats = self._empty_pipeline_stats()
         for size, files in self.size_to_files.items():
-            if len(files) > 1:
-                # Compute hashes for files with same size
-                file_groups: Dict[str, List[Path]] = {}
-                for file_path in files:
-                    full_hash = FileHasher.compute_hash(file_path)
-                    if full_hash not in file_groups:
-                        file_groups[full_hash] = []
-                    file_groups[full_hash].append(file_path)
-                
-                # Add groups with actual duplicates
-                for full_hash, duplicate_files in file_groups.items():
-                    if len(duplicate_files) > 1:
-                        duplicates[full_hash] = duplicate_files
+            # Stage 1: a file with a unique size cannot have a duplicate
+            if len(files) < 2:
+                stats['bytes_skipped_by_size'] += size * len(files)
+        for bucket_stats in self._stats_by_size.values():
+            for key, value in bucket_stats.items():
+                stats[key] += value
+        self.pipeline_stats = stats
         
+        duplicates: Dict[str, List[Path]] = {}
+        for groups in self._groups_by_size.values():
+            duplicates.update(groups)
+        self._duplicates = duplicates
         return duplicates
     
+    def get_duplicate_details(self) -> Dict[str, Dict]:
+        """
+        Get duplicate groups with the sizes recorded when files were added.
+        
+        Returns:
+            Dictionary mapping hash to {'size': bytes per copy, 'allocated':
+            allocated bytes of the first copy, 'paths': duplicate paths}
+        """
+        self.find_duplicates()
+        return {
+            digest: {
+                'size': size,
+                'allocated': self._allocated_by_size[size][digest],
+                'paths': files,
+            }
+            for size, groups in self._groups_by_size.items()
+            for digest, files in groups.items()
+        }
+    
+    def get_hardlinks(self) -> Dict[str, List[Path]]:
+        """
+        Get paths that are hardlinks to the same inode.
+        
+        Returns:
+            Dictionary mapping "device:inode" to the linked paths; the first
+            path is the one that took part in the duplicate search
+        """
+        return {
+            f"{device}:{inode}": paths
+            for (device, inode), paths in self.inode_to_paths.items()
+            if len(paths) > 1
+        }
+    
     def get_stats(self) -> Dict:
         """Get deduplication statistics."""
         total_files = sum(len(files) for files in self.size_to_files.values())
@@ -152,27 +911,41 @@ def get_stats(self) -> Dict:
         
         duplicates = self.find_duplicates()
         duplicate_count = sum(len(files) - 1 for files in duplicates.values())
+        hardlinks = self.get_hardlinks()
         
-        return {
+        stats = {
+            'algorithm': self.algorithm,
+            'confirm_algorithm': self.confirm_algorithm,
             'total_files': total_files,
             'unique_sizes': unique_sizes,
             'duplicate_groups': len(duplicates),
             'duplicate_files': duplicate_count,
+            'hardlink_groups': len(hardlinks),
+            'hardlinked_files': sum(len(paths) - 1 for paths in hardlinks.values()),
+            'pipeline': dict(self.pipeline_stats),
         }
+        if self.hash_cache is not None:
+            stats['hash_cache'] = {'hits': self.hash_cache.hits, 'misses': self.hash_cache.misses}
+        return stats
+    
+    def close(self):
+        """Release resources held by the index (nothing for the in-memory index)."""
 
 
-def extract_file_metadata(file_path: Path) -> Dict:
+def extract_file_metadata(file_path: Path, stat_result: Optional[os.stat_result] = None) -> Dict:
     """
     Extract metadata from a file.
     
     Args:
         file_path: Path to the file
+        stat_result: Stat result already obtained by the caller, if any.
+            Passing it avoids a second stat call per file.
         
     Returns:
         Dictionary containing file metadata
     """
     try:
-        stat = file_path.stat()
+        stat = stat_result if stat_result is not None else file_path.stat()
         return {
             'name': file_path.name,
             'path': str(file_path.absolute()),
@@ -0,0 +1,208 @@
+"""
+Persistent hash cache for the Cognitive Tribunal project.
+Stores content hashes in SQLite so unchanged files are not re-read on rescans.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class HashCache:
+    """
+    On-disk cache of file content hashes.
+
+    Entries are keyed by (device, inode, algorithm) and are only returned
+    while the file's size and mtime_ns still match the stored values, so a
+    modified or replaced file is rehashed automatically.
+    """
+
+    DEFAULT_FILENAME = 'hash_cache.sqlite'
+    FLUSH_EVERY = 1000
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) a hash cache.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS file_hashes ('
+            ' device INTEGER NOT NULL,'
+            ' inode INTEGER NOT NULL,'
+            ' algorithm TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' mtime_ns INTEGER NOT NULL,'
+            ' digest TEXT NOT NULL,'
+            ' path TEXT,'
+            ' last_seen REAL NOT NULL,'
+            ' PRIMARY KEY (device, inode, algorithm))'
+        )
+        self._conn.commit()
+        self._pending_puts: Dict[Tuple[int, int, str], Tuple] = {}
+        self._pending_seen: List[Tuple] = []
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(stat_result: os.stat_result) -> Tuple[int, int, int, int]:
+        """Build the (device, inode, size, mtime_ns) cache key from a stat result."""
+        return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+    def get(self, key: Tuple[int, int, int, int], algorithm: str, count: bool = True) -> Optional[str]:
+        """
+        Look up a cached digest.
+
+        Args:
+            key: (device, inode, size, mtime_ns) as returned by key_for()
+            algorithm: Hash algorithm name
+            count: Whether the lookup counts towards hits and misses; False
+                for other values kept in the cache, such as sniff results
+
+        Returns:
+            Hex digest, or None if missing or stale
+        """
+        device, inode, size, mtime_ns = key
+        if not inode:
+            # Filesystems without stable inode numbers cannot be cached safely
+            self.misses += count
+            return None
+
+        with self._lock:
+            pending = self._pending_puts.get((device, inode, algorithm))
+            if pending is not None:
+                row = pending[3:6]
+            else:
+                row = self._conn.execute(
+                    'SELECT size, mtime_ns, digest FROM file_hashes'
+                    ' WHERE device = ? AND inode = ? AND algorithm = ?',
+                    (device, inode, algorithm),
+                ).fetchone()
+
+            if row is None or row[0] != size or row[1] != mtime_ns:
+                self.misses += count
+                return None
+
+            self.hits += count
+            self._pending_seen.append((time.time(), device, inode, algorithm))
+            if len(self._pending_seen) >= self.FLUSH_EVERY:
+                self._flush()
+            return row[2]
+
+    def put(self, key: Tuple[int, int, int, int], algorithm: str, digest: str,
+            path: Optional[Path] = None):
+        """
+        Store a digest, replacing any stale entry for the same inode.
+
+        Args:
+            key: (device, inode, size, mtime_ns) as returned by key_for()
+            algorithm: Hash algorithm name
+            digest: Hex digest to store
+            path: Path the digest was computed from (used for invalidation)
+        """
+        device, inode, size, mtime_ns = key
+        if not inode or digest.startswith('ERROR'):
+            return
+
+        with self._lock:
+            self._pending_puts[(device, inode, algorithm)] = (
+                device, inode, algorithm, size, mtime_ns, digest,
+                str(path) if path is not None else None, time.time()
+            )
+            if len(self._pending_puts) >= self.FLUSH_EVERY:
+                self._flush()
+
+    def _flush(self):
+        """Write buffered inserts and last-seen updates. Caller holds the lock."""
+        if self._pending_puts:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO file_hashes'
+                ' (device, inode, algorithm, size, mtime_ns, digest, path, last_seen)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                list(self._pending_puts.values()),
+            )
+            self._pending_puts = {}
+        if self._pending_seen:
+            self._conn.executemany(
+                'UPDATE file_hashes SET last_seen = ?'
+                ' WHERE device = ? AND inode = ? AND algorithm = ?',
+                self._pending_seen,
+            )
+            self._pending_seen = []
+        self._conn.commit()
+
+    def commit(self):
+        """Flush buffered writes to disk."""
+        with self._lock:
+            self._flush()
+
+    def invalidate(self, path_prefix: Optional[str] = None) -> int:
+        """
+        Remove cached entries.
+
+        Args:
+            path_prefix: Only remove entries whose recorded path starts with
+                this prefix (None removes everything)
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            self._flush()
+            if path_prefix is None:
+                cursor = self._conn.execute('DELETE FROM file_hashes')
+            else:
+                prefix = str(path_prefix)
+                cursor = self._conn.execute(
+                    'DELETE FROM file_hashes WHERE substr(path, 1, ?) = ?',
+                    (len(prefix), prefix),
+                )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def compact(self, max_age_days: float = 30.0) -> int:
+        """
+        Drop entries not seen for a while and reclaim disk space.
+
+        Args:
+            max_age_days: Entries not hit or written within this many days are removed
+
+        Returns:
+            Number of entries removed
+        """
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            self._flush()
+            cursor = self._conn.execute('DELETE FROM file_hashes WHERE last_seen < ?', (cutoff,))
+            removed = cursor.rowcount
+            self._conn.commit()
+            self._conn.execute('VACUUM')
+            return removed
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics."""
+        with self._lock:
+            self._flush()
+            entries = self._conn.execute('SELECT COUNT(*) FROM file_hashes').fetchone()[0]
+        return {
+            'path': str(self.db_path),
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def close(self):
+        """Flush pending writes and close the database."""
+        with self._lock:
+            self._flush()
+            self._conn.close()
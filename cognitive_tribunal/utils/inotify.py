@@ -0,0 +1,144 @@
+"""
+Linux inotify bindings for the Cognitive Tribunal project.
+A small ctypes wrapper, so watching needs no third-party package.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+from typing import List, NamedTuple, Optional
+
+# Event masks from <sys/inotify.h>
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+_libc = None
+
+
+class InotifyEvent(NamedTuple):
+    """One inotify event; name is empty for events on the watched directory itself."""
+    wd: int
+    mask: int
+    cookie: int
+    name: str
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return _libc
+
+
+def inotify_available() -> bool:
+    """Whether this platform provides inotify."""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_load_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+class Inotify:
+    """
+    An inotify instance.
+
+    Watches are per directory and not recursive; callers add a watch for
+    every directory they care about.
+    """
+
+    def __init__(self):
+        """
+        Create the inotify file descriptor.
+
+        Raises:
+            OSError: If inotify is unavailable or the instance limit is reached
+        """
+        if not inotify_available():
+            raise OSError('inotify is not available on this platform')
+        self._libc = _load_libc()
+        fd = self._libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.fd = fd
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """
+        Watch a path.
+
+        Returns:
+            Watch descriptor (the same one again for an already watched inode)
+
+        Raises:
+            OSError: If the path cannot be watched (e.g. it vanished, or
+                fs.inotify.max_user_watches is exhausted)
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def rm_watch(self, wd: int):
+        """Stop a watch; the kernel queues an IN_IGNORED event for it."""
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout: Optional[float] = None) -> List[InotifyEvent]:
+        """
+        Read the queued events.
+
+        Args:
+            timeout: Seconds to wait for an event (None waits indefinitely)
+
+        Returns:
+            Events in kernel order (empty on timeout)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        events = []
+        try:
+            while True:
+                data = os.read(self.fd, 65536)
+                offset = 0
+                while offset < len(data):
+                    wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+                    events.append(InotifyEvent(wd, mask, cookie, name))
+        except BlockingIOError:
+            pass
+        return events
+
+    def close(self):
+        """Close the file descriptor and drop all watches."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,99 @@
+"""
+Cloud placeholder detection for the Cognitive Tribunal project.
+Recognizes on-demand files whose content lives only in the cloud, so scans
+can record them without reading them (which would download them).
+"""
+
+import plistlib
+import stat as stat_module
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+# macOS: file content has been evicted to the cloud (APFS dataless file)
+SF_DATALESS = getattr(stat_module, 'SF_DATALESS', 0x40000000)
+
+# Windows file attributes set by cloud-files providers (OneDrive, iCloud,
+# Dropbox, Google Drive) on files that are not hydrated locally
+FILE_ATTRIBUTE_OFFLINE = getattr(stat_module, 'FILE_ATTRIBUTE_OFFLINE', 0x1000)
+FILE_ATTRIBUTE_RECALL_ON_OPEN = getattr(stat_module, 'FILE_ATTRIBUTE_RECALL_ON_OPEN', 0x40000)
+FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS = getattr(stat_module, 'FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS', 0x400000)
+_WINDOWS_REMOTE_ATTRIBUTES = (
+    FILE_ATTRIBUTE_OFFLINE | FILE_ATTRIBUTE_RECALL_ON_OPEN | FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS
+)
+
+# Files smaller than this can legitimately report zero blocks when the
+# filesystem stores them inline in the inode (ext4, btrfs)
+ZERO_BLOCK_MIN_SIZE = 4096
+
+# iCloud Drive stubs are small plists named '.<name>.icloud'
+ICLOUD_STUB_SUFFIX = '.icloud'
+ICLOUD_STUB_MAX_SIZE = 64 * 1024
+
+
+def read_icloud_stub(file_path: Union[str, Path]) -> Optional[Dict]:
+    """
+    Read an iCloud Drive '.icloud' stub.
+
+    Args:
+        file_path: Path to the stub
+
+    Returns:
+        {'name': original file name, 'size': reported size in bytes}, or
+        None if the file is not a readable stub
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            info = plistlib.load(f)
+    except (OSError, plistlib.InvalidFileException, ValueError):
+        return None
+    if not isinstance(info, dict):
+        return None
+    name = info.get('NSURLNameKey')
+    size = info.get('NSURLFileSizeKey')
+    return {
+        'name': name if isinstance(name, str) else None,
+        'size': size if isinstance(size, int) else None,
+    }
+
+
+def detect_placeholder(file_path: Path, stat_result) -> Optional[Dict]:
+    """
+    Check whether a file is a cloud placeholder.
+
+    Only the stat result is consulted, except for '.icloud' stubs, which are
+    small local plists and are read to recover the original name and size.
+
+    Args:
+        file_path: Path to the file
+        stat_result: Stat result recorded during the walk
+
+    Returns:
+        None for an ordinary local file, otherwise a dict with 'reason'
+        ('icloud-stub', 'dataless', 'recall', 'offline' or 'zero-blocks'),
+        'name' (original file name) and 'size' (reported size in bytes)
+    """
+    name = file_path.name
+    if (name.startswith('.') and name.endswith(ICLOUD_STUB_SUFFIX)
+            and stat_result.st_size <= ICLOUD_STUB_MAX_SIZE):
+        stub = read_icloud_stub(file_path)
+        if stub is not None:
+            return {
+                'reason': 'icloud-stub',
+                'name': stub['name'] or name[1:-len(ICLOUD_STUB_SUFFIX)],
+                'size': stub['size'] if stub['size'] is not None else 0,
+            }
+
+    placeholder = {'name': name, 'size': stat_result.st_size}
+    if getattr(stat_result, 'st_flags', 0) & SF_DATALESS:
+        return dict(placeholder, reason='dataless')
+    attributes = getattr(stat_result, 'st_file_attributes', 0)
+    if attributes & (FILE_ATTRIBUTE_RECALL_ON_OPEN | FILE_ATTRIBUTE_RECALL_ON_DATA_ACCESS):
+        return dict(placeholder, reason='recall')
+    if attributes & FILE_ATTRIBUTE_OFFLINE:
+        return dict(placeholder, reason='offline')
+    # FUSE-based sync clients report on-demand files as fully sparse
+    if (getattr(stat_result, 'st_blocks', None) == 0
+            and stat_result.st_size >= ZERO_BLOCK_MIN_SIZE):
+        return dict(placeholder, reason='zero-blocks')
+    return None
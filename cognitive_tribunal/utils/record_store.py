@@ -0,0 +1,354 @@
+"""
+Compact file record storage for the Cognitive Tribunal project.
+Keeps scanned file metadata in typed arrays instead of one dict per file.
+"""
+
+import bisect
+import os
+from array import array
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from .file_utils import FileClassifier
+
+
+class FileRecordStore(Sequence):
+    """
+    Columnar store of scanned file records.
+
+    Each record costs a directory id, a name reference, a category code, a
+    MIME type code (0 unless content sniffing found the type), remote-only
+    and archive-member flags and four 64-bit integers (size and raw ns
+    timestamps). Directory paths and names are interned, so files
+    sharing a directory share one string.
+    Indexing or iterating the store yields dicts in the same shape as
+    extract_file_metadata(), built on demand.
+    """
+
+    def __init__(self):
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._names_interned: Dict[str, str] = {}
+        self._categories: List[str] = list(FileClassifier.FILE_CATEGORIES) + ['other']
+        self._category_ids: Dict[str, int] = {name: i for i, name in enumerate(self._categories)}
+        # Code 0: no sniffed type, the extension's type is reported
+        self._mime_types: List[Optional[str]] = [None]
+        self._mime_ids: Dict[str, int] = {}
+
+        self.dir_id = array('I')
+        self.names: List[str] = []
+        self.category_id = array('H')
+        self.mime_id = array('H')
+        self.remote_only = array('B')
+        self.archive_member = array('B')
+        self.size = array('q')
+        self.ctime_ns = array('q')
+        self.mtime_ns = array('q')
+        self.atime_ns = array('q')
+
+    def _intern_dir(self, directory: str) -> int:
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dirs.append(directory)
+            self._dir_ids[directory] = dir_id
+        return dir_id
+
+    def category_code(self, category: str) -> int:
+        """Return the numeric code for a category, registering it if new."""
+        code = self._category_ids.get(category)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(category)
+            self._category_ids[category] = code
+        return code
+
+    def category_name(self, code: int) -> str:
+        """Return the category name for a numeric code."""
+        return self._categories[code]
+
+    def mime_code(self, mime_type: Optional[str]) -> int:
+        """Return the numeric code for a sniffed MIME type, registering it if new."""
+        if mime_type is None:
+            return 0
+        code = self._mime_ids.get(mime_type)
+        if code is None:
+            code = len(self._mime_types)
+            self._mime_types.append(mime_type)
+            self._mime_ids[mime_type] = code
+        return code
+
+    def append(self, file_path: Union[str, Path], stat_result: os.stat_result, category: str,
+               remote_only: bool = False, size: Optional[int] = None,
+               archive_member: bool = False, mime_type: Optional[str] = None) -> int:
+        """
+        Add a file record.
+
+        Args:
+            file_path: Absolute path to the file
+            stat_result: Stat result recorded during the walk
+            category: File category
+            remote_only: Whether the file is a cloud placeholder
+            size: Size to record instead of st_size (a placeholder's
+                reported size)
+            archive_member: Whether the file is a member inside an archive
+                (its path is virtual, e.g. 'backup.zip!/docs/a.pdf')
+            mime_type: MIME type found by content sniffing; None reports
+                the type implied by the extension
+
+        Returns:
+            Record id
+        """
+        directory, name = os.path.split(str(file_path))
+        self.dir_id.append(self._intern_dir(directory))
+        self.names.append(self._names_interned.setdefault(name, name))
+        self.category_id.append(self.category_code(category))
+        self.mime_id.append(self.mime_code(mime_type))
+        self.remote_only.append(1 if remote_only else 0)
+        self.archive_member.append(1 if archive_member else 0)
+        self.size.append(stat_result.st_size if size is None else size)
+        self.ctime_ns.append(stat_result.st_ctime_ns)
+        self.mtime_ns.append(stat_result.st_mtime_ns)
+        self.atime_ns.append(stat_result.st_atime_ns)
+        return len(self.names) - 1
+
+    def remove(self, record_id: int) -> Optional[int]:
+        """
+        Delete a record in O(1) by moving the last record into its slot.
+
+        Record ids are positions, so the moved record changes id; callers
+        holding ids must remap it. Interned directory and name strings are
+        kept.
+
+        Args:
+            record_id: Record to delete
+
+        Returns:
+            The previous id of the record now stored at record_id, or None
+            if the deleted record was the last one
+        """
+        last = len(self) - 1
+        if not 0 <= record_id <= last:
+            raise IndexError('record index out of range')
+        columns = (self.dir_id, self.names, self.category_id, self.mime_id, self.remote_only,
+                   self.archive_member, self.size, self.ctime_ns, self.mtime_ns, self.atime_ns)
+        for column in columns:
+            if record_id != last:
+                column[record_id] = column[last]
+            column.pop()
+        return last if record_id != last else None
+
+    def directory(self, record_id: int) -> str:
+        """Return the directory of a record."""
+        return self._dirs[self.dir_id[record_id]]
+
+    def path(self, record_id: int) -> str:
+        """Return the full path of a record."""
+        return os.path.join(self._dirs[self.dir_id[record_id]], self.names[record_id])
+
+    def category(self, record_id: int) -> str:
+        """Return the category of a record."""
+        return self._categories[self.category_id[record_id]]
+
+    def mime_type(self, record_id: int) -> Optional[str]:
+        """Return the sniffed MIME type of a record, or the one its extension implies."""
+        code = self.mime_id[record_id]
+        if code:
+            return self._mime_types[code]
+        return FileClassifier.get_mime_type(Path(self.names[record_id]))
+
+    @staticmethod
+    def _isoformat(timestamp_ns: int) -> str:
+        return datetime.fromtimestamp(timestamp_ns / 1e9).isoformat()
+
+    def to_dict(self, record_id: int) -> Dict:
+        """
+        Materialize a record in the extract_file_metadata() shape.
+
+        Cloud placeholders also carry 'remote_only': True, and members of
+        archives 'archive_member': True.
+        """
+        name = self.names[record_id]
+        name_path = Path(name)
+        record = {
+            'name': name,
+            'path': self.path(record_id),
+            'size': self.size[record_id],
+            'created': self._isoformat(self.ctime_ns[record_id]),
+            'modified': self._isoformat(self.mtime_ns[record_id]),
+            'accessed': self._isoformat(self.atime_ns[record_id]),
+            'category': self.category(record_id),
+            'mime_type': self.mime_type(record_id),
+            'extension': name_path.suffix.lower(),
+        }
+        if self.remote_only[record_id]:
+            record['remote_only'] = True
+        if self.archive_member[record_id]:
+            record['archive_member'] = True
+        return record
+
+    def ids_for_category(self, category: str) -> Iterator[int]:
+        """Yield ids of records in a category."""
+        code = self._category_ids.get(category)
+        if code is None:
+            return
+        for record_id, record_code in enumerate(self.category_id):
+            if record_code == code:
+                yield record_id
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.to_dict(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return self.to_dict(index)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for record_id in range(len(self)):
+            yield self.to_dict(record_id)
+
+
+class FileRecordIndex:
+    """
+    Secondary indexes over a FileRecordStore.
+
+    Built once when a scan finishes: record ids per category, and ids sorted
+    by size and by modification time alongside the sorted keys. Range
+    queries are two binary searches, top-N queries walk a sorted order from
+    one end, and combined filters scan only the most selective candidate set.
+    """
+
+    def __init__(self, store: FileRecordStore):
+        """
+        Build indexes for the records currently in store.
+
+        Args:
+            store: Record store to index
+        """
+        self.store = store
+        self.record_count = len(store)
+
+        self.by_category: Dict[str, array] = {}
+        for record_id, code in enumerate(store.category_id):
+            category = store.category_name(code)
+            if category not in self.by_category:
+                self.by_category[category] = array('I')
+            self.by_category[category].append(record_id)
+
+        self.size_order = array('I', sorted(range(self.record_count), key=store.size.__getitem__))
+        self.sorted_sizes = array('q', (store.size[i] for i in self.size_order))
+        self.mtime_order = array('I', sorted(range(self.record_count), key=store.mtime_ns.__getitem__))
+        self.sorted_mtimes = array('q', (store.mtime_ns[i] for i in self.mtime_order))
+
+    def is_current(self) -> bool:
+        """Whether the store has not grown since the indexes were built."""
+        return self.record_count == len(self.store)
+
+    @staticmethod
+    def _bounds(sorted_keys: array, low: Optional[int], high: Optional[int]) -> range:
+        """Positions of keys with low <= key < high."""
+        start = bisect.bisect_left(sorted_keys, low) if low is not None else 0
+        stop = bisect.bisect_left(sorted_keys, high) if high is not None else len(sorted_keys)
+        return range(start, max(start, stop))
+
+    def size_range(self, min_size: Optional[int] = None, max_size: Optional[int] = None) -> List[int]:
+        """Record ids with min_size <= size <= max_size, smallest first."""
+        high = max_size + 1 if max_size is not None else None
+        positions = self._bounds(self.sorted_sizes, min_size, high)
+        return list(self.size_order[positions.start:positions.stop])
+
+    def mtime_range(self, modified_after_ns: Optional[int] = None,
+                    modified_before_ns: Optional[int] = None) -> List[int]:
+        """Record ids with modified_after_ns <= mtime < modified_before_ns, oldest first."""
+        positions = self._bounds(self.sorted_mtimes, modified_after_ns, modified_before_ns)
+        return list(self.mtime_order[positions.start:positions.stop])
+
+    def query(self, category: Optional[str] = None,
+              min_size: Optional[int] = None, max_size: Optional[int] = None,
+              modified_after_ns: Optional[int] = None, modified_before_ns: Optional[int] = None,
+              order_by: str = 'size', descending: bool = False,
+              limit: Optional[int] = None) -> List[int]:
+        """
+        Find records matching all given filters.
+
+        Args:
+            category: Only records in this category
+            min_size: Minimum size in bytes (inclusive)
+            max_size: Maximum size in bytes (inclusive)
+            modified_after_ns: Minimum mtime in ns since the epoch (inclusive)
+            modified_before_ns: Maximum mtime in ns since the epoch (exclusive)
+            order_by: 'size' or 'mtime'
+            descending: Largest/newest first
+            limit: Return at most this many ids (top-N)
+
+        Returns:
+            Matching record ids in the requested order
+        """
+        if order_by not in ('size', 'mtime'):
+            raise ValueError(f"order_by must be 'size' or 'mtime', not {order_by!r}")
+
+        store = self.store
+        category_code = None
+        if category is not None:
+            if category not in self.by_category:
+                return []
+            category_code = store.category_code(category)
+
+        size_positions = self._bounds(
+            self.sorted_sizes, min_size, max_size + 1 if max_size is not None else None)
+        mtime_positions = self._bounds(self.sorted_mtimes, modified_after_ns, modified_before_ns)
+
+        def matches(record_id: int) -> bool:
+            if category_code is not None and store.category_id[record_id] != category_code:
+                return False
+            if min_size is not None and store.size[record_id] < min_size:
+                return False
+            if max_size is not None and store.size[record_id] > max_size:
+                return False
+            mtime_ns = store.mtime_ns[record_id]
+            if modified_after_ns is not None and mtime_ns < modified_after_ns:
+                return False
+            if modified_before_ns is not None and mtime_ns >= modified_before_ns:
+                return False
+            return True
+
+        if order_by == 'size':
+            order, positions = self.size_order, size_positions
+            other_order, other_positions = self.mtime_order, mtime_positions
+        else:
+            order, positions = self.mtime_order, mtime_positions
+            other_order, other_positions = self.size_order, size_positions
+
+        # Scan the most selective candidate set. Walking the requested order
+        # needs no sort and lets a top-N query stop early.
+        candidates = [(len(positions), None), (len(other_positions), 'other')]
+        if category is not None:
+            candidates.append((len(self.by_category[category]), 'category'))
+        _, source = min(candidates, key=lambda c: c[0])
+
+        if source is None:
+            walk = reversed(positions) if descending else positions
+            results = []
+            for position in walk:
+                record_id = order[position]
+                if matches(record_id):
+                    results.append(record_id)
+                    if limit is not None and len(results) >= limit:
+                        break
+            return results
+
+        if source == 'category':
+            pool = self.by_category[category]
+        else:
+            pool = other_order[other_positions.start:other_positions.stop]
+        results = [record_id for record_id in pool if matches(record_id)]
+        key_column = store.size if order_by == 'size' else store.mtime_ns
+        results.sort(key=key_column.__getitem__, reverse=descending)
+        return results[:limit] if limit is not None else results
@@ -0,0 +1,157 @@
+"""
+Scan checkpoints for the Cognitive Tribunal project.
+Persists the state of a long archive scan so it can resume after a crash.
+"""
+
+import hashlib
+import os
+import pickle
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+
+class ScanCheckpoint:
+    """
+    On-disk checkpoint of one archive scan.
+
+    A checkpoint is a small state file holding the traversal frontier
+    (directories not listed yet), the statistics and the length of a
+    journal. The journal is append-only: each save adds the files processed
+    since the previous save, so a save costs O(new files) however large the
+    scan is, and a resume replays the journal to rebuild the records and
+    the dedup index. Saves only happen at directory boundaries, when every
+    file yielded so far has been processed, so the frontier and the journal
+    always agree. The state file is written to a temporary file that is
+    renamed over the previous one, so a crash mid-write leaves the last
+    good one; journal bytes past the length it records are discarded.
+
+    Digests computed while hashing are kept in a hash cache next to the
+    checkpoint (see hash_cache_path), so a crash during the duplicate
+    search loses at most the digests not yet flushed.
+    """
+
+    FORMAT_VERSION = 4
+
+    def __init__(self, path: Union[str, Path], interval: float = 300.0):
+        """
+        Set up a checkpoint file.
+
+        Args:
+            path: Checkpoint file path
+            interval: Minimum seconds between periodic saves
+        """
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + '.journal')
+        self.hash_cache_path = self.path.with_name(self.path.name + '.hashes.sqlite')
+        self.interval = interval
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def for_root(cls, checkpoint_dir: Union[str, Path], root: Union[str, Path],
+                 interval: float = 300.0) -> 'ScanCheckpoint':
+        """
+        Build the checkpoint for a scan root inside a checkpoint directory.
+
+        Each root gets its own file, so multi-location scans resume every
+        location independently.
+        """
+        digest = hashlib.sha1(str(root).encode('utf-8')).hexdigest()[:16]
+        return cls(Path(checkpoint_dir) / f"scan-{digest}.checkpoint", interval=interval)
+
+    def due(self) -> bool:
+        """Whether the periodic interval has elapsed since the last save."""
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, state: Dict):
+        """
+        Atomically write a checkpoint.
+
+        Args:
+            state: Picklable scan state
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'version': self.FORMAT_VERSION, 'state': state}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._last_save = time.monotonic()
+
+    def append(self, entries: List[Tuple]) -> int:
+        """
+        Durably append entries to the journal.
+
+        Args:
+            entries: Picklable entries added since the previous call
+
+        Returns:
+            Journal length in bytes, to be recorded by the next save()
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_path, 'ab') as f:
+            if entries:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            return f.tell()
+
+    def iter_journal(self, length: int) -> Iterator[Tuple]:
+        """
+        Read back the journal entries covered by a saved state.
+
+        Bytes past `length` were appended after that state was saved and
+        are truncated, so later appends continue from the saved state.
+
+        Args:
+            length: Journal length recorded in the state
+
+        Yields:
+            Entries in the order they were appended
+        """
+        if not length:
+            self._remove(self.journal_path)
+            return
+        with open(self.journal_path, 'r+b') as f:
+            f.truncate(length)
+            while f.tell() < length:
+                yield from pickle.load(f)
+
+    def load(self) -> Optional[Dict]:
+        """
+        Read the checkpoint.
+
+        Returns:
+            The saved state, or None if there is no usable checkpoint
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if not isinstance(payload, dict) or payload.get('version') != self.FORMAT_VERSION:
+            return None
+        state = payload['state']
+        try:
+            if os.path.getsize(self.journal_path) < state['journal_size']:
+                return None
+        except OSError:
+            if state['journal_size']:
+                return None
+        return state
+
+    def clear(self):
+        """Remove the checkpoint, its journal and its hash cache."""
+        cache = str(self.hash_cache_path)
+        for path in (self.path, self.path.with_name(self.path.name + '.tmp'), self.journal_path,
+                     Path(cache), Path(cache + '-wal'), Path(cache + '-shm')):
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
@@ -14,6 +14,9 @@
 sys.path.insert(0, str(Path(__file__).parent))
 
 from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.modules.async_archive_scanner import AsyncArchiveScanner
+from cognitive_tribunal.modules.archive_estimator import ArchiveEstimator
+from cognitive_tribunal.modules.archive_watcher import ArchiveWatcher
 from cognitive_tribunal.modules.ai_context_aggregator import AIContextAggregator
 from cognitive_tribunal.modules.personal_repo_analyzer import PersonalRepoAnalyzer
 from cognitive_tribunal.modules.org_repo_analyzer import OrgRepoAnalyzer
@@ -21,6 +24,8 @@
 from cognitive_tribunal.outputs.inventory import InventoryGenerator
 from cognitive_tribunal.outputs.knowledge_graph import KnowledgeGraphGenerator
 from cognitive_tribunal.outputs.triage_report import TriageReportGenerator
+from cognitive_tribunal.utils.file_utils import FileClassifier, HashEngine, ThroughputLimiter, fast_hash_algorithm
+from cognitive_tribunal.utils.hash_cache import HashCache
 
 
 def main():
@@ -58,6 +63,72 @@ def main():
     # Configuration
     parser.add_argument('--github-token', help='GitHub personal access token (or use GITHUB_TOKEN env var)')
     parser.add_argument('--output-dir', default='./output', help='Output directory (default: ./output)')
+    parser.add_argument('--scan-workers', type=int, default=1, metavar='N',
+                        help='Threads used to list directories during archive scans (default: 1)')
+    parser.add_argument('--hash-cache', nargs='?', const='', metavar='PATH',
+                        help='Reuse content hashes across archive scans (default location: <output-dir>/hash_cache.sqlite)')
+    parser.add_argument('--compact-hash-cache', type=float, metavar='DAYS',
+                        help='Drop hash cache entries not seen in DAYS days and reclaim space')
+    parser.add_argument('--hash-workers', type=int, metavar='N',
+                        help='Hash duplicate candidates on a pool of N workers')
+    parser.add_argument('--hash-processes', action='store_true',
+                        help='Use worker processes instead of threads for --hash-workers')
+    parser.add_argument('--hash-buffer-size', type=int, metavar='BYTES',
+                        help='Read buffer size for content hashing')
+    parser.add_argument('--hash-algorithm', default='sha256', metavar='NAME',
+                        help="Hash backend for deduplication, e.g. sha256, blake2b-128, xxh3_128, or 'fast' (default: sha256)")
+    parser.add_argument('--confirm-hash', nargs='?', const='sha256', metavar='NAME',
+                        help='Re-verify duplicate groups with a cryptographic hash (default: sha256)')
+    parser.add_argument('--exclude-file', metavar='PATH',
+                        help='.gitignore-style rules file of paths to skip during archive scans')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream archive file records to archives.files.ndjson and write stats and duplicates to archives.summary.json')
+    parser.add_argument('--cross-location', action='store_true',
+                        help='Scan multiple archive locations concurrently and find duplicates across them')
+    parser.add_argument('--checkpoint-interval', type=float, metavar='SECONDS',
+                        help='Checkpoint archive scan progress to <output-dir>/checkpoints every SECONDS seconds')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume interrupted archive scans from their checkpoints')
+    parser.add_argument('--dedup-memory', type=float, metavar='MB',
+                        help='Deduplicate archives with sorted run files on disk, buffering about MB megabytes in memory')
+    parser.add_argument('--async-scan', action='store_true',
+                        help='Scan archive locations concurrently on an asyncio event loop')
+    parser.add_argument('--mount-concurrency', type=int, default=4, metavar='N',
+                        help='With --async-scan, concurrent listing/hashing jobs per mount (default: 4)')
+    parser.add_argument('--read-limit', type=float, metavar='MBPS',
+                        help='Cap hash reads at MBPS megabytes per second (per mount with --async-scan)')
+    parser.add_argument('--watch', action='store_true',
+                        help='After the archive scan, keep watching the locations (Linux inotify) and update archives.json incrementally until interrupted')
+    parser.add_argument('--snapshot-interval', type=float, default=60.0, metavar='SECONDS',
+                        help='With --watch, minimum seconds between archives.json snapshots (default: 60)')
+    parser.add_argument('--estimate', action='store_true',
+                        help='Estimate archive size, category mix and duplicate rate by sampling instead of a full scan')
+    parser.add_argument('--estimate-probes', type=int, default=200, metavar='N',
+                        help='Random directory probes per location for --estimate (default: 200)')
+    parser.add_argument('--hydrate-placeholders', action='store_true',
+                        help='Hash cloud placeholder files during archive scans (downloads them through the sync client)')
+    parser.add_argument('--categories', metavar='FILE',
+                        help="YAML file adding file categories (the 'archives.categories' section of a config.yaml, or a mapping of category to extensions)")
+    parser.add_argument('--no-sniff', action='store_true',
+                        help='Classify archive files by extension only, without reading the start of unrecognized files')
+    parser.add_argument('--scan-inside-archives', action='store_true',
+                        help='Also record and deduplicate the files inside zip, tar, .gz, .bz2 and .xz archives, without extracting them')
+    parser.add_argument('--archive-depth', type=int, default=2, metavar='N',
+                        help='With --scan-inside-archives, archive nesting levels to read (default: 2)')
+    parser.add_argument('--archive-max-mb', type=float, default=4096, metavar='MB',
+                        help='With --scan-inside-archives, decompressed megabytes read from one archive at most (default: 4096)')
+    parser.add_argument('--chunk-analysis', action='store_true',
+                        help='Also estimate chunk-level duplicate bytes with content-defined chunking, which counts what near-identical large files share (reads every chunked file in full, at about 5 MB/s)')
+    parser.add_argument('--chunk-size', type=int, default=64, metavar='KB',
+                        help='With --chunk-analysis, average chunk size in KiB, a power of two (default: 64)')
+    parser.add_argument('--chunk-min-file-mb', type=float, default=1.0, metavar='MB',
+                        help='With --chunk-analysis, smallest file chunked (default: 1)')
+    parser.add_argument('--chunk-memory', type=float, default=64.0, metavar='MB',
+                        help='With --chunk-analysis, approximate memory for the chunk index; beyond it chunks are sampled (default: 64)')
+    parser.add_argument('--tree-depth', type=int, default=2, metavar='N',
+                        help='Depth of the per-directory size rollup in archive results (default: 2)')
+    parser.add_argument('--tree-top', type=int, default=20, metavar='N',
+                        help='Number of heaviest directories listed in archive results (default: 20)')
     parser.add_argument('--no-inventory', action='store_true', help='Skip inventory generation')
     parser.add_argument('--no-graph', action='store_true', help='Skip knowledge graph generation')
     parser.add_argument('--no-triage', action='store_true', help='Skip triage report generation')
@@ -65,9 +136,49 @@ def main():
     args = parser.parse_args()
     
     # Validate arguments
+    if args.compact_hash_cache is not None and not (args.all or args.scan_archives or args.ai_conversations or args.personal_repos or args.org_repos or args.web_bookmarks):
+        cache = HashCache(args.hash_cache or str(Path(args.output_dir) / HashCache.DEFAULT_FILENAME))
+        removed = cache.compact(args.compact_hash_cache)
+        print(f"✓ Hash cache compacted. Removed {removed} entries, {cache.get_stats()['entries']} remain")
+        cache.close()
+        return
+    
     if not (args.all or args.scan_archives or args.ai_conversations or args.personal_repos or args.org_repos or args.web_bookmarks):
         parser.error('At least one module must be specified')
     
+    if args.cross_location and args.stream:
+        parser.error('--cross-location cannot be combined with --stream')
+    
+    if (args.checkpoint_interval is not None or args.resume) and (args.stream or args.cross_location):
+        parser.error('--checkpoint-interval and --resume cannot be combined with --stream or --cross-location')
+    
+    if args.async_scan and (args.stream or args.cross_location or args.checkpoint_interval is not None or args.resume):
+        parser.error('--async-scan cannot be combined with --stream, --cross-location, --checkpoint-interval or --resume')
+    
+    if args.read_limit is not None and args.hash_processes:
+        parser.error('--read-limit requires thread hashing; drop --hash-processes')
+    
+    if args.dedup_memory is not None and (args.checkpoint_interval is not None or args.resume):
+        parser.error('--dedup-memory cannot be combined with --checkpoint-interval or --resume')
+    
+    if args.watch and (args.stream or args.cross_location or args.async_scan or args.estimate or args.resume):
+        parser.error('--watch cannot be combined with --stream, --cross-location, --async-scan, --estimate or --resume')
+    
+    if args.chunk_analysis and (args.stream or args.estimate):
+        parser.error('--chunk-analysis cannot be combined with --stream or --estimate, which keep no file records')
+    
+    if args.chunk_analysis and args.watch:
+        parser.error('--chunk-analysis cannot be combined with --watch, whose every snapshot would re-chunk the archive')
+    
+    if args.chunk_size < 1 or args.chunk_size & (args.chunk_size - 1):
+        parser.error('--chunk-size must be a power of two')
+    
+    if args.categories:
+        try:
+            FileClassifier.load_categories(args.categories)
+        except (OSError, ValueError, ImportError) as e:
+            parser.error(f'--categories: {e}')
+    
     print("=" * 70)
     print("COGNITIVE ARCHAEOLOGY TRIBUNAL")
     print("Comprehensive Archaeological Dig Tool")
@@ -86,22 +197,138 @@ def main():
         print("\n[1/4] Running Archive Scanner...")
         print("-" * 70)
         
-        scanner = ArchiveScanner()
+        hash_cache = None
+        if args.hash_cache is not None:
+            hash_cache = HashCache(args.hash_cache or str(output_dir / HashCache.DEFAULT_FILENAME))
+            if args.compact_hash_cache is not None:
+                hash_cache.compact(args.compact_hash_cache)
+        
+        hash_engine = None
+        if args.hash_workers:
+            hash_engine = HashEngine(
+                workers=args.hash_workers,
+                use_processes=args.hash_processes,
+                buffer_size=args.hash_buffer_size,
+            )
+        
+        hash_algorithm = fast_hash_algorithm() if args.hash_algorithm == 'fast' else args.hash_algorithm
+        scanner = ArchiveScanner(
+            hash_cache=hash_cache,
+            hash_engine=hash_engine,
+            hash_algorithm=hash_algorithm,
+            confirm_algorithm=args.confirm_hash,
+            exclude_file=args.exclude_file,
+            checkpoint_dir=str(output_dir / 'checkpoints') if args.checkpoint_interval is not None or args.resume else None,
+            checkpoint_interval=args.checkpoint_interval if args.checkpoint_interval is not None else 300.0,
+            dedup_memory_budget=int(args.dedup_memory * 1024 * 1024) if args.dedup_memory is not None else None,
+            dedup_work_dir=str(output_dir / 'dedup'),
+            hydrate_placeholders=args.hydrate_placeholders,
+            sniff_content=not args.no_sniff,
+            archive_members=args.scan_inside_archives,
+            archive_max_depth=args.archive_depth,
+            archive_max_bytes=int(args.archive_max_mb * 1024 * 1024),
+            chunk_analysis=args.chunk_analysis,
+            chunk_avg_size=args.chunk_size * 1024,
+            chunk_min_file_size=int(args.chunk_min_file_mb * 1024 * 1024),
+            chunk_memory_budget=int(args.chunk_memory * 1024 * 1024),
+            tree_depth=args.tree_depth,
+            tree_top_n=args.tree_top,
+            read_limiter=ThroughputLimiter(args.read_limit * 1024 * 1024) if args.read_limit and not args.async_scan else None,
+        )
         paths = [p.strip() for p in args.scan_archives.split(',')]
         
-        if len(paths) == 1:
-            archive_results = scanner.scan_directory(paths[0])
+        import json
+        if args.estimate:
+            # Sample the tree instead of scanning it; no file records or
+            # duplicate groups are produced
+            estimator = ArchiveEstimator(scanner, probes=args.estimate_probes)
+            archive_results = {'locations': {}}
+            for path in paths:
+                try:
+                    archive_results['locations'][path] = estimator.estimate(path)
+                except ValueError as e:
+                    archive_results['locations'][path] = {'error': str(e)}
+            if len(paths) == 1:
+                archive_results = archive_results['locations'][paths[0]]
+            
+            with open(output_dir / 'archives.estimate.json', 'w') as f:
+                json.dump(archive_results, f, indent=2)
+        elif args.stream:
+            # Write file records as they are scanned; only the summary
+            # (stats and duplicate groups) is kept for the end
+            archive_results = ArchiveScanner.new_combined_results()
+            with open(output_dir / 'archives.files.ndjson', 'w') as f:
+                for path in paths:
+                    try:
+                        for record in scanner.iter_scan(path, workers=args.scan_workers):
+                            if len(paths) > 1:
+                                record['location'] = path
+                            f.write(json.dumps(record) + '\n')
+                        location_results = scanner.get_results(include_files=False)
+                    except ValueError as e:
+                        location_results = {'error': str(e)}
+                    ArchiveScanner.add_location_results(archive_results, path, location_results)
+            
+            if len(paths) == 1:
+                archive_results = archive_results['locations'][paths[0]]
+            
+            with open(output_dir / 'archives.summary.json', 'w') as f:
+                json.dump(archive_results, f, indent=2)
+        elif args.async_scan:
+            import asyncio
+            async_scanner = AsyncArchiveScanner(
+                scanner,
+                mount_concurrency=args.mount_concurrency,
+                bytes_per_second=args.read_limit * 1024 * 1024 if args.read_limit else None,
+            )
+            if len(paths) == 1:
+                archive_results = asyncio.run(async_scanner.scan_directory(paths[0]))
+            else:
+                archive_results = asyncio.run(async_scanner.scan_locations(paths))
+            
+            with open(output_dir / 'archives.json', 'w') as f:
+                json.dump(archive_results, f, indent=2)
+        elif args.watch:
+            # Initial scan, then apply filesystem events until Ctrl-C; every
+            # snapshot rewrites archives.json
+            watcher = ArchiveWatcher(
+                scanner,
+                snapshot_path=str(output_dir / 'archives.json'),
+                snapshot_interval=args.snapshot_interval,
+                workers=args.scan_workers,
+            )
+            try:
+                watcher.start(paths)
+                watcher.snapshot()
+                print("Watching for changes (Ctrl-C to stop)...")
+                archive_results = watcher.run()
+            finally:
+                watcher.close()
         else:
-            archive_results = scanner.scan_multiple_locations(paths)
+            if len(paths) == 1:
+                archive_results = scanner.scan_directory(paths[0], workers=args.scan_workers,
+                                                         resume=args.resume)
+            else:
+                archive_results = scanner.scan_multiple_locations(paths, workers=args.scan_workers,
+                                                                  cross_location=args.cross_location,
+                                                                  resume=args.resume)
+            
+            # Save module results
+            with open(output_dir / 'archives.json', 'w') as f:
+                json.dump(archive_results, f, indent=2)
         
         results['archives'] = archive_results
         
-        # Save module results
-        import json
-        with open(output_dir / 'archives.json', 'w') as f:
-            json.dump(archive_results, f, indent=2)
+        scanner.deduplicator.close()
+        if hash_cache is not None:
+            hash_cache.close()
+        if hash_engine is not None:
+            hash_engine.close()
         
-        print(f"✓ Archive scan complete. Found {archive_results.get('stats', {}).get('total_files', 0)} files")
+        if args.estimate:
+            print("✓ Archive estimate complete. See archives.estimate.json")
+        else:
+            print(f"✓ Archive scan complete. Found {archive_results.get('stats', {}).get('total_files', 0)} files")
     
     # Module 2: AI Context Aggregator
     if args.ai_conversations:
@@ -0,0 +1,118 @@
+"""
+Tests for the sampling archive estimator.
+"""
+
+import plistlib
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from cognitive_tribunal.modules.archive_estimator import ArchiveEstimator
+
+
+def test_estimate_is_exact_on_a_uniform_tree():
+    """
+    Test that Knuth's estimator recovers totals and duplicates of a regular tree.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        for a in range(3):
+            for b in range(3):
+                leaf = root / f"a{a}" / f"b{b}"
+                leaf.mkdir(parents=True)
+                (leaf / "shared.txt").write_text("same everywhere")
+                (leaf / f"code{a}{b}.py").write_text(f"x = {a}{b}")
+                (leaf / f"image{a}{b}.png").write_bytes(bytes([a, b]) * 50)
+        
+        result = ArchiveEstimator(probes=100, seed=7).estimate(str(root))
+        estimates = result['estimates']
+        
+        assert result['probes'] == 100
+        assert estimates['total_files'] == {'estimate': 27, 'low': 27, 'high': 27}
+        assert estimates['directories']['estimate'] == 13
+        assert estimates['by_category']['code']['estimate'] == 9
+        assert estimates['by_category']['image']['estimate'] == 9
+        expected_size = sum(p.stat().st_size for p in root.rglob("*") if p.is_file())
+        assert estimates['total_size']['estimate'] == expected_size
+        
+        # Nine copies of shared.txt: eight removable copies, 36 pairs
+        duplicates = estimates['duplicates']
+        assert duplicates['duplicate_copies_found'] == 8
+        assert duplicates['duplicate_copies']['estimate'] == 8
+        assert duplicates['duplicate_bytes']['estimate'] == 8 * len("same everywhere")
+        assert duplicates['duplicate_ratio'] <= 1
+        assert duplicates['duplicate_pairs_found'] == 36
+        assert duplicates['duplicate_pairs']['estimate'] == 36
+        
+        try:
+            ArchiveEstimator().estimate(str(root / "missing"))
+            assert False, "Expected ValueError for a missing path"
+        except ValueError:
+            pass
+
+
+def test_estimate_does_not_read_cloud_placeholders(monkeypatch):
+    """
+    Test that placeholders are left out of the duplicate sample unless hydration is requested.
+    """
+    from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+    from cognitive_tribunal.utils.file_utils import FileHasher
+    
+    original_hash = FileHasher.compute_partial_hash
+    hashed = []
+    
+    def recording_hash(file_path, *args, **kwargs):
+        hashed.append(Path(file_path).name)
+        return original_hash(file_path, *args, **kwargs)
+    
+    monkeypatch.setattr(FileHasher, 'compute_partial_hash', staticmethod(recording_hash))
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        # Fully sparse files, as FUSE sync clients report on-demand files
+        for name in ("a.mov", "b.mov"):
+            with open(root / name, 'wb') as f:
+                f.truncate(100000)
+        if (root / "a.mov").stat().st_blocks != 0:
+            pytest.skip('the filesystem does not keep sparse files sparse')
+        # Identical iCloud stubs, which must never be hashed
+        stub = plistlib.dumps({'NSURLNameKey': 'c.mov', 'NSURLFileSizeKey': 100000})
+        (root / ".c.mov.icloud").write_bytes(stub)
+        (root / ".d.mov.icloud").write_bytes(stub)
+        
+        duplicates = ArchiveEstimator(probes=5, seed=1).estimate(str(root))['estimates']['duplicates']
+        assert duplicates['placeholders_skipped'] == 4
+        assert duplicates['duplicate_copies_found'] == 0
+        assert hashed == []
+        
+        hydrating = ArchiveEstimator(ArchiveScanner(hydrate_placeholders=True), probes=5, seed=1)
+        duplicates = hydrating.estimate(str(root))['estimates']['duplicates']
+        assert duplicates['placeholders_skipped'] == 2
+        assert duplicates['duplicate_copies_found'] == 1
+        assert sorted(hashed) == ["a.mov", "b.mov"]
+
+
+def test_estimate_of_cross_directory_duplicates_is_unbiased():
+    """
+    Test that copies in sparsely sampled directories average out to the true count.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        for a in "abcd":
+            for b in "xy":
+                (root / a / b).mkdir(parents=True)
+                (root / a / b / "unique.txt").write_text(a + b)
+        # Three pairs: across top-level directories, and with an ancestor
+        for name, dirs in (("X", ["a/x", "c/y"]), ("Y", ["b", "d/x"]), ("Z", ["a", "a/y"])):
+            for directory in dirs:
+                (root / directory / f"{name}.bin").write_bytes(name.encode() * 1000)
+        
+        # Four probes see each leaf with probability 0.41, so a pair is
+        # only seen together in a small share of the runs
+        estimates = [
+            ArchiveEstimator(probes=4, seed=seed).estimate(str(root))['estimates']['duplicates']
+            for seed in range(300)
+        ]
+        mean_copies = sum(e['duplicate_bytes']['estimate'] for e in estimates) / len(estimates) / 1000
+        assert abs(mean_copies - 3) < 0.5
@@ -2,10 +2,22 @@
 Tests for Archive Scanner module.
 """
 
+import io
+import os
+import queue
+import random
+import tarfile
+import threading
+import time
 import tempfile
+import zipfile
 from pathlib import Path
 
+import pytest
+
 from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.utils.file_utils import FileHasher, ThroughputLimiter
+from cognitive_tribunal.utils.hash_cache import HashCache
 
 
 def create_test_file(directory: Path, filename: str, content: str):
@@ -124,3 +136,594 @@ def test_duplicate_detection_within_single_location():
         assert dedup_stats['total_files'] == 3
         assert dedup_stats['duplicate_groups'] == 1
         assert dedup_stats['duplicate_files'] == 1  # 2 files - 1 = 1 duplicate
+
+
+def test_nested_directories_and_max_depth():
+    """
+    Test that the scandir walker descends into subdirectories and honours max_depth.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        
+        current = directory
+        for level in range(5):
+            create_test_file(current, f"level{level}.txt", f"content {level}")
+            current = current / f"sub{level}"
+            current.mkdir()
+        
+        scanner = ArchiveScanner()
+        result = scanner.scan_directory(str(directory))
+        assert result['stats']['total_files'] == 5
+        assert result['stats']['errors'] == []
+        
+        # Depth 0 is the root itself, so max_depth=2 reaches level0..level2
+        result = scanner.scan_directory(str(directory), max_depth=2)
+        assert result['stats']['total_files'] == 3
+        
+        result = scanner.scan_directory(str(directory), recursive=False)
+        assert result['stats']['total_files'] == 1
+
+
+def test_parallel_walk_matches_serial():
+    """
+    Test that a multi-threaded scan produces the same results as a serial scan.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        
+        for i in range(4):
+            subdir = directory / f"dir{i}"
+            subdir.mkdir()
+            for j in range(3):
+                nested = subdir / f"nested{j}"
+                nested.mkdir()
+                create_test_file(nested, f"file{j}.txt", f"content {j}")
+                create_test_file(nested, f"unique{i}_{j}.md", f"unique {i} {j}")
+        
+        serial = ArchiveScanner().scan_directory(str(directory))
+        parallel = ArchiveScanner().scan_directory(str(directory), workers=4)
+        
+        assert parallel['stats'] == serial['stats']
+        assert sorted(f['path'] for f in parallel['files']) == sorted(f['path'] for f in serial['files'])
+        assert parallel['deduplication']['stats'] == serial['deduplication']['stats']
+        assert {k: sorted(v) for k, v in parallel['deduplication']['duplicates'].items()} == \
+            {k: sorted(v) for k, v in serial['deduplication']['duplicates'].items()}
+
+
+
+def test_parallel_walk_keeps_every_directory_under_contention(monkeypatch):
+    """
+    Test that slow, interleaved workers never end the parallel walk early.
+    """
+    original_put = queue.Queue.put
+    rng = random.Random(0)
+    rng_lock = threading.Lock()
+    
+    def slow_put(self, item, *args, **kwargs):
+        # Delay handing listed directories back, where workers can overtake
+        # each other
+        if isinstance(item, tuple) and len(item) == 4:
+            with rng_lock:
+                delay = rng.random() * 0.005
+            time.sleep(delay)
+        return original_put(self, item, *args, **kwargs)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        for i in range(20):
+            subdir = directory / f"dir{i}"
+            subdir.mkdir()
+            create_test_file(subdir, f"file{i}.txt", f"content {i}")
+        
+        serial = sorted(f['path'] for f in ArchiveScanner().scan_directory(str(directory))['files'])
+        monkeypatch.setattr(queue.Queue, 'put', slow_put)
+        for _ in range(20):
+            parallel = ArchiveScanner().scan_directory(str(directory), workers=8)
+            assert sorted(f['path'] for f in parallel['files']) == serial
+
+def test_hardlinks_are_not_reported_as_duplicates():
+    """
+    Test that hardlinked paths are hashed once and reported separately.
+    """
+    import os
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        original = create_test_file(directory, "original.txt", "linked content")
+        os.link(original, directory / "link.txt")
+        create_test_file(directory, "copy.txt", "linked content")
+        
+        scanner = ArchiveScanner()
+        result = scanner.scan_directory(str(directory))
+        dedup = result['deduplication']
+        
+        assert result['stats']['total_files'] == 3
+        assert dedup['stats']['duplicate_files'] == 1
+        assert dedup['stats']['hardlinked_files'] == 1
+        assert len(dedup['hardlinks']) == 1
+        assert sorted(Path(p).name for p in next(iter(dedup['hardlinks'].values()))) == ["link.txt", "original.txt"]
+        
+        # Savings come from the one real copy, measured in allocated blocks
+        assert dedup['potential_space_savings'] == os.stat(directory / "copy.txt").st_blocks * 512
+
+
+def test_iter_scan_streams_records_without_retaining_them():
+    """
+    Test that iter_scan yields every record and leaves a files-free summary.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        create_test_file(directory, "a.txt", "same")
+        create_test_file(directory, "b.txt", "same")
+        create_test_file(directory, "c.py", "print()")
+        
+        scanner = ArchiveScanner()
+        records = list(scanner.iter_scan(str(directory)))
+        
+        assert sorted(r['name'] for r in records) == ["a.txt", "b.txt", "c.py"]
+        assert {r['category'] for r in records} == {"document", "code"}
+        assert len(scanner.scanned_files) == 0
+        
+        summary = scanner.get_results(include_files=False)
+        assert 'files' not in summary
+        assert summary['stats']['total_files'] == 3
+        assert summary['deduplication']['stats']['duplicate_files'] == 1
+        
+        try:
+            list(scanner.iter_scan(str(directory / "missing")))
+            assert False, "Expected ValueError for a missing path"
+        except ValueError:
+            pass
+
+
+def test_cross_location_scan_finds_duplicates_between_locations():
+    """
+    Test that a combined multi-location scan shares one dedup index.
+    """
+    import os
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        icloud = Path(temp_dir) / "icloud"
+        dropbox = Path(temp_dir) / "dropbox"
+        icloud.mkdir()
+        dropbox.mkdir()
+        create_test_file(icloud, "report.txt", "quarterly numbers")
+        create_test_file(dropbox, "report copy.txt", "quarterly numbers")
+        create_test_file(dropbox, "report copy 2.txt", "quarterly numbers")
+        create_test_file(icloud, "notes.txt", "only here")
+        create_test_file(dropbox, "other.txt", "different!")
+        
+        scanner = ArchiveScanner()
+        
+        # The default mode keeps locations independent
+        separate = scanner.scan_multiple_locations([str(icloud), str(dropbox)])
+        assert separate['locations'][str(icloud)]['deduplication']['stats']['duplicate_groups'] == 0
+        
+        results = scanner.scan_multiple_locations([str(icloud), str(dropbox)], workers=2,
+                                                  cross_location=True)
+        dedup = results['deduplication']
+        
+        assert results['combined_stats']['total_files'] == 5
+        assert dedup['stats']['duplicate_groups'] == 1
+        assert len(dedup['cross_location_duplicates']) == 1
+        group = next(iter(dedup['cross_location_duplicates'].values()))
+        assert sorted(group) == sorted([str(icloud), str(dropbox)])
+        assert len(group[str(dropbox)]) == 2
+        
+        # The first location keeps its copy; the second is credited with both of its copies
+        copy_size = os.stat(icloud / "report.txt").st_blocks * 512
+        assert dedup['savings_by_location'] == {str(icloud): 0, str(dropbox): 2 * copy_size}
+        assert results['locations'][str(dropbox)]['deduplication']['removable_copies'] == 2
+        assert results['locations'][str(icloud)]['stats']['total_files'] == 2
+        assert dedup['potential_space_savings'] == 2 * copy_size
+
+
+def test_cross_location_scan_indexes_nested_roots_once():
+    """
+    Test that a location inside another one is not walked twice.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data = Path(temp_dir).resolve() / "data"
+        photos = data / "trips" / "photos"
+        photos.mkdir(parents=True)
+        create_test_file(data, "notes.txt", "only here")
+        create_test_file(data, "beach copy.jpg", "beach")
+        create_test_file(photos, "beach.jpg", "beach")
+        create_test_file(photos, "sunset.jpg", "sunset")
+        
+        scanner = ArchiveScanner()
+        results = scanner.scan_multiple_locations(
+            [str(data), str(photos), str(data / "trips" / ".." / "trips" / "photos")],
+            cross_location=True)
+        dedup = results['deduplication']
+        
+        assert results['combined_stats']['total_files'] == 4
+        assert results['locations'][str(data)]['stats']['total_files'] == 2
+        assert results['locations'][str(photos)]['stats']['total_files'] == 2
+        assert 'Same directory' in results['locations'][str(data / "trips" / ".." / "trips" / "photos")]['error']
+        assert dedup['stats']['duplicate_groups'] == 1
+        group = next(iter(dedup['cross_location_duplicates'].values()))
+        assert group == {str(data): [str(data / "beach copy.jpg")],
+                         str(photos): [str(photos / "beach.jpg")]}
+
+
+def test_interrupted_scan_resumes_from_checkpoint():
+    """
+    Test that a scan killed midway resumes without losing or repeating files.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir) / "archive"
+        checkpoints = Path(temp_dir) / "checkpoints"
+        for i in range(4):
+            subdir = root / f"dir{i}"
+            subdir.mkdir(parents=True)
+            create_test_file(subdir, "shared.txt", "same content")
+            create_test_file(subdir, f"unique{i}.txt", f"content {i}")
+        
+        for workers in (1, 3):
+            # Save at every directory boundary, then stop partway through
+            scanner = ArchiveScanner(checkpoint_dir=str(checkpoints), checkpoint_interval=0)
+            scan = scanner.iter_scan(str(root), workers=workers, keep_records=True)
+            for _ in range(5):
+                next(scan)
+            scan.close()
+            
+            limiter = ThroughputLimiter(100 * 1024 * 1024)
+            resumed = ArchiveScanner(checkpoint_dir=str(checkpoints), read_limiter=limiter)
+            result = resumed.scan_directory(str(root), workers=workers, resume=True)
+            
+            # The limiter is not checkpointed and must be attached again
+            assert resumed.deduplicator.read_limiter is limiter
+            assert result['stats']['total_files'] == 8
+            assert sorted(f['path'] for f in result['files']) == sorted(str(p) for p in root.rglob("*.txt"))
+            assert result['deduplication']['stats']['duplicate_files'] == 3
+            assert list(checkpoints.iterdir()) == []
+
+
+def test_resume_keeps_digests_computed_before_a_crash_while_hashing(monkeypatch):
+    """
+    Test that a scan dying in the duplicate search does not hash files again on resume.
+    """
+    monkeypatch.setattr(HashCache, 'FLUSH_EVERY', 1)
+    original_hash = FileHasher.compute_hash
+    hashed = []
+    
+    def crashing_hash(file_path, *args, **kwargs):
+        if len(hashed) == 3:
+            raise RuntimeError('killed')
+        hashed.append(Path(file_path).name)
+        return original_hash(file_path, *args, **kwargs)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir) / "archive"
+        checkpoints = Path(temp_dir) / "checkpoints"
+        root.mkdir()
+        for i in range(6):
+            create_test_file(root, f"file{i}.txt", f"pair {i // 2}")
+        
+        scanner = ArchiveScanner(checkpoint_dir=str(checkpoints))
+        for _ in scanner.iter_scan(str(root), keep_records=True):
+            pass
+        monkeypatch.setattr(FileHasher, 'compute_hash', staticmethod(crashing_hash))
+        with pytest.raises(RuntimeError):
+            scanner.deduplicator.find_duplicates()
+        
+        done = list(hashed)
+        hashed.clear()
+        resumed = ArchiveScanner(checkpoint_dir=str(checkpoints))
+        result = resumed.scan_directory(str(root), resume=True)
+        assert sorted(done + hashed) == sorted(f"file{i}.txt" for i in range(6))
+        assert result['stats']['total_files'] == 6
+        assert len(result['deduplication']['duplicates']) == 3
+        assert list(checkpoints.iterdir()) == []
+
+
+def test_resume_refuses_checkpoint_with_other_options():
+    """
+    Test that a checkpoint is only resumed with the options that wrote it.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir) / "archive"
+        checkpoints = Path(temp_dir) / "checkpoints"
+        for i in range(3):
+            (root / f"dir{i}").mkdir(parents=True)
+            create_test_file(root / f"dir{i}", f"file{i}.txt", f"content {i}")
+        rules = Path(temp_dir) / "rules"
+        rules.write_text("*.log\n")
+        
+        scanner = ArchiveScanner(checkpoint_dir=str(checkpoints), checkpoint_interval=0,
+                                 exclude_file=str(rules))
+        scan = scanner.iter_scan(str(root))
+        for _ in range(2):
+            next(scan)
+        scan.close()
+        assert list(checkpoints.iterdir())
+        
+        rules.write_text("*.log\ndir2/\n")
+        for changed, kwargs in (
+                ('exclude_rules', {'exclude_file': str(rules)}),
+                ('sniff_content', {'sniff_content': False}),
+                ('hydrate_placeholders', {'hydrate_placeholders': True})):
+            resumed = ArchiveScanner(checkpoint_dir=str(checkpoints), **kwargs)
+            assert changed in resumed.scan_directory(str(root), resume=True)['error']
+        
+        rules.write_text("*.log\n")
+        resumed = ArchiveScanner(checkpoint_dir=str(checkpoints), exclude_file=str(rules))
+        assert resumed.scan_directory(str(root), resume=True)['stats']['total_files'] == 3
+
+
+def test_space_savings_use_sizes_recorded_during_scan():
+    """
+    Test that space savings come from the walk and not from re-stat'ing files.
+    """
+    import os
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        create_test_file(directory, "a.txt", "duplicate content")
+        create_test_file(directory, "b.txt", "duplicate content")
+        create_test_file(directory, "c.txt", "duplicate content")
+        allocated = os.stat(directory / "a.txt").st_blocks * 512
+        
+        scanner = ArchiveScanner()
+        result = scanner.scan_directory(str(directory))
+        assert result['deduplication']['potential_space_savings'] == 2 * allocated
+        
+        # Reports stay consistent with the scan even once the files are gone
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (directory / name).unlink()
+        dedup = scanner.get_results(include_files=False)['deduplication']
+        assert dedup['potential_space_savings'] == 2 * allocated
+        assert list(dedup['duplicate_sizes'].values()) == [{'size': 17, 'allocated': allocated}]
+
+
+def test_directory_tree_rolls_up_subtree_totals():
+    """
+    Test that per-directory totals are aggregated during the scan.
+    """
+    import os
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        (root / "docs" / "old").mkdir(parents=True)
+        (root / "media" / "a" / "b").mkdir(parents=True)
+        create_test_file(root, "top.txt", "x" * 10)
+        create_test_file(root / "docs", "notes.txt", "y" * 20)
+        create_test_file(root / "docs" / "old", "notes.txt", "y" * 20)
+        create_test_file(root / "media" / "a" / "b", "clip.mp4", "z" * 300)
+        allocated = os.stat(root / "docs" / "notes.txt").st_blocks * 512
+        
+        scanner = ArchiveScanner(tree_depth=1, tree_top_n=2)
+        tree = scanner.scan_directory(str(root))['directory_tree']
+        
+        rollup = tree['rollup']
+        assert rollup['path'] == str(root)
+        assert rollup['files'] == 4
+        assert rollup['size'] == 350
+        assert rollup['duplicate_bytes'] == allocated
+        # Children are limited to the requested depth, largest first
+        assert [child['path'] for child in rollup['children']] == [str(root / "media"), str(root / "docs")]
+        assert all('children' not in child for child in rollup['children'])
+        docs = rollup['children'][1]
+        assert docs['files'] == 2
+        assert docs['by_category'] == {'document': 40}
+        
+        # Directories without files of their own still carry their subtree
+        assert [entry['path'] for entry in tree['top_subtrees']] == [str(root / "media"), str(root / "media" / "a")]
+        assert tree['top_subtrees'][1]['size'] == 300
+
+
+
+def test_directory_tree_counts_files_below_empty_directories():
+    """
+    Test that directories holding no files, at any depth, roll up their whole subtree.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        (root / "p" / "c1").mkdir(parents=True)
+        (root / "p" / "c2" / "x" / "y").mkdir(parents=True)
+        (root / "q" / "r" / "s" / "t").mkdir(parents=True)
+        create_test_file(root / "p" / "c1", "f1.txt", "a" * 100)
+        create_test_file(root / "p" / "c2" / "x" / "y", "f2.txt", "b" * 1000)
+        create_test_file(root / "q" / "r" / "s" / "t", "f3.txt", "c" * 10)
+        
+        scanner = ArchiveScanner(tree_depth=3)
+        results = scanner.scan_directory(str(root))
+        rollup = results['directory_tree']['rollup']
+        
+        assert rollup['size'] == results['stats']['total_size'] == 1110
+        assert rollup['files'] == 3
+        p, q = rollup['children']
+        assert (p['path'], p['size'], p['files']) == (str(root / "p"), 1100, 2)
+        assert [(child['path'], child['size']) for child in p['children']] == \
+            [(str(root / "p" / "c2"), 1000), (str(root / "p" / "c1"), 100)]
+        assert q['children'][0]['children'][0]['size'] == 10
+
+def test_incremental_updates_match_a_fresh_scan():
+    """
+    Test that update_file and remove_file leave the results a rescan would produce.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        (root / "sub").mkdir()
+        create_test_file(root, "a.txt", "duplicate content")
+        create_test_file(root / "sub", "b.txt", "duplicate content")
+        create_test_file(root, "c.py", "print(1)")
+        
+        scanner = ArchiveScanner()
+        scanner.scan_directory(str(root))
+        
+        (root / "a.txt").unlink()
+        assert scanner.remove_file(root / "a.txt")
+        assert not scanner.remove_file(root / "a.txt")
+        create_test_file(root, "c.py", "print('changed')")
+        assert scanner.update_file(root / "c.py")
+        create_test_file(root / "sub", "d.md", "duplicate content")
+        assert scanner.update_file(root / "sub" / "d.md")
+        
+        updated = scanner.get_results()
+        fresh = ArchiveScanner().scan_directory(str(root))
+        assert updated['stats'] == fresh['stats']
+        assert sorted(f['path'] for f in updated['files']) == sorted(f['path'] for f in fresh['files'])
+        assert updated['directory_tree'] == fresh['directory_tree']
+        assert sorted(map(sorted, updated['deduplication']['duplicates'].values())) == \
+            sorted(map(sorted, fresh['deduplication']['duplicates'].values()))
+        assert scanner.query_files(category='code')[0]['size'] == len("print('changed')")
+
+
+def test_archive_members_are_deduplicated_against_loose_files():
+    """
+    Test that files inside zip and nested tar archives are found as duplicates.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        # Larger than two partial-hash blocks, so streamed partial hashes must
+        # match the ones read from disk
+        report = os.urandom(200000)
+        (root / "report.pdf").write_bytes(report)
+        create_test_file(root, "notes.txt", "nested duplicate")
+        
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode="w:gz") as tar:
+            data = b"nested duplicate"
+            info = tarfile.TarInfo("notes/copy.txt")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        with zipfile.ZipFile(root / "backup.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("docs/report.pdf", report)
+            archive.writestr("old.tar.gz", tar_buffer.getvalue())
+        
+        scanner = ArchiveScanner(archive_members=True)
+        results = scanner.scan_directory(str(root))
+        
+        zip_path = str(root / "backup.zip")
+        groups = sorted(map(sorted, results['deduplication']['duplicates'].values()))
+        assert groups == sorted([
+            sorted([str(root / "report.pdf"), f"{zip_path}!/docs/report.pdf"]),
+            sorted([str(root / "notes.txt"), f"{zip_path}!/old.tar.gz!/notes/copy.txt"]),
+        ])
+        assert results['stats']['total_files'] == 3
+        assert results['stats']['archive_member_files'] == 3
+        members = {f['path']: f for f in results['files'] if f.get('archive_member')}
+        assert members[f"{zip_path}!/docs/report.pdf"]['category'] == 'document'
+        
+        # The external deduplicator takes the members' hashes from its run
+        # files, including the confirm digests, which have another size
+        external = ArchiveScanner(archive_members=True, dedup_memory_budget=1024 * 1024,
+                                  hash_algorithm='blake2b-128', confirm_algorithm='sha256')
+        external_results = external.scan_directory(str(root))
+        assert sorted(map(sorted, external_results['deduplication']['duplicates'].values())) == groups
+        external.deduplicator.close()
+        
+        # Without nesting the tar's members are not read; with too small a
+        # byte limit the archive is abandoned and the error reported
+        shallow = ArchiveScanner(archive_members=True, archive_max_depth=1).scan_directory(str(root))
+        assert shallow['stats']['archive_member_files'] == 2
+        limited = ArchiveScanner(archive_members=True, archive_max_bytes=1000).scan_directory(str(root))
+        assert limited['stats']['archive_member_files'] == 0
+        assert any('backup.zip' in error for error in limited['stats']['errors'])
+        
+        # Removing the archive removes its members
+        (root / "backup.zip").unlink()
+        assert scanner.remove_file(zip_path)
+        assert scanner.get_results()['stats']['archive_member_files'] == 0
+        assert scanner.get_results()['deduplication']['duplicates'] == {}
+
+
+def test_nested_archives_are_read_once_and_member_hashes_cached(monkeypatch):
+    """
+    Test that nested archives are spooled, charged to the byte limit, and
+    that unchanged members are taken from the hash cache on rescans.
+    """
+    from cognitive_tribunal.utils.archive_members import ArchiveLimitExceeded, ArchiveMemberReader
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+        create_test_file(root, "notes.txt", "nested duplicate")
+        
+        tar_buffer = io.BytesIO()
+        with tarfile.open(fileobj=tar_buffer, mode="w:gz") as tar:
+            for name, data in (("a.txt", b"nested duplicate"), ("b.txt", b"nested unique")):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        nested = tar_buffer.getvalue()
+        with zipfile.ZipFile(root / "backup.zip", "w") as archive:
+            archive.writestr("old.tar.gz", nested)
+            # Path() would turn this into 'docs/blob'
+            archive.writestr("docs/./blob", png)
+        (root / "image.png").write_bytes(png)
+        
+        opened = []
+        original_open = zipfile.ZipFile.open
+        
+        def counting_open(self, name, *args, **kwargs):
+            opened.append(getattr(name, 'filename', name))
+            return original_open(self, name, *args, **kwargs)
+        
+        monkeypatch.setattr(zipfile.ZipFile, "open", counting_open)
+        
+        # Re-reading the spooled tar counts towards the byte limit too
+        read_once = len(nested) + len(png) + len(b"nested duplicate") + len(b"nested unique")
+        with pytest.raises(ArchiveLimitExceeded):
+            list(ArchiveMemberReader(max_bytes=read_once).iter_members(root / "backup.zip"))
+        assert opened == ["old.tar.gz"]
+        
+        opened.clear()
+        cache = HashCache(str(root / "cache" / "hashes.sqlite"))
+        results = ArchiveScanner(archive_members=True, hash_cache=cache,
+                                 exclude_patterns=["cache"]).scan_directory(str(root))
+        assert sorted(opened) == ["docs/./blob", "old.tar.gz"]
+        zip_path = str(root / "backup.zip")
+        expected = sorted([
+            sorted([str(root / "image.png"), f"{zip_path}!/docs/./blob"]),
+            sorted([str(root / "notes.txt"), f"{zip_path}!/old.tar.gz!/a.txt"]),
+        ])
+        assert sorted(map(sorted, results['deduplication']['duplicates'].values())) == expected
+        members = {f['path']: f for f in results['files'] if f.get('archive_member')}
+        assert members[f"{zip_path}!/docs/./blob"]['category'] == 'image'
+        
+        # Only the nested archive is read again, to list its members
+        opened.clear()
+        rescanned = ArchiveScanner(archive_members=True, hash_cache=cache,
+                                   exclude_patterns=["cache"]).scan_directory(str(root))
+        assert opened == ["old.tar.gz"]
+        assert sorted(map(sorted, rescanned['deduplication']['duplicates'].values())) == expected
+        assert sorted((f['path'], f['category']) for f in rescanned['files']) == \
+            sorted((f['path'], f['category']) for f in results['files'])
+        cache.close()
+
+
+def test_remove_directory_drops_only_its_subtree():
+    """
+    Test that remove_directory removes a subtree, archive members included, like a rescan.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        (root / "gone" / "deep" / "deeper").mkdir(parents=True)
+        (root / "gone-not").mkdir()
+        create_test_file(root / "gone", "a.txt", "shared")
+        create_test_file(root / "gone" / "deep" / "deeper", "b.txt", "unique b")
+        create_test_file(root / "gone-not", "c.txt", "shared")
+        create_test_file(root, "d.txt", "shared")
+        with zipfile.ZipFile(root / "gone" / "deep" / "old.zip", "w") as archive:
+            archive.writestr("copy.txt", "shared")
+        
+        scanner = ArchiveScanner(archive_members=True)
+        scanner.scan_directory(str(root))
+        # The indexes follow records moved by earlier removals
+        create_test_file(root, "d.txt", "changed")
+        assert scanner.update_file(root / "d.txt")
+        
+        for path in sorted((root / "gone").rglob("*"), reverse=True):
+            path.unlink() if path.is_file() else path.rmdir()
+        (root / "gone").rmdir()
+        assert scanner.remove_directory(root / "gone") == 3
+        assert scanner.remove_directory(root / "gone") == 0
+        
+        updated = scanner.get_results()
+        fresh = ArchiveScanner(archive_members=True).scan_directory(str(root))
+        assert updated['stats'] == fresh['stats']
+        assert sorted(f['path'] for f in updated['files']) == sorted(f['path'] for f in fresh['files'])
+        assert updated['directory_tree'] == fresh['directory_tree']
@@ -0,0 +1,96 @@
+"""
+Tests for the inotify archive watcher.
+"""
+
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.modules.archive_watcher import ArchiveWatcher
+from cognitive_tribunal.utils.inotify import inotify_available
+
+
+pytestmark = pytest.mark.skipif(not inotify_available(), reason='inotify is Linux-only')
+
+
+def poll_until(watcher: ArchiveWatcher, condition, timeout: float = 5.0):
+    """Poll the watcher until condition() holds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'watcher did not pick up the change'
+        watcher.poll(timeout=0.05)
+
+
+@pytest.mark.parametrize('dedup_memory_budget', [None, 1024 * 1024])
+def test_watcher_applies_file_and_directory_changes(dedup_memory_budget):
+    """
+    Test that creates, edits, deletes and directory moves update the inventory.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        (root / "docs").mkdir()
+        (root / "docs" / "a.txt").write_text("duplicate content")
+        (root / "notes.md").write_text("notes")
+        
+        watcher = ArchiveWatcher(ArchiveScanner(dedup_memory_budget=dedup_memory_budget), settle=0.0)
+        try:
+            initial = watcher.start([str(root)])
+            assert initial['stats']['total_files'] == 2
+            scanner = watcher.scanner
+            
+            (root / "b.txt").write_text("duplicate content")
+            (root / "notes.md").unlink()
+            poll_until(watcher, lambda: scanner.stats['total_files'] == 2
+                       and str(root / "b.txt") in scanner._record_id_map())
+            assert len(watcher.results()['deduplication']['duplicates']) == 1
+            
+            # A new tree moved in is watched, and changes inside it are seen
+            with tempfile.TemporaryDirectory(dir=root.parent) as outside:
+                (Path(outside) / "new" / "deep").mkdir(parents=True)
+                (Path(outside) / "new" / "deep" / "c.py").write_text("print(1)")
+                (Path(outside) / "new").rename(root / "new")
+            poll_until(watcher, lambda: scanner.stats['by_category'].get('code') == 1)
+            (root / "new" / "deep" / "d.py").write_text("print(2)")
+            poll_until(watcher, lambda: scanner.stats['by_category'].get('code') == 2)
+            
+            # Moving a directory away drops everything below it
+            (root / "docs").rename(root.parent / (root.name + "-moved"))
+            try:
+                poll_until(watcher, lambda: scanner.stats['total_files'] == 3)
+            finally:
+                (root.parent / (root.name + "-moved") / "a.txt").unlink()
+                (root.parent / (root.name + "-moved")).rmdir()
+            
+            results = watcher.results()
+            assert results['deduplication']['duplicates'] == {}
+            assert sorted(f['path'] for f in results['files']) == sorted(
+                str(p) for p in root.rglob("*") if p.is_file())
+        finally:
+            watcher.close()
+
+
+def test_watcher_writes_snapshots_in_scan_results_shape():
+    """
+    Test that run() writes a final snapshot shaped like archives.json.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve() / "archive"
+        root.mkdir()
+        (root / "a.txt").write_text("content")
+        snapshot_path = Path(temp_dir) / "archives.json"
+        
+        watcher = ArchiveWatcher(ArchiveScanner(), snapshot_path=str(snapshot_path), settle=0.0)
+        try:
+            watcher.start([str(root)])
+            (root / "b.txt").write_text("more content")
+            watcher.run(duration=0.5)
+        finally:
+            watcher.close()
+        
+        snapshot = json.loads(snapshot_path.read_text())
+        assert snapshot['stats']['total_files'] == 2
+        assert {'files', 'deduplication', 'directory_tree', 'scan_timestamp'} <= set(snapshot)
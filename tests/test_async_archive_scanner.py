@@ -0,0 +1,164 @@
+"""
+Tests for the async archive scanner.
+"""
+
+import asyncio
+import tempfile
+from pathlib import Path
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.modules.async_archive_scanner import AsyncArchiveScanner
+
+
+def test_async_scan_matches_sync_scan_inside_running_loop():
+    """
+    Test that async scans match scan_directory and share the loop with other tasks.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        for location in ("icloud", "dropbox"):
+            for i in range(3):
+                subdir = root / location / f"dir{i}"
+                subdir.mkdir(parents=True)
+                (subdir / "same.txt").write_text("same content")
+                (subdir / f"{location}{i}.py").write_text(f"print({i})")
+        
+        expected = ArchiveScanner().scan_directory(str(root / "icloud"))
+        
+        async def main():
+            ticks = []
+            
+            async def heartbeat():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0)
+            
+            beat = asyncio.ensure_future(heartbeat())
+            scanner = AsyncArchiveScanner(mount_concurrency=2, bytes_per_second=10 * 1024 * 1024)
+            single = await scanner.scan_directory(str(root / "icloud"))
+            combined = await scanner.scan_locations(
+                [str(root / "icloud"), str(root / "dropbox"), str(root / "missing")])
+            beat.cancel()
+            return single, combined, ticks
+        
+        single, combined, ticks = asyncio.run(main())
+        
+        assert ticks
+        assert single['stats']['total_files'] == expected['stats']['total_files'] == 6
+        assert single['stats']['by_category'] == expected['stats']['by_category']
+        assert sorted(f['path'] for f in single['files']) == sorted(f['path'] for f in expected['files'])
+        assert single['deduplication']['duplicates'].keys() == expected['deduplication']['duplicates'].keys()
+        
+        assert combined['combined_stats']['total_files'] == 12
+        assert 'error' in combined['locations'][str(root / "missing")]
+        assert combined['locations'][str(root / "dropbox")]['deduplication']['stats']['duplicate_files'] == 2
+
+
+def test_async_scan_reads_files_off_the_event_loop(monkeypatch):
+    """
+    Test that content sniffing runs in the executor and is charged to the mount limiter.
+    """
+    import threading
+    import cognitive_tribunal.modules.archive_scanner as archive_scanner_module
+    from cognitive_tribunal.utils import content_sniffer
+    
+    calls = []
+    
+    def recording_sniff(file_path, limiter=None):
+        calls.append((threading.current_thread(), limiter))
+        return content_sniffer.sniff_file(file_path, limiter)
+    
+    monkeypatch.setattr(archive_scanner_module, 'sniff_file', recording_sniff)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        (root / "IMG_0001").write_bytes(b'\xff\xd8\xff\xe0' + b'\x00' * 100)
+        
+        async def main():
+            scanner = AsyncArchiveScanner(bytes_per_second=10 * 1024 * 1024)
+            return await scanner.scan_directory(str(root)), threading.current_thread()
+        
+        result, loop_thread = asyncio.run(main())
+        
+        assert result['stats']['by_category'] == {'image': 1}
+        assert len(calls) == 1
+        thread, limiter = calls[0]
+        assert thread is not loop_thread
+        assert limiter is not None
+
+
+def test_async_scan_reads_archive_members_under_the_mount_limits(monkeypatch):
+    """
+    Test that archive members are read in the executor and charged to the limiter.
+    """
+    import threading
+    import zipfile
+    from cognitive_tribunal.utils.file_utils import ThroughputLimiter
+    
+    consumed = []
+    original_consume = ThroughputLimiter.consume
+    
+    def recording_consume(self, nbytes):
+        consumed.append((threading.current_thread(), nbytes))
+        return original_consume(self, nbytes)
+    
+    monkeypatch.setattr(ThroughputLimiter, 'consume', recording_consume)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        (root / "notes.txt").write_text("inside and out")
+        with zipfile.ZipFile(root / "backup.zip", "w") as archive:
+            archive.writestr("notes.txt", "inside and out")
+        
+        async def main():
+            scanner = AsyncArchiveScanner(ArchiveScanner(archive_members=True),
+                                          bytes_per_second=10 * 1024 * 1024)
+            return await scanner.scan_directory(str(root)), threading.current_thread()
+        
+        result, loop_thread = asyncio.run(main())
+        
+        assert result['stats']['archive_member_files'] == 1
+        assert sorted(next(iter(result['deduplication']['duplicates'].values()))) == \
+            [str(root.resolve() / "backup.zip") + "!/notes.txt", str(root.resolve() / "notes.txt")]
+        assert sum(nbytes for _, nbytes in consumed) >= (root / "backup.zip").stat().st_size
+        assert all(thread is not loop_thread for thread, _ in consumed)
+
+
+def test_async_scan_caps_hash_engine_reads_per_mount(monkeypatch):
+    """
+    Test that a hash engine with more workers than mount slots stays within them.
+    """
+    import threading
+    import time
+    from cognitive_tribunal.utils import file_utils
+    
+    running = []
+    peak = []
+    lock = threading.Lock()
+    original_hash_job = file_utils._hash_job
+    
+    def slow_hash_job(*args):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.01)
+        try:
+            return original_hash_job(*args)
+        finally:
+            with lock:
+                running.pop()
+    
+    monkeypatch.setattr(file_utils, '_hash_job', slow_hash_job)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        for i in range(12):
+            (root / f"copy{i}.txt").write_text("same content")
+        
+        with file_utils.HashEngine(workers=8) as engine:
+            scanner = AsyncArchiveScanner(ArchiveScanner(hash_engine=engine), mount_concurrency=2)
+            result = asyncio.run(scanner.scan_directory(str(root)))
+            assert engine.max_in_flight == 32
+        
+        assert result['deduplication']['stats']['duplicate_files'] == 11
+        assert 1 < max(peak) <= 2
@@ -0,0 +1,75 @@
+"""
+Tests for content-defined chunking.
+"""
+
+import io
+import random
+import tempfile
+from pathlib import Path
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.utils.chunking import Chunker, ChunkIndex
+
+
+def random_bytes(size: int, seed: int) -> bytes:
+    return random.Random(seed).getrandbits(8 * size).to_bytes(size, 'little')
+
+
+def test_chunk_boundaries_survive_insertions():
+    """
+    Test chunk size bounds, and that an edit only changes the chunks near it.
+    """
+    chunker = Chunker(min_size=256, avg_size=1024, max_size=4096)
+    original = random_bytes(200000, seed=1)
+    edited = original[:100000] + b'inserted text' + original[100000:]
+
+    chunks = list(chunker.iter_chunks(io.BytesIO(original)))
+    assert b''.join(chunks) == original
+    assert all(256 <= len(chunk) <= 4096 for chunk in chunks[:-1])
+
+    edited_chunks = set(chunker.iter_chunks(io.BytesIO(edited)))
+    changed = [chunk for chunk in chunks if chunk not in edited_chunks]
+    assert sum(len(chunk) for chunk in changed) < 3 * 4096
+
+    # Exact while the index fits, an estimate close to it once sampled
+    exact = ChunkIndex()
+    sampled = ChunkIndex(max_entries=50)
+    for index in (exact, sampled):
+        index.add_file('original', chunker.iter_chunks(io.BytesIO(original)))
+        index.add_file('edited', chunker.iter_chunks(io.BytesIO(edited)))
+    exact_report = exact.get_report()
+    sampled_report = sampled.get_report()
+    assert exact_report['sampling_rate'] == 1.0
+    assert exact_report['duplicate_bytes'] > 0.9 * len(original)
+    assert exact_report['top_pairs'][0]['paths'] == ['original', 'edited']
+    assert exact_report['top_files'][0]['path'] == 'edited'
+    assert sampled_report['index_entries'] <= 50
+    assert sampled_report['sampling_rate'] < 1.0
+    assert sampled_report['total_bytes'] == exact_report['total_bytes']
+    assert abs(sampled_report['duplicate_bytes'] - exact_report['duplicate_bytes']) < 0.35 * len(original)
+
+
+def test_chunk_analysis_finds_near_duplicates_missed_by_whole_file_hashing():
+    """
+    Test that the scanner reports bytes shared by files that are not exact copies.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir).resolve()
+        log = random_bytes(150000, seed=2)
+        (root / "app.log").write_bytes(log)
+        (root / "app.log.1").write_bytes(log + b'one more line\n')
+        (root / "small.txt").write_bytes(log[:1000])
+
+        scanner = ArchiveScanner(chunk_analysis=True, chunk_avg_size=4096, chunk_min_file_size=10000)
+        results = scanner.scan_directory(str(root))
+
+        assert results['deduplication']['potential_space_savings'] == 0
+        report = results['chunk_dedup']
+        assert report['files'] == 2
+        assert report['duplicate_bytes'] > 0.9 * len(log)
+        assert sorted(report['top_pairs'][0]['paths']) == [str(root / "app.log"), str(root / "app.log.1")]
+
+        # Removing a file drops the cached report
+        (root / "app.log.1").unlink()
+        scanner.remove_file(root / "app.log.1")
+        assert scanner.get_results()['chunk_dedup']['duplicate_bytes'] == 0
@@ -0,0 +1,83 @@
+"""
+Tests for content sniffing.
+"""
+
+import io
+import tempfile
+import zipfile
+from pathlib import Path
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.utils import content_sniffer
+from cognitive_tribunal.utils.content_sniffer import SNIFF_BYTES, sniff_bytes
+from cognitive_tribunal.utils.hash_cache import HashCache
+
+
+def test_sniff_bytes_recognizes_signatures_and_containers():
+    """
+    Test signature matching, including offset signatures and ZIP-based formats.
+    """
+    assert sniff_bytes(b'\x89PNG\r\n\x1a\n' + b'\x00' * 20) == ('image', 'image/png')
+    assert sniff_bytes(b'RIFF\x00\x00\x00\x00WAVEfmt ') == ('audio', 'audio/wav')
+    assert sniff_bytes(b'\x00\x00\x00\x18ftypqt  \x00') == ('video', 'video/quicktime')
+    assert sniff_bytes(b'\x00\x00\x00\x18ftypisom\x00') == ('video', 'video/mp4')
+    assert sniff_bytes(b'\x00' * 257 + b'ustar\x0000') == ('archive', 'application/x-tar')
+    assert sniff_bytes(b'#!/bin/sh\necho hi\n') == ('code', 'text/x-script')
+    assert sniff_bytes('Meeting notes — café\n'.encode('utf-8')[:-2]) == ('document', 'text/plain')
+    assert sniff_bytes(b'\x00\x01\x02\x03binary') is None
+    assert sniff_bytes(b'') is None
+    
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('[Content_Types].xml', '<Types/>')
+        archive.writestr('xl/workbook.xml', '<workbook/>')
+    assert sniff_bytes(buffer.getvalue()[:SNIFF_BYTES])[0] == 'spreadsheet'
+
+
+def test_scanner_sniffs_unrecognized_files_once(monkeypatch):
+    """
+    Test that extensionless files are classified by content and cached across rescans.
+    """
+    import cognitive_tribunal.modules.archive_scanner as archive_scanner_module
+    
+    calls = []
+    
+    def counting_sniff(file_path, *args, **kwargs):
+        calls.append(Path(file_path).name)
+        return content_sniffer.sniff_file(file_path, *args, **kwargs)
+    
+    monkeypatch.setattr(archive_scanner_module, 'sniff_file', counting_sniff)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir) / "archive"
+        root.mkdir()
+        (root / "IMG_0001").write_bytes(b'\xff\xd8\xff\xe0' + b'\x00' * 10000)
+        (root / "README").write_text("plain notes")
+        (root / "blob.bin").write_bytes(b'\x00\x01\x02' * 100)
+        (root / "script.py").write_bytes(b'\x00 not read')
+        
+        cache = HashCache(str(Path(temp_dir) / "cache.db"))
+        scanner = ArchiveScanner(hash_cache=cache)
+        result = scanner.scan_directory(str(root))
+        categories = {Path(f['path']).name: f['category'] for f in result['files']}
+        assert categories == {'IMG_0001': 'image', 'README': 'document',
+                              'blob.bin': 'other', 'script.py': 'code'}
+        assert sorted(calls) == ['IMG_0001', 'README', 'blob.bin']
+        mime_types = {Path(f['path']).name: f['mime_type'] for f in result['files']}
+        assert mime_types['IMG_0001'] == 'image/jpeg'
+        assert mime_types['README'] == 'text/plain'
+        assert mime_types['blob.bin'] == 'application/octet-stream'
+        streamed = {Path(r['path']).name: r['mime_type']
+                    for r in ArchiveScanner(hash_cache=cache).iter_scan(str(root), keep_records=False)}
+        assert streamed == mime_types
+        
+        # Rescans take the category and MIME type from the hash cache
+        calls.clear()
+        rescan = ArchiveScanner(hash_cache=cache).scan_directory(str(root))
+        assert rescan['stats'] == result['stats']
+        assert {Path(f['path']).name: f['mime_type'] for f in rescan['files']} == mime_types
+        assert calls == []
+        cache.close()
+        
+        assert ArchiveScanner(sniff_content=False).scan_directory(str(root))['stats']['by_category'] == \
+            {'other': 3, 'code': 1}
@@ -0,0 +1,66 @@
+"""
+Tests for compiled exclude rules.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.utils.exclude_matcher import ExcludeMatcher
+
+
+def test_name_and_path_rules():
+    """
+    Test glob semantics for name rules, anchored path rules and negation.
+    """
+    matcher = ExcludeMatcher(['.git', '*.tmp', 'build/', 'docs/**/*.pdf', '# comment', ''])
+    
+    assert matcher.excludes('.git', is_dir=True)
+    assert not matcher.excludes('.github', is_dir=True)
+    assert matcher.excludes('report.tmp')
+    assert not matcher.excludes('report.tmpl')
+    assert matcher.excludes('build', is_dir=True)
+    assert not matcher.excludes('build', is_dir=False)
+    assert matcher.excludes('a.pdf', rel_path='docs/x/y/a.pdf')
+    assert matcher.excludes('a.pdf', rel_path='docs/a.pdf')
+    assert not matcher.excludes('a.pdf', rel_path='other/docs/a.pdf')
+    assert matcher.match_path('/data/archive/.git/config', root='/data/archive')
+    
+    negated = ExcludeMatcher(['*.log', '!keep.log'])
+    assert negated.excludes('debug.log')
+    assert not negated.excludes('keep.log')
+
+
+def test_scanner_prunes_excluded_directories(monkeypatch):
+    """
+    Test that excluded directories are never listed and rules files are honoured.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        (root / "node_modules" / "pkg").mkdir(parents=True)
+        (root / "node_modules" / "pkg" / "index.js").write_text("x")
+        (root / ".github").mkdir()
+        (root / ".github" / "ci.yml").write_text("x")
+        (root / "src").mkdir()
+        (root / "src" / "main.py").write_text("x")
+        (root / "src" / "notes.bak").write_text("x")
+        rules = root / "scan.ignore"
+        rules.write_text("# backups\n*.bak\n/scan.ignore\n")
+        
+        listed = []
+        real_scandir = os.scandir
+        
+        def recording_scandir(path):
+            listed.append(os.path.basename(path))
+            return real_scandir(path)
+        
+        scanner = ArchiveScanner(exclude_file=str(rules))
+        with monkeypatch.context() as patch:
+            patch.setattr(os, 'scandir', recording_scandir)
+            result = scanner.scan_directory(str(root))
+        
+        names = sorted(Path(f['path']).name for f in result['files'])
+        assert names == ["ci.yml", "main.py"]
+        assert "node_modules" not in listed
+        assert scanner.should_exclude(root / "node_modules" / "pkg" / "index.js")
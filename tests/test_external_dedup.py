@@ -0,0 +1,107 @@
+"""
+Tests for the external-memory deduplicator.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from cognitive_tribunal.utils.external_dedup import ExternalDeduplicator
+from cognitive_tribunal.utils.file_utils import Deduplicator
+
+
+def test_external_dedup_matches_in_memory_dedup(monkeypatch):
+    """
+    Test that spilled runs and multi-pass merges give the in-memory results.
+    """
+    monkeypatch.setattr(ExternalDeduplicator, 'MAX_MERGE_FAN_IN', 2)
+    monkeypatch.setattr(ExternalDeduplicator, 'HASH_BATCH', 3)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir) / "files"
+        directory.mkdir()
+        block = Deduplicator.PARTIAL_BLOCK_SIZE
+        large = b"a" * (3 * block)
+        contents = {
+            "dup1.txt": b"same",
+            "dup2.txt": b"same",
+            "dup3.txt": b"same",
+            "diff.txt": b"diff",
+            "unique.txt": b"a unique size",
+            "large1.bin": large,
+            "large2.bin": large,
+            "large3.bin": large[:block] + b"b" * block + large[2 * block:],
+            "large4.bin": b"c" + large[1:],
+        }
+        for name, data in contents.items():
+            (directory / name).write_bytes(data)
+        os.link(directory / "dup1.txt", directory / "dup1-link.txt")
+        
+        external = ExternalDeduplicator(work_dir=str(Path(temp_dir) / "runs"))
+        external.buffer_limit = external._size_runs.buffer_limit = 2
+        in_memory = Deduplicator()
+        for path in sorted(directory.iterdir()):
+            external.add_file(path)
+            in_memory.add_file(path)
+        
+        assert len(external._size_runs.runs) >= 4
+        
+        def normalized(groups):
+            return sorted(sorted(p.name for p in paths) for paths in groups.values())
+        
+        assert external.find_duplicates().keys() == in_memory.find_duplicates().keys()
+        assert normalized(external.find_duplicates()) == normalized(in_memory.find_duplicates())
+        # large3.bin only differs in its middle block, so it passes the partial stage
+        assert ["large1.bin", "large2.bin"] in normalized(external.find_duplicates())
+        assert normalized(external.get_hardlinks()) == normalized(in_memory.get_hardlinks())
+        assert {k: (v['size'], v['allocated']) for k, v in external.get_duplicate_details().items()} == \
+            {k: (v['size'], v['allocated']) for k, v in in_memory.get_duplicate_details().items()}
+        
+        external_stats = external.get_stats()
+        memory_stats = in_memory.get_stats()
+        for key in ('total_files', 'unique_sizes', 'duplicate_groups', 'duplicate_files',
+                    'hardlink_groups', 'hardlinked_files', 'pipeline'):
+            assert external_stats[key] == memory_stats[key], key
+        
+        # Adding a file invalidates the cached groups
+        (directory / "dup4.txt").write_bytes(b"same")
+        external.add_file(directory / "dup4.txt")
+        assert external.get_stats()['duplicate_files'] == memory_stats['duplicate_files'] + 1
+        
+        work_dir = external.work_dir
+        external.close()
+        assert not os.path.exists(work_dir)
+
+
+def test_external_dedup_removes_files():
+    """
+    Test that removed files leave their groups, and that re-added paths count again.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir) / "files"
+        directory.mkdir()
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (directory / name).write_bytes(b"same")
+        os.link(directory / "a.txt", directory / "a-link.txt")
+        
+        external = ExternalDeduplicator(work_dir=str(Path(temp_dir) / "runs"))
+        for path in sorted(directory.iterdir()):
+            external.add_file(path)
+        assert external.get_stats()['duplicate_files'] == 2
+        
+        assert external.remove_file(directory / "c.txt", 4)
+        assert external.remove_file(directory / "a-link.txt", 4)
+        assert external.get_stats()['duplicate_files'] == 1
+        assert external.get_hardlinks() == {}
+        
+        # An edited file is removed with its old size and added again
+        (directory / "b.txt").write_bytes(b"edited")
+        external.remove_file(directory / "b.txt", 4)
+        external.add_file(directory / "b.txt")
+        assert external.find_duplicates() == {}
+        
+        (directory / "c.txt").write_bytes(b"edited")
+        external.add_file(directory / "c.txt")
+        assert sorted(p.name for paths in external.find_duplicates().values() for p in paths) == \
+            ["b.txt", "c.txt"]
+        external.close()
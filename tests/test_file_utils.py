@@ -0,0 +1,179 @@
+"""
+Tests for file hashing and deduplication utilities.
+"""
+
+import hashlib
+import tempfile
+from pathlib import Path
+
+from cognitive_tribunal.utils.file_utils import Deduplicator
+
+
+def test_partial_hash_stage_skips_full_reads():
+    """
+    Test that same-size files differing in their first block are never fully hashed.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        size = 4 * Deduplicator.PARTIAL_BLOCK_SIZE
+        
+        body = b"x" * (size - 1)
+        (directory / "differs_a.bin").write_bytes(b"a" + body)
+        (directory / "differs_b.bin").write_bytes(b"b" + body)
+        (directory / "same_1.bin").write_bytes(b"s" * size)
+        (directory / "same_2.bin").write_bytes(b"s" * size)
+        (directory / "lonely.bin").write_bytes(b"l" * 10)
+        
+        deduplicator = Deduplicator()
+        for file_path in sorted(directory.iterdir()):
+            deduplicator.add_file(file_path)
+        
+        duplicates = deduplicator.find_duplicates()
+        assert len(duplicates) == 1
+        assert sorted(p.name for p in next(iter(duplicates.values()))) == ["same_1.bin", "same_2.bin"]
+        
+        pipeline = deduplicator.get_stats()['pipeline']
+        partial_bytes = 2 * Deduplicator.PARTIAL_BLOCK_SIZE
+        assert pipeline['bytes_skipped_by_size'] == 10
+        assert pipeline['bytes_read_partial'] == 4 * partial_bytes
+        assert pipeline['bytes_skipped_by_partial_hash'] == 2 * (size - partial_bytes)
+        assert pipeline['bytes_read_full'] == 2 * size
+
+
+def test_each_file_hashed_at_most_once(monkeypatch):
+    """
+    Test that repeated and incremental duplicate queries reuse memoized hashes.
+    """
+    from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+    from cognitive_tribunal.utils.file_utils import FileHasher
+    
+    hashed = []
+    original = FileHasher.compute_hash
+    
+    def counting_hash(file_path, algorithm='sha256', *args, **kwargs):
+        hashed.append(file_path)
+        return original(file_path, algorithm, *args, **kwargs)
+    
+    monkeypatch.setattr(FileHasher, 'compute_hash', staticmethod(counting_hash))
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (directory / name).write_text("same")
+        
+        scanner = ArchiveScanner()
+        result = scanner.scan_directory(str(directory))
+        assert result['deduplication']['stats']['duplicate_files'] == 2
+        assert len(hashed) == len(set(hashed)) == 3
+        
+        # A new colliding file only causes that file to be read
+        (directory / "d.txt").write_text("same")
+        scanner.deduplicator.add_file(directory / "d.txt")
+        assert scanner.deduplicator.get_stats()['duplicate_files'] == 3
+        assert len(hashed) == len(set(hashed)) == 4
+
+
+def test_hash_engine_matches_inline_hashing():
+    """
+    Test that thread and process pools find the same duplicates as inline hashing.
+    """
+    from cognitive_tribunal.utils.file_utils import HashEngine
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        size = 3 * Deduplicator.PARTIAL_BLOCK_SIZE
+        for i in range(6):
+            (directory / f"big{i}.bin").write_bytes(bytes([i % 2]) * size)
+            (directory / f"small{i}.txt").write_text(f"group {i % 3}")
+        
+        inline = Deduplicator()
+        for file_path in directory.iterdir():
+            inline.add_file(file_path)
+        expected = {k: sorted(v) for k, v in inline.find_duplicates().items()}
+        assert len(expected) == 5
+        
+        for use_processes in (False, True):
+            with HashEngine(workers=2, use_processes=use_processes, max_in_flight=2, buffer_size=4096) as engine:
+                pooled = Deduplicator(hash_engine=engine)
+                for file_path in directory.iterdir():
+                    pooled.add_file(file_path)
+                assert {k: sorted(v) for k, v in pooled.find_duplicates().items()} == expected
+
+
+def test_fast_backend_with_confirmation_pass():
+    """
+    Test that a fast backend finds the same groups and records the algorithms used.
+    """
+    from cognitive_tribunal.utils.file_utils import fast_hash_algorithm
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        (directory / "a.txt").write_text("same")
+        (directory / "b.txt").write_text("same")
+        (directory / "c.txt").write_text("diff")
+        
+        deduplicator = Deduplicator(algorithm=fast_hash_algorithm(), confirm_algorithm='sha256')
+        for file_path in directory.iterdir():
+            deduplicator.add_file(file_path)
+        
+        duplicates = deduplicator.find_duplicates()
+        assert list(duplicates) == [hashlib.sha256(b"same").hexdigest()]
+        
+        stats = deduplicator.get_stats()
+        assert stats['algorithm'] == fast_hash_algorithm()
+        assert stats['confirm_algorithm'] == 'sha256'
+        assert stats['pipeline']['bytes_read_confirm'] == 8
+
+
+def test_throughput_limiter_throttles_hash_reads():
+    """
+    Test that hashing through a limiter is held to the configured rate.
+    """
+    import time
+    from cognitive_tribunal.utils.file_utils import FileHasher, ThroughputLimiter
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = Path(temp_dir) / "data.bin"
+        file_path.write_bytes(b"z" * 200_000)
+        
+        limiter = ThroughputLimiter(1_000_000, burst=0)
+        start = time.monotonic()
+        digest = FileHasher.compute_hash(file_path, limiter=limiter)
+        elapsed = time.monotonic() - start
+        
+        assert digest == hashlib.sha256(b"z" * 200_000).hexdigest()
+        assert elapsed >= 0.15
+
+
+def test_registered_categories_and_memoized_mime_types(monkeypatch):
+    """
+    Test config-defined categories and that MIME types match mimetypes per suffix.
+    """
+    import mimetypes
+    from cognitive_tribunal.utils.file_utils import FileClassifier
+    
+    monkeypatch.setattr(FileClassifier, 'FILE_CATEGORIES',
+                        {k: list(v) for k, v in FileClassifier.FILE_CATEGORIES.items()})
+    monkeypatch.setattr(FileClassifier, '_suffix_categories', dict(FileClassifier._suffix_categories))
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config_path = Path(temp_dir) / "config.yaml"
+        config_path.write_text(
+            "archives:\n"
+            "  locations: ['/archive']\n"
+            "  categories:\n"
+            "    ebook: ['.epub', 'MOBI']\n"
+            "    data: ['.csv']\n"
+        )
+        FileClassifier.load_categories(str(config_path))
+    
+    assert FileClassifier.classify(Path("book.EPUB")) == 'ebook'
+    assert FileClassifier.classify(Path("book.mobi")) == 'ebook'
+    # Moved from spreadsheet
+    assert FileClassifier.classify(Path("table.csv")) == 'data'
+    assert '.csv' not in FileClassifier.FILE_CATEGORIES['spreadsheet']
+    assert FileClassifier.classify(Path("notes.md")) == 'document'
+    assert FileClassifier.classify(Path("Makefile")) == 'other'
+    
+    for name in ("a.tar.gz", "b.txt.gz", "c.tar.Z", "d.tgz", "e.gz", "Makefile", ".bashrc", "f.JPG"):
+        assert FileClassifier.get_mime_type(Path(name)) == mimetypes.guess_type(name)[0]
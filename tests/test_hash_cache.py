@@ -0,0 +1,77 @@
+"""
+Tests for the persistent hash cache.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.utils.hash_cache import HashCache
+
+
+def test_rescan_uses_cached_hashes():
+    """
+    Test that a second scan of unchanged files is served from the cache.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir) / "archive"
+        directory.mkdir()
+        (directory / "a.txt").write_text("same content")
+        (directory / "b.txt").write_text("same content")
+        
+        cache = HashCache(str(Path(temp_dir) / "cache.sqlite"))
+        first = ArchiveScanner(hash_cache=cache).scan_directory(str(directory))
+        assert cache.get_stats()['entries'] == 2
+        misses_after_first_scan = cache.misses
+        
+        # Nothing changed, so every lookup in the second scan should hit
+        second = ArchiveScanner(hash_cache=cache).scan_directory(str(directory))
+        assert cache.misses == misses_after_first_scan
+        assert cache.hits > 0
+        assert second['deduplication']['duplicates'] == first['deduplication']['duplicates']
+        cache.close()
+
+
+def test_modified_file_is_rehashed():
+    """
+    Test that a cache entry is ignored once the file's size or mtime changes.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = Path(temp_dir) / "a.txt"
+        file_path.write_text("original")
+        
+        cache = HashCache(str(Path(temp_dir) / "cache.sqlite"))
+        key = HashCache.key_for(file_path.stat())
+        cache.put(key, 'sha256', 'abc123', file_path)
+        assert cache.get(key, 'sha256') == 'abc123'
+        assert cache.get(key, 'md5') is None
+        
+        file_path.write_text("modified content")
+        stat_result = file_path.stat()
+        os.utime(file_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000_000))
+        assert cache.get(HashCache.key_for(file_path.stat()), 'sha256') is None
+        
+        assert cache.invalidate(temp_dir) == 1
+        assert cache.compact(max_age_days=0) == 0
+        cache.close()
+
+
+def test_sniff_lookups_are_not_counted_as_hash_lookups():
+    """
+    Test that cached sniff results do not inflate the hash cache's hit rate.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir) / "archive"
+        directory.mkdir()
+        # No extension, so both are sniffed; different sizes, so neither is hashed
+        (directory / "notes").write_text("plain text")
+        (directory / "picture").write_bytes(b"\x89PNG\r\n\x1a\n")
+        
+        cache = HashCache(str(Path(temp_dir) / "cache.sqlite"))
+        first = ArchiveScanner(hash_cache=cache).scan_directory(str(directory))
+        second = ArchiveScanner(hash_cache=cache).scan_directory(str(directory))
+        assert second['stats']['by_category'] == first['stats']['by_category'] == {'document': 1, 'image': 1}
+        assert second['deduplication']['stats']['hash_cache'] == {'hits': 0, 'misses': 0}
+        assert cache.get_stats()['entries'] == 2
+        cache.close()
@@ -0,0 +1,80 @@
+"""
+Tests for cloud placeholder detection.
+"""
+
+import os
+import plistlib
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.utils.placeholders import SF_DATALESS, detect_placeholder
+
+
+def test_detects_placeholders_from_stat_and_icloud_stubs():
+    """
+    Test each placeholder signal and that ordinary files are left alone.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        stub = directory / ".Quarterly Report.pdf.icloud"
+        stub.write_bytes(plistlib.dumps(
+            {'NSURLNameKey': 'Quarterly Report.pdf', 'NSURLFileSizeKey': 7340032},
+            fmt=plistlib.FMT_BINARY))
+        local = directory / "notes.txt"
+        local.write_text("local content")
+        
+        assert detect_placeholder(stub, stub.stat()) == {
+            'reason': 'icloud-stub', 'name': 'Quarterly Report.pdf', 'size': 7340032}
+        assert detect_placeholder(local, local.stat()) is None
+        
+        def fake_stat(**fields):
+            values = {'st_size': 1 << 20, 'st_blocks': 2048, 'st_flags': 0, 'st_file_attributes': 0}
+            values.update(fields)
+            return SimpleNamespace(**values)
+        
+        assert detect_placeholder(local, fake_stat(st_flags=SF_DATALESS))['reason'] == 'dataless'
+        assert detect_placeholder(local, fake_stat(st_file_attributes=0x400000))['reason'] == 'recall'
+        assert detect_placeholder(local, fake_stat(st_file_attributes=0x1000))['reason'] == 'offline'
+        assert detect_placeholder(local, fake_stat(st_blocks=0))['reason'] == 'zero-blocks'
+        # Tiny files may be stored inline in the inode
+        assert detect_placeholder(local, fake_stat(st_blocks=0, st_size=60)) is None
+
+
+def test_scanner_records_placeholders_without_reading_them(monkeypatch):
+    """
+    Test that placeholders are reported as remote-only and never hashed.
+    """
+    from cognitive_tribunal.utils.file_utils import FileHasher
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        (directory / ".movie.mp4.icloud").write_bytes(plistlib.dumps(
+            {'NSURLNameKey': 'movie.mp4', 'NSURLFileSizeKey': 5000000}))
+        for name in ("a.bin", "b.bin"):
+            with open(directory / name, 'wb') as f:
+                f.truncate(1 << 20)
+        if os.stat(directory / "a.bin").st_blocks != 0:
+            return  # Filesystem without sparse files
+        
+        hashed = []
+        original = FileHasher.compute_hash
+        
+        def counting_hash(file_path, *args, **kwargs):
+            hashed.append(Path(file_path).name)
+            return original(file_path, *args, **kwargs)
+        
+        monkeypatch.setattr(FileHasher, 'compute_hash', staticmethod(counting_hash))
+        
+        result = ArchiveScanner().scan_directory(str(directory))
+        assert result['stats']['remote_only_files'] == 3
+        assert result['stats']['remote_only_size'] == 5000000 + 2 * (1 << 20)
+        assert result['stats']['by_category'] == {'video': 1, 'other': 2}
+        assert all(record['remote_only'] for record in result['files'])
+        assert result['deduplication']['stats']['duplicate_groups'] == 0
+        assert hashed == []
+        
+        hydrated = ArchiveScanner(hydrate_placeholders=True).scan_directory(str(directory))
+        assert hydrated['deduplication']['stats']['duplicate_files'] == 1
+        assert sorted(hashed) == ["a.bin", "b.bin"]
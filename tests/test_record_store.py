@@ -0,0 +1,112 @@
+"""
+Tests for the compact file record store.
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from cognitive_tribunal.modules.archive_scanner import ArchiveScanner
+from cognitive_tribunal.utils.file_utils import FileClassifier, extract_file_metadata
+from cognitive_tribunal.utils.record_store import FileRecordStore
+
+
+def test_dict_view_matches_extract_file_metadata():
+    """
+    Test that records materialize to the same dicts extract_file_metadata builds.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = FileRecordStore()
+        paths = []
+        for name in ("notes.md", "photo.JPG", "README"):
+            file_path = Path(temp_dir) / name
+            file_path.write_text(name)
+            paths.append(file_path)
+            store.append(file_path, file_path.stat(), FileClassifier.classify(file_path))
+        
+        assert len(store) == 3
+        assert store[1]['category'] == 'image'
+        assert store[-1]['name'] == 'README'
+        assert store[:2] == [store[0], store[1]]
+        
+        for record, file_path in zip(store, paths):
+            expected = extract_file_metadata(file_path)
+            assert record.keys() == expected.keys()
+            for key in ('name', 'path', 'size', 'category', 'mime_type', 'extension'):
+                assert record[key] == expected[key]
+
+
+def test_queries_run_against_store():
+    """
+    Test category, size and age queries on the scanner's record store.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        (directory / "big.mp4").write_bytes(b"\0" * (2 * 1024 * 1024))
+        (directory / "small.py").write_text("print('hi')")
+        old = directory / "old.txt"
+        old.write_text("old")
+        two_years_ago = time.time() - 2 * 365 * 86400
+        os.utime(old, (two_years_ago, two_years_ago))
+        
+        scanner = ArchiveScanner()
+        scanner.scan_directory(str(directory))
+        
+        assert [f['name'] for f in scanner.get_files_by_category('code')] == ['small.py']
+        assert scanner.get_files_by_category('no-such-category') == []
+        assert [f['name'] for f in scanner.get_large_files(min_size_mb=1)] == ['big.mp4']
+        assert [f['name'] for f in scanner.get_old_files(days_old=365)] == ['old.txt']
+
+
+def test_index_queries_match_linear_scan():
+    """
+    Test that indexed range, top-N and combined queries agree with brute force.
+    """
+    import random
+    from types import SimpleNamespace
+    from cognitive_tribunal.utils.record_store import FileRecordIndex
+    
+    rng = random.Random(42)
+    categories = ['code', 'image', 'video', 'other']
+    store = FileRecordStore()
+    for i in range(500):
+        stat_result = SimpleNamespace(
+            st_size=rng.randint(0, 1000),
+            st_ctime_ns=0,
+            st_mtime_ns=rng.randint(0, 10**12),
+            st_atime_ns=0,
+        )
+        store.append(f"/archive/dir{i % 7}/file{i}", stat_result, rng.choice(categories))
+    index = FileRecordIndex(store)
+    
+    def brute(category=None, min_size=None, max_size=None, after=None, before=None):
+        return {
+            i for i in range(len(store))
+            if (category is None or store.category(i) == category)
+            and (min_size is None or store.size[i] >= min_size)
+            and (max_size is None or store.size[i] <= max_size)
+            and (after is None or store.mtime_ns[i] >= after)
+            and (before is None or store.mtime_ns[i] < before)
+        }
+    
+    assert set(index.size_range(100, 200)) == brute(min_size=100, max_size=200)
+    assert set(index.mtime_range(10**11, 5 * 10**11)) == brute(after=10**11, before=5 * 10**11)
+    
+    for filters in (
+        dict(category='image'),
+        dict(category='video', min_size=900),
+        dict(min_size=10, max_size=20, modified_before_ns=3 * 10**11),
+        dict(category='code', modified_after_ns=9 * 10**11),
+    ):
+        expected = brute(filters.get('category'), filters.get('min_size'), filters.get('max_size'),
+                         filters.get('modified_after_ns'), filters.get('modified_before_ns'))
+        for order_by in ('size', 'mtime'):
+            result = index.query(order_by=order_by, **filters)
+            assert set(result) == expected
+            key = store.size if order_by == 'size' else store.mtime_ns
+            assert [key[i] for i in result] == sorted(key[i] for i in result)
+    
+    top = index.query(category='image', order_by='size', descending=True, limit=5)
+    image_sizes = sorted((store.size[i] for i in brute(category='image')), reverse=True)
+    assert [store.size[i] for i in top] == image_sizes[:5]